@@ -1,9 +1,16 @@
 from MODULES.pspdata import data_turnaround as ta
 from MODULES.pspdata import data_handling as dh
+from MODULES.pspdata import data_cache
+from MODULES.pspdata import data_schema
 from MODULES.Plotting import plotset_general as pg
 from MODULES.stat import stats_databin as db
-from astropy.constants import R_sun
+from MODULES.stat import stats_stream as ss
+from MODULES.stat import stats_partials as sp
+from MODULES.stat import stats_pyramid as pyr
+from MODULES.constants import R_SUN
 from MODULES.misc import write_log
+from MODULES.misc import metrics
+from MODULES.misc import storage
 
 # NECESSARY GLOBAL VARIABLES
 from MODULES.config import *
@@ -13,10 +20,53 @@ os.environ["CDF_LIB"] = "/data/home/simons97/LocalApplications/cdf/lib"
 
 # SIZE OF DISTANCE BINS IN R_SOL
 DISTANCE_BIN_SIZE = float(sys.argv[1])
+
+# CACHE OF REDUCED CDF FILES: "--no-cache" bypasses the cache completely,
+# "--rebuild-cache" re-reads all files and overwrites their cache entries
+CACHE_MODE = "use"
+if "--no-cache" in sys.argv:
+    CACHE_MODE = "off"
+elif "--rebuild-cache" in sys.argv:
+    CACHE_MODE = "rebuild"
+
+# STREAMING MODE: "--stream" adds each encounter to running statistics
+# of the distance bins and spills its binned data points to disk,
+# instead of keeping the data of all encounters in memory. Median and
+# quartiles are then approximated by sketches (see SKETCH_ERROR,
+# SKETCH_RESOLUTION and SKETCH_MAX_BUCKETS in config), unless "--exact"
+# is given as well
+STREAM = "--stream" in sys.argv
+EXACT = "--exact" in sys.argv
+
+# INCREMENTAL MODE: "--incremental" streams as above, but keeps the bin
+# statistics and binned data points of each encounter (in PARTIAL_DIR)
+# together with a manifest of the input files. Only encounters with new
+# or changed input files (or changed settings) are evaluated again, all
+# others are merged from their stored partials. The statistics are
+# exact by default (the same as a full run), "--sketch" approximates
+# median and quartiles by the sketches instead
+INCREMENTAL = "--incremental" in sys.argv
+STREAM = STREAM or INCREMENTAL
+EXACT = EXACT or (INCREMENTAL and "--sketch" not in sys.argv)
+SPILL_LOCATION = f"{PARTIAL_DIR}/bins" if INCREMENTAL else SPILL_DIR
+
+# AGGREGATE PYRAMID: every run stores the bin statistics of each encounter
+# part and instrument at the base resolution PYRAMID_BIN_SIZE (see
+# config). "--from-pyramid" derives the statistics for the bin size
+# from the stored pyramid instead, without reading any data (the binned
+# data files are then left as they are)
+FROM_PYRAMID = "--from-pyramid" in sys.argv
+
+# PROFILING MODE: "--profile" profiles the run and writes a trace of the
+# timed steps (encounters, instruments and files) and a summary of the
+# most expensive functions to PROFILE_DIR (see config)
+PROFILE = "--profile" in sys.argv
+
 DATA_ROOT = f"{sys.path[0]}/data"
-PLOT_ROOT = f"{sys.path[0]}/plots"
-STAT_DIR = f"{sys.path[0]}/statistics"
-STAT_DIR_BIN = f"{sys.path[0]}/statistics/BINNED_DATA"
+PLOT_ROOT = f"{sys.path[0]}/PLOTS"
+STAT_DIR = f"{sys.path[0]}/STATISTICS"
+STAT_DIR_BIN = f"{sys.path[0]}/STATISTICS/BINNED_DATA"
+PYRAMID_DIR = f"{sys.path[0]}/STATISTICS/PYRAMID"
 
 # SANITY CHECK: Does the data directory even exist?
 if not os.path.isdir(DATA_ROOT):
@@ -24,22 +74,88 @@ if not os.path.isdir(DATA_ROOT):
     sys.exit(0)
 
 
+def encounter_folders():
+    """
+    Encounters to evaluate: ENCOUNTER_NUM, or all encounter folders of
+    the data directory (in order of encounter number) if that is None
+    """
+    if ENCOUNTER_NUM is not None:
+        return list(ENCOUNTER_NUM)
+
+    folders = [folder for folder in os.listdir(DATA_ROOT)
+               if folder.startswith("encounter_")]
+
+    return sorted(folders, key=lambda folder: int(folder.split("_")[-1]))
+
+
+def pyramid_statistics():
+    """
+    Statistics of the distance bins and plot of the number of data
+    points per bin, merged from the aggregate pyramid of an earlier run.
+    Mean and standard deviation are exact, median and quartiles come
+    from the quantile sketches (as in streaming mode).
+    """
+    # SANITY CHECK: Is there a pyramid to derive the statistics from?
+    if not pyr.load_index(PYRAMID_DIR):
+        print(f"\nNO AGGREGATE PYRAMID IN {PYRAMID_DIR}!\n")
+        sys.exit(0)
+
+    accumulator = pyr.aggregate(PYRAMID_DIR, DISTANCE_BIN_SIZE)
+    storage.write_frame(f"{STAT_DIR}/PSP_STATISTICS",
+                        accumulator.statistics())
+
+    # Number of data points per bin within the simulation domain (as in
+    # the loop over the bins in main)
+    inst_numpts = accumulator.label_counts()
+    bin_names = accumulator.keys * DISTANCE_BIN_SIZE
+    in_domain = bin_names <= 40.0
+
+    pg.bin_analysis(PLOT_ROOT, inst_numpts["SPC"][in_domain].tolist(),
+                    inst_numpts["SPAN"][in_domain].tolist(),
+                    bin_names[in_domain].tolist())
+
+
 def main():
-    # Start the logging file
-    write_log.start_log()
+    # Metrics of the run (written to METRICS_DIR once at the end), and
+    # the profile of the run in profiling mode
+    metrics.start("1_data_eval", profile=PROFILE)
+
+    if FROM_PYRAMID:
+        return pyramid_statistics()
 
     # Pandas empty DataFrame for ALL data
     total_data = pd.DataFrame()
 
+    # Distance bins and, in streaming mode, the running statistics of
+    # the bins and the spill directory for the binned data points
+    distance_bins = np.arange(0, 100, DISTANCE_BIN_SIZE)
+    accumulator = ss.BinAccumulator(["SPC", "SPAN"])
+    if STREAM and not INCREMENTAL:
+        ss.clear_spill(SPILL_LOCATION)
+
+    encounters = encounter_folders()
+    pyramid_index = pyr.prepare(PYRAMID_DIR, encounters)
+
+    # Incremental mode: stored partials of encounters that are not
+    # evaluated anymore are removed. All settings that change the
+    # partials are part of their manifest entry
+    manifest = sp.load_manifest(PARTIAL_DIR) if INCREMENTAL else {}
+    for folder in sorted(set(manifest) - set(encounters)):
+        sp.remove_partial(PARTIAL_DIR, manifest, folder, SPILL_LOCATION)
+    settings = [DISTANCE_BIN_SIZE, dh.TIME_WINDOW, dh.MAX_DISTANCE,
+                data_cache.CACHE_VERSION, data_schema.SCHEMA_VERSION,
+                SKETCH_ERROR, SKETCH_RESOLUTION, SKETCH_MAX_BUCKETS,
+                ss.SKETCH_VERSION]
+
     # Loop over all files in the desired encounter folder(s), sorted
     # in ascending order of name (equal to date)
-    for folder in ENCOUNTER_NUM:
+    for folder in encounters:
 
         # Sanity check: print current folder name
         print(f"\nCURRENTLY HANDLING {folder}")
         
-        # Add to log-file
-        write_log.log_encounter(folder)
+        # Start of the encounter in the log-file
+        metrics.mark("encounter", folder)
 
         # Variable for current folder, SPC data location and SPAN-I data
         # location
@@ -53,28 +169,46 @@ def main():
                 print(f"\n{data_location} IS NOT A VALID DIRECTORY!\n")
                 sys.exit(0)
 
+        # Incremental mode: skip encounters whose partials are up to
+        # date (and already in the pyramid), otherwise remove their old
+        # partials before evaluation
+        if INCREMENTAL:
+            state = sp.input_state(encounter_folder, settings,
+                                   manifest.get(folder))
+
+            if sp.up_to_date(PARTIAL_DIR, manifest, folder, state) and \
+                    folder in pyramid_index["encounters"]:
+                print("PARTIALS UP TO DATE, NO EVALUATION NECESSARY")
+                accumulator.merge(sp.load_partial(PARTIAL_DIR, folder))
+                continue
+
+            sp.remove_partial(PARTIAL_DIR, manifest, folder, SPILL_LOCATION)
+
         # Initialize data frames for encounter data
         data_enc_spc = pd.DataFrame()
         data_enc_span = pd.DataFrame()
 
         # FIRST SPC DATA
         print("\nEVALUATION OF SPC MEASUREMENTS")
-        write_log.log_inst("SPC")
-        data_enc_spc = dh.encounter_data(spc_folder, data_enc_spc,
-                                         inst="SPC")
+        metrics.mark("instrument", "SPC")
+        with metrics.timed("encounter_data", encounter=folder, inst="SPC"):
+            data_enc_spc = dh.encounter_data(spc_folder, data_enc_spc,
+                                             inst="SPC", workers=NUM_WORKERS,
+                                             cache=CACHE_MODE)
 
         # SECOND SPAN-I DATA
         print("\nEVALUATION OF SPAN-I MEASUREMENTS")
-        write_log.log_inst("SPAN")
-        data_enc_span = dh.encounter_data(span_folder, data_enc_span,
-                                          inst="SPAN-I")
+        metrics.mark("instrument", "SPAN")
+        with metrics.timed("encounter_data", encounter=folder, inst="SPAN"):
+            data_enc_span = dh.encounter_data(span_folder, data_enc_span,
+                                              inst="SPAN-I",
+                                              workers=NUM_WORKERS,
+                                              cache=CACHE_MODE)
 
         # Concatenate SPC and SPAN measurements to total data frame
+        # (both are tagged by their instrument already, see data_schema)
         data_encounter_total = pd.concat(
-            objs=[
-                data_enc_spc.assign(Inst="SPC"),
-                data_enc_span.assign(Inst="SPAN")
-            ],
+            objs=[data_enc_spc, data_enc_span],
             ignore_index=True
         )
 
@@ -84,65 +218,105 @@ def main():
         data_encounter_total.reset_index(drop=True, inplace=True)
 
         # Take in the total data from one encounter and save the values
-        # for approach and recession independently
-        ta.ingress_egress_slicing(folder, data_encounter_total)
+        # for approach and recession independently. The aggregates of
+        # both (and of the turn-around points) go into the pyramid
+        encounter_parts = ta.ingress_egress_slicing(folder,
+                                                    data_encounter_total)
+        pyr.store_encounter(PYRAMID_DIR, pyramid_index, folder,
+                            encounter_parts)
 
         # Log the total amount of measurements per encounter for future
         # reference
         # write_log.append_raw_data(folder, logging_raw_array)
         # write_log.append_encounter_data(folder, data_encounter_total.posR)
 
+        # Streaming mode: add the encounter to the bin statistics and
+        # spill its data points bin by bin, then forget about it
+        if STREAM:
+            bin_index = np.digitize(
+                data_encounter_total.posR * 1e3 / R_SUN, distance_bins
+            )
+            encounter_stats = ss.BinAccumulator(["SPC", "SPAN"])
+            encounter_stats.update(data_encounter_total, bin_index)
+            ss.spill_bins(SPILL_LOCATION, folder, data_encounter_total,
+                          bin_index)
+
+            if INCREMENTAL:
+                sp.store_partial(PARTIAL_DIR, manifest, folder,
+                                 encounter_stats, state)
+
+            accumulator.merge(encounter_stats)
+            continue
+
         # Total data frame
         total_data = pd.concat([data_encounter_total, total_data])
         total_data.reset_index(drop=True, inplace=True)
 
-    # Create distance bins and group the data frame according to
-    # determined indices of data arrays that correspond to the
-    # respective distance bins. The object 'dist_groups' is an index
-    # array for the total data frame
-    distance_bins = np.arange(0, 100, DISTANCE_BIN_SIZE)
-    dist_groups = total_data.groupby(
-        np.digitize(total_data.posR * 1e3 / R_sun.value, distance_bins)
-    )
+    # Keep the cache of reduced files within its size limit
+    data_cache.evict()
 
     # Make sure to empty the directory containing the data files for
     # binned data values before starting to save files from a new run.
     for file in sorted(os.listdir(STAT_DIR_BIN)):
         os.remove(f"{STAT_DIR_BIN}/{file}")
 
-    # Loop over all created bins to sort the total data. Also log number
-    # of data points and the corresponding distance bin index (see
-    # empty arrays below)
+    if STREAM:
+        # The data of later encounters comes first in each bin (as in
+        # the total data frame)
+        part_names = encounters[::-1]
+        bin_keys = accumulator.keys
+
+        if EXACT:
+            total_stats = ss.exact_statistics(SPILL_LOCATION, bin_keys,
+                                               part_names)
+        else:
+            total_stats = accumulator.statistics()
+        inst_numpts = accumulator.label_counts()
+
+        def bin_data(i):
+            return ss.read_spilled_bin(SPILL_LOCATION, bin_keys[i],
+                                       part_names)
+    else:
+        # Sort the data frame once by the bin indices. Afterwards, the
+        # data points of each bin form one contiguous segment of the
+        # sorted data ('bin_starts')
+        bin_order, bin_keys, bin_starts = db.bin_segments(
+            np.digitize(total_data.posR * 1e3 / R_SUN, distance_bins)
+        )
+        sorted_data = total_data.iloc[bin_order]
+        bin_ends = np.append(bin_starts[1:], bin_order.size)
+
+        # Statistics (mean, std, median, q1, q3), tagged by the "Type"
+        # column, and number of data points of each instrument per bin
+        total_stats = db.binned_statistics(total_data, bin_order, bin_starts)
+        inst_numpts = db.segment_counts(total_data["Inst"].to_numpy(),
+                                        bin_order, bin_starts,
+                                        ["SPC", "SPAN"])
+
+        def bin_data(i):
+            return sorted_data.iloc[bin_starts[i]:bin_ends[i]]
+
+    # Save data frame for total stats
+    storage.write_frame(f"{STAT_DIR}/PSP_STATISTICS", total_stats)
+
+    # Loop over all created bins to save the binned data. Also log
+    # number of data points and the corresponding distance bin index
+    # (see empty arrays below)
     spc_numpts = []
     span_numpts = []
     dist_index = []
 
-    # Compute and save data frame for total stats (mean, median, std,
-    # q1, g3). It is of note here that "pd.assign(name=value)" creates a
-    # new column in the data frame filled with "value"
-    total_stats = pd.concat(
-        objs=[
-            dist_groups.mean(numeric_only=True).assign(Type="mean"),
-            dist_groups.std(numeric_only=True).assign(Type="std"),
-            dist_groups.median(numeric_only=True).assign(Type="median"),
-            dist_groups.quantile(q=0.25, numeric_only=True).assign(Type="q1"),
-            dist_groups.quantile(q=0.75, numeric_only=True).assign(Type="q3")
-        ],
-        ignore_index=True
-    )
-    total_stats.to_json(f"{STAT_DIR}/PSP_STATISTICS.json")
-
     # Save bins individually for posterity (not necessary to read in
     # separately anymore after change to pandas). Get the number of
     # decimal points used in bin size for file naming purposes.
     dec_pts = db.decimal_length(DISTANCE_BIN_SIZE)
-    for r_bin, grp in dist_groups:
+
+    for i, r_bin in enumerate(bin_keys):
 
         # Generalized necessary variables
-        # TODO: Is "Hashable" a problem here?
         bin_name = r_bin * DISTANCE_BIN_SIZE
         file_name = f"PSP_BIN_{bin_name:.{dec_pts}f}-" \
-                    f"{bin_name + DISTANCE_BIN_SIZE:.{dec_pts}f}.json"
+                    f"{bin_name + DISTANCE_BIN_SIZE:.{dec_pts}f}"
 
         # SANITY CHECK:
         # Stop if the distance bins exceed the simulation domain size of 40 Rs
@@ -153,31 +327,28 @@ def main():
             )
             break
 
-        # Save Data Frames of distance bins to JSON file
-        grp.to_json(f"{STAT_DIR_BIN}/{file_name}")
-
-        # Evaluate Number of data points for each instrument!
-        split_datapts = grp["Inst"].value_counts()
+        # Save Data Frames of distance bins to file
+        storage.write_frame(f"{STAT_DIR_BIN}/{file_name}", bin_data(i))
 
-        # For each instrument
-        try:
-            spc_numpts += [split_datapts["SPC"]]
-        except KeyError:
-            spc_numpts += [0]
-
-        try:
-            span_numpts += [split_datapts["SPAN"]]
-        except KeyError:
-            span_numpts += [0]
-
-        # Append to parameters for plot below
+        # Number of data points for each instrument and parameters for
+        # plot below
+        spc_numpts += [inst_numpts["SPC"][i]]
+        span_numpts += [inst_numpts["SPAN"][i]]
         dist_index += [bin_name]
 
+    # The spilled data is not needed anymore after saving the bins
+    # (unless it is kept as partials for the next incremental run)
+    if STREAM and not INCREMENTAL:
+        ss.clear_spill(SPILL_LOCATION)
+
     # THIS RUNS AFTER THE BIN LOOP!
     # Plot a simple scatter plot with # of data points per bin
     # TODO: Add # of data points from SPAN-i here individually
     pg.bin_analysis(PLOT_ROOT, spc_numpts, span_numpts, dist_index)
 
+    # Write the metrics of the run, and the log-file rendered from them
+    write_log.render_log(metrics.flush())
+
 
 if __name__ == "__main__":
     # Set-up plot parameters
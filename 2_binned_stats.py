@@ -1,10 +1,17 @@
 import sys
 import os
-import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.util import Finalize
+import matplotlib
 
 from MODULES.Plotting import plotset_general as pg
 from MODULES.Plotting import plotset_observations as po
 from MODULES.stat import stats_databin as db
+from MODULES.misc import storage
+from MODULES.misc import metrics
+from MODULES.misc import profiling
+from MODULES.pspdata import data_schema
+from MODULES.config import NUM_WORKERS
 
 # DESIGNATE BINNED DATA LOCATION
 BIN_DATA_LOCATION = f"{sys.path[0]}/STATISTICS/BINNED_DATA"
@@ -14,6 +21,10 @@ HIST_SAVE_DIR = f"{sys.path[0]}/PLOTS/BinHistograms"
 STAT_SAVE_DIR = f"{sys.path[0]}/STATISTICS"
 # BIN SIZE DECIMAL POINTS FOR NAMING CONVENTION
 BIN_SIZE = db.decimal_length(float(sys.argv[1]))
+# HISTOGRAM FIGURE OF THE CURRENT PROCESS (SEE init_worker)
+HISTOGRAM = None
+# PROFILE THE RUN (SEE MODULES/misc/profiling.py)
+PROFILE = "--profile" in sys.argv
 
 
 # SANITY CHECK: Does the data directory even exist?
@@ -28,34 +39,73 @@ if not os.path.isdir(STAT_SAVE_DIR):
 	sys.exit(0)
 
 
+def init_worker():
+	"""
+	Set up a process for plotting histograms: non-interactive backend,
+	plot parameters and one histogram figure that is reused for all
+	plots of this process
+	"""
+	global HISTOGRAM
+
+	matplotlib.use("Agg")
+	pg.rc_setup()
+	HISTOGRAM = po.HistogramFigure()
+
+	# Worker processes do not run normal exit handlers, but these
+	# finalizers (the figure is closed when the process ends)
+	Finalize(HISTOGRAM, HISTOGRAM.close, exitpriority=10)
+
+
+def bin_histograms(plt_nm):
+	"""
+	Plot the histograms of all major parameters of one binned data set
+	(profiled in worker processes in profiling mode, see
+	profiling.profiled)
+	"""
+	with profiling.profiled(plt_nm):
+		# Generate correct pointer to data file
+		data_frame = data_schema.read_samples(
+			f"{BIN_DATA_LOCATION}/{plt_nm}"
+		)
+
+		# Create bin plots and save them correctly ("plt_nm" is the name
+		# of the data set without file extension)
+		for identifier in ["vr", "np", "Temp"]:
+			HISTOGRAM.update(data_frame, plt_nm, identifier)
+			HISTOGRAM.save(HIST_SAVE_DIR, plt_nm, identifier)
+
+	return plt_nm
+
+
 def main():
 	# Make sure to empty the directory containing the bin plots for
 	# before starting to save files from a new run.
 	for file in sorted(os.listdir(HIST_SAVE_DIR)):
 		os.remove(f"{HIST_SAVE_DIR}/{file}")
 	
-	# Loop over all files in the binned data directory
-	for name in sorted(os.listdir(BIN_DATA_LOCATION)):
-		
-		# SANITY CHECK: print current file name
-		print(f"CURRENTLY HANDLING {name}")
-		
-		# Generate correct pointer to data file
-		file = BIN_DATA_LOCATION + f"/{name}"
-		data_frame = pd.read_json(file)
-
-		# Create bin plots and save them correctly. "plt_nm" cuts off
-		# the file extension
-		index_ext_rev = name[::-1].find(".") + 1
-		plt_nm = name[:-index_ext_rev]
-		po.plot_histogram(HIST_SAVE_DIR, data_frame, plt_nm, "vr")
-		po.plot_histogram(HIST_SAVE_DIR, data_frame, plt_nm, "np")
-		po.plot_histogram(HIST_SAVE_DIR, data_frame, plt_nm, "Temp")
-
-		del data_frame
+	# All data sets in the binned data directory
+	plt_names = storage.bin_partitions(BIN_DATA_LOCATION)
+
+	# Distribute the bins over worker processes, each with its own
+	# figure (results come back in order of the bins)
+	if NUM_WORKERS > 1:
+		with ProcessPoolExecutor(max_workers=NUM_WORKERS,
+		                         initializer=init_worker) as pool:
+			for plt_nm in pool.map(bin_histograms, plt_names):
+				# SANITY CHECK: print current file name
+				print(f"CURRENTLY HANDLING {plt_nm}")
+	else:
+		init_worker()
+		for plt_nm in map(bin_histograms, plt_names):
+			print(f"CURRENTLY HANDLING {plt_nm}")
+		HISTOGRAM.close()
 			
 
 if __name__ == "__main__":
-	pg.rc_setup()
-	
+	# Wall time and peak memory of the run (see metrics), profiled with
+	# "--profile" (see profiling)
+	metrics.start("2_binned_stats", profile=PROFILE)
+
 	main()
+
+	metrics.flush()
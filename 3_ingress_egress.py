@@ -1,19 +1,28 @@
-import os
 import sys
 import typing as tp
 import pandas as pd
 import matplotlib.pyplot as plt
 import numpy as np
-from astropy.constants import R_sun
+from MODULES.constants import R_SUN
 from MODULES.Plotting import plotset_general as pg
 from MODULES.Plotting import plotset_observations as po
+from MODULES.Plotting import plotset_decimation as pdc
+from MODULES.misc import storage
+from MODULES.pspdata import data_schema
+from MODULES.stat import stats_pyramid as pyr
+from MODULES.stat import stats_dataread as dr
+from MODULES.misc import metrics
 
 # DISTANCE BIN SIZE IN R_SOL
 DISTANCE_BIN_SIZE = float(sys.argv[1])
 
+# PROFILE THE RUN (SEE MODULES/misc/profiling.py)
+PROFILE = "--profile" in sys.argv
+
 # DATA LOCATION OF SPLIT DATA AND PLOTS
 SPLIT_DATA_LOCATION = f"{sys.path[0]}/STATISTICS/SPLIT_DATA"
-STAT_DATA_FILE = f"{sys.path[0]}/STATISTICS/PSP_STATISTICS.json"
+STAT_DATA_FILE = f"{sys.path[0]}/STATISTICS/PSP_STATISTICS"
+PYRAMID_DIR = f"{sys.path[0]}/STATISTICS/PYRAMID"
 PLOT_SAVE_DIR = f"{sys.path[0]}/PLOTS/IngressEgressPlots"
 
 # CUSTOM COLOUR LIST FOR PLOTTING [NESTED 10 x 2]
@@ -35,10 +44,9 @@ def main_orbit_plots(folder: str) -> None:
     # Instantiate combined plots
     fig_com, ax_vr_com, ax_np_com, ax_t_com = po.plot_setup_obs_comb()
 
-    # Create (archaic) sorted list of files by asc. encounter number
-    # varying ingress - egress
-    raw_file_list = sorted(os.listdir(folder))
-    file_list = raw_file_list
+    # Create (archaic) sorted list of data sets by asc. encounter
+    # number varying ingress - egress
+    file_list = storage.split_partitions(folder)
 
     # Loop over all split files in the directory
     for file in file_list:
@@ -46,43 +54,51 @@ def main_orbit_plots(folder: str) -> None:
 
         # Generate total file name (and very rough label)
         file_name = f"{folder}/{file}"
-        label = file[10:13]
-
-        # Read in (1) and append (2) to total data
-        data, label, pcolour, ls = orbit_readin(file_name, label)
-        median_df = data_orbit_analysis(data)
+        label, pcolour, ls = orbit_label(file[10:13])
+
+        # Mean values per distance bin, merged from the aggregate
+        # pyramid if possible (otherwise from the split data file)
+        if pyr.supports(DISTANCE_BIN_SIZE) and \
+                pyr.has_part(PYRAMID_DIR, file):
+            median_df = pyr.bin_means(
+                pyr.aggregate(PYRAMID_DIR, DISTANCE_BIN_SIZE, parts=[file])
+            )
+        else:
+            data, label, pcolour, ls = orbit_readin(file_name, file[10:13])
+            median_df = data_orbit_analysis(data)
 
         # Generate general position values for orbit (in R_sol)
-        position = median_df.posR * 1e3 / R_sun
+        position = median_df.posR * 1e3 / R_SUN
 
-        # Add to existing plots
+        # Add to existing plots (reduced to the points that are visible
+        # at the resolution of each axes, see plotset_decimation)
         for vr_axis in (ax_vr, ax_vr_com[0]):
             vr_axis.plot(
-                position, median_df.vr,
+                *pdc.decimate_line(vr_axis, position, median_df.vr),
                 label=label, color=pcolour,
                 ls=ls, lw=2
             )
 
         for np_axis in (ax_np, ax_np_com[0]):
             np_axis.plot(
-                position, median_df.np,
+                *pdc.decimate_line(np_axis, position, median_df.np),
                 label=label, color=pcolour,
                 ls=ls, lw=2
             )
 
         for tem_axis in (ax_t, ax_t_com[0]):
             tem_axis.plot(
-                position, median_df.Temp,
+                *pdc.decimate_line(tem_axis, position, median_df.Temp),
                 label=label, color=pcolour,
                 ls=ls, lw=2
             )
 
     # Fill in mean (or median) plots
-    # Read in the .json file and split by value type
-    stat_data = pd.read_json(STAT_DATA_FILE)
-    plot_stats(ax_vr_com[1], stat_data, "vr")
-    plot_stats(ax_np_com[1], stat_data, "np")
-    plot_stats(ax_t_com[1], stat_data, "Temp")
+    # Read in the statistics file (once, for all parameters)
+    stats = dr.PSPStatData.read(STAT_DATA_FILE)
+    plot_stats(ax_vr_com[1], stats, "vr")
+    plot_stats(ax_np_com[1], stats, "np")
+    plot_stats(ax_t_com[1], stats, "Temp")
 
     # Finalize and save individual plots
     ax_vr.legend(ncol=3)
@@ -110,10 +126,9 @@ def epoch_plots_ie(folder):
     Recreating plots Roberto Livi sent to me to compare SPC and SPAN-I
     measurements with epoch.
     """
-    # Create (archaic) sorted list of files by asc. encounter number
-    # varying ingress - egress
-    raw_file_list = sorted(os.listdir(folder))
-    file_list = raw_file_list
+    # Create (archaic) sorted list of data sets by asc. encounter
+    # number varying ingress - egress
+    file_list = storage.split_partitions(folder)
 
     # For logging
     print("\nEPOCH PLOTS")
@@ -128,7 +143,7 @@ def epoch_plots_ie(folder):
 
         # Read in data
         file_name = f"{folder}/{file}"
-        full_data = pd.read_json(file_name)
+        full_data = data_schema.read_samples(file_name)
 
         # Split into SPC and SPAN-I
         spc_data = full_data.loc[full_data["Inst"] == "SPC"]
@@ -142,8 +157,13 @@ def epoch_plots_ie(folder):
 def orbit_readin(filename: str, label) -> tp.Tuple:
     """Read in file data and create dictionary"""
     # Read in data frame
-    data = pd.read_json(filename)
+    data = data_schema.read_samples(filename)
 
+    return (data,) + orbit_label(label)
+
+
+def orbit_label(label) -> tp.Tuple:
+    """Plot label, colour and line style of split file (rough label)"""
     # Extract individual necessary designation keys
     enc_numb = int(label[0])  # Encounter number
     enc_type = label[-1].lower()  # Encounter type (in/eg)
@@ -159,7 +179,7 @@ def orbit_readin(filename: str, label) -> tp.Tuple:
         plot_colour = COLOUR_LIST[enc_numb - 1][1]
         linestyle = "--"
 
-    return data, enc_lab, plot_colour, linestyle
+    return enc_lab, plot_colour, linestyle
 
 
 def data_orbit_analysis(data: pd.DataFrame) -> pd.DataFrame:
@@ -167,7 +187,7 @@ def data_orbit_analysis(data: pd.DataFrame) -> pd.DataFrame:
     # Create distance bins and zip indices
     distance_bins = np.arange(0, 100, DISTANCE_BIN_SIZE)
     dist_groups = data.groupby(
-        np.digitize(data.posR * 1e3 / R_sun.value, distance_bins)
+        np.digitize(data.posR * 1e3 / R_SUN, distance_bins)
     )
 
     mean_df = dist_groups.mean(numeric_only=True)
@@ -175,37 +195,38 @@ def data_orbit_analysis(data: pd.DataFrame) -> pd.DataFrame:
     return mean_df
 
 
-def plot_stats(ax, stat_data, key_name):
-    """DOC"""
-    data_mean = stat_data[stat_data["Type"] == "mean"]
-    data_std = stat_data[stat_data["Type"] == "std"]
+def plot_stats(ax, stats, key_name):
+    """Mean and standard deviation of 'key_name' (PSPStatData 'stats')"""
+    data = getattr(stats, key_name)
 
     # Not used for now!
-    # data_median = stat_data[stat_data["Type"] == "median"]
-    # data_q1 = stat_data[stat_data["Type"] == "q1"]
-    # data_q3 = stat_data[stat_data["Type"] == "q3"]
+    # data.median, data.q1, data.q3
 
     # Generalized position parameter in R_sol
-    position = data_mean.posR * 1e3 / R_sun.value
+    position = stats.dist
 
     ax.plot(
-        position, data_mean.__getattr__(key_name),
+        position, data.mean,
         lw=2, color="tab:blue",
         label="mean", zorder=5)
 
     ax.fill_between(
         x=position,
-        y1=data_mean.__getattr__(key_name).values - data_std.__getattr__(
-            key_name).values,
-        y2=data_mean.__getattr__(key_name).values + data_std.__getattr__(
-            key_name).values,
+        y1=data.mean - data.stddev,
+        y2=data.mean + data.stddev,
         color="lightblue", label="1$\\sigma$", zorder=4)
 
 
 if __name__ == "__main__":
+    # Wall time and peak memory of the run (see metrics), profiled with
+    # "--profile" (see profiling)
+    metrics.start("3_ingress_egress", profile=PROFILE)
+
     # GENERAL PLOTTING PARAMETERS
     pg.rc_setup()
 
     # CALL ALL NESTED FUNCTIONS
     main_orbit_plots(SPLIT_DATA_LOCATION)
     epoch_plots_ie(SPLIT_DATA_LOCATION)
+
+    metrics.flush()
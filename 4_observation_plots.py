@@ -1,26 +1,36 @@
 import sys
-import pandas as pd
 from MODULES.Plotting import plotset_general as pg
 from MODULES.Plotting import plotset_observations as po
+from MODULES.stat import stats_dataread as dr
+from MODULES.misc import metrics
 
 
 # GLOBAL: STAT FILE NAME
-STAT_DATA_FILE = f"{sys.path[0]}/STATISTICS/PSP_STATISTICS.json"
+STAT_DATA_FILE = f"{sys.path[0]}/STATISTICS/PSP_STATISTICS"
 PLOT_SAVE_DIR = f"{sys.path[0]}/PLOTS/ObsDataPlots"
 
+# PROFILE THE RUN (SEE MODULES/misc/profiling.py)
+PROFILE = "--profile" in sys.argv
+
 
 def main():
 	# Read in statistics file
 	main_parameters = ["vr", "np", "Temp"]
-	stat_data = pd.read_json(STAT_DATA_FILE)
+	stats = dr.PSPStatData.read(STAT_DATA_FILE)
 
 	# Plot setup
 	pg.rc_setup()
 	
 	# Plotting all three major parameters
 	for parameter in main_parameters:
-		po.plot_finals(stat_data, parameter, PLOT_SAVE_DIR)
+		po.plot_finals(stats, parameter, PLOT_SAVE_DIR)
 	
 
 if __name__ == "__main__":
+	# Wall time and peak memory of the run (see metrics), profiled with
+	# "--profile" (see profiling)
+	metrics.start("4_observation_plots", profile=PROFILE)
+
 	main()
+
+	metrics.flush()
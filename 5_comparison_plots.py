@@ -3,6 +3,7 @@ from MODULES.stat import stats_dataread as dr
 from MODULES.Plotting import plotset_general as pg
 from MODULES.Plotting import plotset_comparison as pc
 from MODULES.misc import write_log
+from MODULES.misc import metrics
 
 # Necessary global variables
 PSP_STAT_DIR = f"{sys.path[0]}/STATISTICS"
@@ -10,6 +11,9 @@ ML_CONT = f"{sys.path[0]}/STATISTICS/MASSLOSS_CONTOURS"
 PLOT_SAVE_DIR = f"{sys.path[0]}/PLOTS/ComparisonPlots"
 ROUGH_EVAL = "OUTER_BOUNDARY_COMPARISON.dat"
 
+# Profile the run (see MODULES/misc/profiling.py)
+PROFILE = "--profile" in sys.argv
+
 
 def main():
     pg.rc_setup()
@@ -18,10 +22,9 @@ def main():
     # generated from observations
     sim_data_eq = dr.SimMeshData(f"{PSP_STAT_DIR}/NIRwave_equatorial.csv")
     sim_data_pol = dr.SimMeshData(f"{PSP_STAT_DIR}/NIRwave_polar.csv")
-    psp_stats = dr.PSPStatData(f"{PSP_STAT_DIR}/PSP_STATISTICS.json",
-                               sim_data_eq)
     # Reduce the statistical data down to a maximum of 40 R_sol
-    dr.cut_stat_data(psp_stats)
+    psp_stats = dr.PSPStatData.read(f"{PSP_STAT_DIR}/PSP_STATISTICS")
+    psp_stats = psp_stats.cut(40.0)
 
     # Generate individual plots for each parameter of interest
     for indicator in ["vr", "np", "T", "massloss", "rampressure"]:
@@ -43,4 +46,10 @@ def main():
 
 
 if __name__ == "__main__":
+    # Wall time and peak memory of the run (see metrics), profiled with
+    # "--profile" (see profiling)
+    metrics.start("5_comparison_plots", profile=PROFILE)
+
     main()
+
+    metrics.flush()
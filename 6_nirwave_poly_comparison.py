@@ -1,6 +1,7 @@
 import sys
 from MODULES.EOSComparison import data_read, plotting
 from MODULES.stat import stats_dataread as dr
+from MODULES.misc import metrics
 
 
 # GLOBALS
@@ -10,6 +11,9 @@ NIR_EQ = "STATISTICS/NIRwave_equatorial.csv"
 NIR_POL = "STATISTICS/NIRwave_polar.csv"
 PSP_STAT_DIR = f"{sys.path[0]}/STATISTICS"
 
+# Profile the run (see MODULES/misc/profiling.py)
+PROFILE = "--profile" in sys.argv
+
 
 # SAVING FIGURES
 SAVE_DIR = "PLOTS/eos-comparison"
@@ -23,9 +27,7 @@ def main():
     nir_eq = data_read.SimMeshData(NIR_EQ)
     nir_pol = data_read.SimMeshData(NIR_POL)
 
-    sim_data_eq = dr.SimMeshData(f"{PSP_STAT_DIR}/NIRwave_equatorial.csv")
-    psp_stats = dr.PSPStatData(f"{PSP_STAT_DIR}/PSP_STATISTICS.json",
-                               sim_data_eq)
+    psp_stats = dr.PSPStatData.read(f"{PSP_STAT_DIR}/PSP_STATISTICS")
 
     # PLOT DESIRED RADIAL PROFILES
     plotting.rc_setup()
@@ -39,4 +41,10 @@ def main():
 
 
 if __name__ == "__main__":
+    # Wall time and peak memory of the run (see metrics), profiled with
+    # "--profile" (see profiling)
+    metrics.start("6_nirwave_poly_comparison", profile=PROFILE)
+
     main()
+
+    metrics.flush()
@@ -0,0 +1,53 @@
+import os
+import sys
+import time
+from MODULES.stat import stats_dataread as dr
+from MODULES.stat import stats_scoring as sc
+from MODULES.config import NUM_WORKERS
+from MODULES.misc import metrics
+
+# DIRECTORY WITH THE RADIAL PROFILES OF ALL SIMULATION RUNS (ParaView CSV
+# exports, one file per run)
+SIM_DIR = sys.argv[1]
+
+# Necessary global variables
+PSP_STAT_DIR = f"{sys.path[0]}/STATISTICS"
+SCORE_FILE = f"{sys.path[0]}/BATCH_COMPARISON.csv"
+NUM_SHOWN = 10
+
+# Profile the run (see MODULES/misc/profiling.py)
+PROFILE = "--profile" in sys.argv
+
+
+def main():
+    # SANITY CHECK: Does the simulation directory even exist?
+    if not os.path.isdir(SIM_DIR):
+        print(f"\n{SIM_DIR} IS NOT A VALID DIRECTORY!\n")
+        sys.exit(0)
+
+    file_names = [f"{SIM_DIR}/{file}" for file in sorted(os.listdir(SIM_DIR))
+                  if file.endswith(".csv")]
+
+    # Statistics generated from observations, reduced down to a maximum
+    # of 40 R_sol (the simulation domain)
+    psp_stats = dr.PSPStatData.read(f"{PSP_STAT_DIR}/PSP_STATISTICS")
+    psp_stats = psp_stats.cut(40.0)
+
+    # Score and rank all runs, without plotting any of them
+    start = time.perf_counter()
+    scores = sc.batch_scores(file_names, psp_stats, workers=NUM_WORKERS)
+    scores.to_csv(SCORE_FILE, index=False, float_format="%.6e")
+
+    print(f"\nSCORED {len(file_names)} RUNS IN "
+          f"{time.perf_counter() - start:.2f} S, BEST {NUM_SHOWN}:\n")
+    print(scores.head(NUM_SHOWN).to_string(index=False))
+
+
+if __name__ == "__main__":
+    # Wall time and peak memory of the run (see metrics), profiled with
+    # "--profile" (see profiling)
+    metrics.start("7_batch_comparison", profile=PROFILE)
+
+    main()
+
+    metrics.flush()
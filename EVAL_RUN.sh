@@ -3,32 +3,14 @@
 # SET A GLOBAL VARIABLE TO REPRESENT THE BIN LENGTH ON SOLAR RADII
 BIN_LENGTH=0.1
 
-# ANALYSE WHOLE DATA SET AND BIN ACCORDING TO VARIABLE ABOVE
-echo "EXECUTING DATA EVALUATION"
-python3 1_data_eval.py $BIN_LENGTH
-echo
-
-# REWRITE EACH BINNED FILE INTO BINNED STATISTICS FILE
-echo "EXECUTING STATISTICS ON BINNED DATA"
-python3 2_binned_stats.py $BIN_LENGTH
-echo
-
-# REITERATE PROCESS, BUT SPLIT BETWEEN INGRESS AND EGRESS
-echo "EXECUTING INGRESS / EGRESS ANALYSIS"
-python3 3_ingress_egress.py $BIN_LENGTH
-echo
-
-# GENERATE FINAL PLOTS OF OBSERVATIONAL DATA
-echo "GENERATING PLOTS OF OBSERVATION DATA"
-python3 4_observation_plots.py
-echo
-
-# GENERATE FINAL PLOTS COMPARING SIMULATION RESULTS WITH OBSERVATIONS
-echo "GENERATING COMPARISON PLOTS FOR PAPER"
-python3 5_comparison_plots.py
-echo
-
-# GENERATE PLOTS FOR COMPARISON BETWEEN NIRWAVE AND POLYTROPE
-echo "COMPARING NIRWAVE TO POLYTROPE"
-python3 6_nirwave_poly_comparison.py
-echo
+# RUN ALL STAGES OF THE EVALUATION (SEE run_pipeline.py):
+# 1. ANALYSE WHOLE DATA SET AND BIN ACCORDING TO VARIABLE ABOVE
+# 2. REWRITE EACH BINNED FILE INTO BINNED STATISTICS FILE
+# 3. REITERATE PROCESS, BUT SPLIT BETWEEN INGRESS AND EGRESS
+# 4. GENERATE FINAL PLOTS OF OBSERVATIONAL DATA
+# 5. GENERATE FINAL PLOTS COMPARING SIMULATION RESULTS WITH OBSERVATIONS
+# 6. GENERATE PLOTS FOR COMPARISON BETWEEN NIRWAVE AND POLYTROPE
+# STAGES WITH UP-TO-DATE OUTPUTS ARE SKIPPED, STAGES 4-6 RUN IN PARALLEL.
+# FURTHER ARGUMENTS ARE PASSED ON TO THE DATA EVALUATION (E.G.
+# "--no-cache", "--stream"), "--force" RUNS ALL STAGES
+python3 run_pipeline.py $BIN_LENGTH "$@"
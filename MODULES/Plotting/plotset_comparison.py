@@ -1,4 +1,7 @@
-import matplotlib.pyplot as plt
+from MODULES.misc.lazy import LazyModule
+
+# matplotlib is imported on first use (see LazyModule)
+plt = LazyModule("matplotlib.pyplot")
 
 # GLOBALS (FOR PLOT UNITY)
 COLOR_EQ = "black"
@@ -0,0 +1,160 @@
+import numpy as np
+from MODULES.config import PLOT_DECIMATION
+
+
+def axes_pixels(ax) -> int:
+    """Width of the axes in pixels (at the resolution of the figure)"""
+    return axes_extent(ax)[0]
+
+
+def axes_extent(ax) -> tuple:
+    """Width and height of the axes in pixels"""
+    extent = ax.get_window_extent()
+
+    return max(int(np.ceil(extent.width)), 1), \
+        max(int(np.ceil(extent.height)), 1)
+
+
+def numeric_x(x) -> np.ndarray:
+    """x values as floats (datetimes as nanoseconds) for the bucketing"""
+    x = np.asarray(x)
+
+    if np.issubdtype(x.dtype, np.datetime64):
+        return x.astype("datetime64[ns]").view(np.int64).astype(np.float64)
+
+    return x.astype(np.float64)
+
+
+def cell_index(values: np.ndarray, num_cells: int) -> np.ndarray:
+    """
+    Cell of each value, for 'num_cells' cells of equal width over the
+    range of the values (all in cell 0 if the range is empty)
+    """
+    low = values.min()
+    span = values.max() - low
+
+    if span <= 0:
+        return np.zeros(values.size, dtype=np.int64)
+
+    return np.minimum(((values - low) / span * num_cells).astype(np.int64),
+                      num_cells - 1)
+
+
+def minmax_indices(x, y, num_buckets: int) -> np.ndarray:
+    """
+    Indices of the points that keep the look of a line plot with
+    'num_buckets' pixel columns: the first, last, minimum and maximum
+    point of every column (in the original order). The first NaN of a
+    column is kept as well, so that gaps in the line stay visible.
+
+    :param x: NDARRAY,
+        x values (sorted, e.g. epoch)
+    :param y: NDARRAY,
+        y values
+    :param num_buckets: INT,
+        Number of columns (equal width in x)
+    :return: NDARRAY,
+        Sorted indices of the points to plot
+    """
+    x = numeric_x(x)
+    y = np.asarray(y, dtype=np.float64)
+
+    # Unsorted x values (a line going back and forth) are not reduced
+    if x.size <= 4 * num_buckets or np.any(x[1:] < x[:-1]):
+        return np.arange(x.size)
+
+    # Column of each point, the columns are contiguous segments of the
+    # (sorted) data
+    column = cell_index(x, num_buckets)
+    starts = np.flatnonzero(np.diff(column, prepend=-1))
+    ends = np.append(starts[1:], x.size)
+
+    nan = np.isnan(y)
+    y_low = np.where(nan, np.inf, y)
+    y_high = np.where(nan, -np.inf, y)
+
+    # Position of the minimum/maximum within each column, found with
+    # one reduction over all columns
+    segment = np.repeat(np.arange(starts.size), ends - starts)
+    low = np.minimum.reduceat(y_low, starts)
+    high = np.maximum.reduceat(y_high, starts)
+    index = np.arange(x.size)
+    low_index = np.full(starts.size, x.size)
+    high_index = np.full(starts.size, x.size)
+    np.minimum.at(low_index, segment[y_low == low[segment]],
+                  index[y_low == low[segment]])
+    np.minimum.at(high_index, segment[y_high == high[segment]],
+                  index[y_high == high[segment]])
+    nan_index = np.full(starts.size, x.size)
+    np.minimum.at(nan_index, segment[nan], index[nan])
+
+    keep = np.concatenate((starts, ends - 1, low_index, high_index,
+                           nan_index))
+
+    return np.unique(keep[keep < x.size])
+
+
+def pixel_indices(x, y, num_columns: int, num_rows: int) -> np.ndarray:
+    """
+    Indices of the points that keep the look of a scatter plot with
+    'num_columns' x 'num_rows' pixels: the first point (in the original
+    order) in every occupied pixel. The pixels cover the range of the
+    points, which is at most the range of the axes, so no pixel of the
+    plot loses its point. Points with NaN values are not drawn anyway
+    and left out.
+
+    :param x: NDARRAY,
+        x values
+    :param y: NDARRAY,
+        y values
+    :param num_columns: INT,
+        Number of pixel columns
+    :param num_rows: INT,
+        Number of pixel rows
+    :return: NDARRAY,
+        Sorted indices of the points to plot
+    """
+    x = numeric_x(x)
+    y = np.asarray(y, dtype=np.float64)
+
+    valid = np.flatnonzero(~np.isnan(x) & ~np.isnan(y))
+    if valid.size <= num_columns:
+        return valid
+
+    pixel = cell_index(x[valid], num_columns) * num_rows + \
+        cell_index(y[valid], num_rows)
+    _, first = np.unique(pixel, return_index=True)
+
+    return valid[np.sort(first)]
+
+
+def decimate_line(ax, x, y):
+    """
+    (x, y) of a line plot on 'ax', reduced to the minimum and maximum of
+    each pixel column (unchanged if PLOT_DECIMATION is off)
+    """
+    x = np.asarray(x)
+    y = np.asarray(y)
+
+    if not PLOT_DECIMATION:
+        return x, y
+
+    index = minmax_indices(x, y, axes_pixels(ax))
+
+    return x[index], y[index]
+
+
+def decimate_scatter(ax, x, y):
+    """
+    (x, y) of a scatter plot on 'ax', reduced to one point per occupied
+    pixel (unchanged if PLOT_DECIMATION is off)
+    """
+    x = np.asarray(x)
+    y = np.asarray(y)
+
+    if not PLOT_DECIMATION:
+        return x, y
+
+    index = pixel_indices(x, y, *axes_extent(ax))
+
+    return x[index], y[index]
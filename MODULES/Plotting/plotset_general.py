@@ -1,5 +1,8 @@
-import matplotlib as mpl
-import matplotlib.pyplot as plt
+from MODULES.misc.lazy import LazyModule
+
+# matplotlib is imported on first use (see LazyModule)
+mpl = LazyModule("matplotlib")
+plt = LazyModule("matplotlib.pyplot")
 
 
 def rc_setup():
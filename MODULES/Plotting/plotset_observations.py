@@ -1,7 +1,12 @@
-import matplotlib.pyplot as plt
 import numpy as np
-import astropy.constants as c
 import pandas as pd
+from MODULES.Plotting import plotset_decimation as pdc
+from MODULES.misc.lazy import LazyModule
+from MODULES.constants import R_SUN
+
+# matplotlib is imported on first use (see LazyModule)
+plt = LazyModule("matplotlib.pyplot")
+patches = LazyModule("matplotlib.patches")
 
 
 def plot_setup(indicator: str):
@@ -34,106 +39,134 @@ def plot_setup(indicator: str):
     return fig, ax
 
 
-def plot_histogram(save_dir, data, filename, identifier):
-    """Specified plot settings for histogram data."""
-    # SANITY CHECK
-    pos_ident = ["vr", "np", "Temp"]
-    assert identifier in pos_ident, \
-        f"IDENTIFIER {identifier} UNKNOWN!"
-
-    # MISC. INFORMATION
-    num_points = len(data[identifier])  # Number of meas. in binned sample
-    mean = np.mean(data[identifier])  # Mean of data
-    stddev = np.std(data[identifier])  # Stddev of data
-    median = np.median(data[identifier])  # Median of data
-
-    # OVERALL FIGURE INITIALIZATION
-    fig, ax = plt.subplots()
-
-    # Histogram of all data points, binned automatically by plt.hist()
-    _, bins, _ = ax.hist(x=data[identifier], bins="auto", histtype="step",
-                         color="grey", lw=2.5,
-                         label=f"comb. ({num_points})")
-
-    # Plot SPC and SPAN-I bins separate
-    data_spc = data[data["Inst"] == "SPC"]
-    ax.hist(x=data_spc[identifier], bins=bins, histtype="step",
-            color="black", lw=1.5, ls="--",
-            label=f"SPC ({data_spc.shape[0]})")
-
-    data_span = data[data["Inst"] == "SPAN"]
-    ax.hist(x=data_span[identifier], bins=bins, histtype="step",
-            color="tab:blue", lw=1.5, ls="--",
-            label=f"SPAN-I ({data_span.shape[0]})")
-
-    # Mean and standard deviation
-    ax.axvline(
-        mean, ls="--", lw=2, color="darkgreen",
-        label=f"MEAN = {mean:.3f}"
-    )
-    ax.axvspan(
-        xmin=mean - stddev, xmax=mean + stddev,
-        color="tab:green", alpha=0.5
-    )
-
-    # Median and quantiles
-    ax.axvline(
-        median, ls="--", lw=2, color="maroon",
-        label=f"MEDIAN = {median:.3f}"
-    )
-    ax.axvspan(
-        xmin=np.percentile(data[identifier], 25),
-        xmax=np.percentile(data[identifier], 75),
-        color="lightcoral", alpha=0.5
-    )
-
-    # General Plot adjustments
-    plt.legend(framealpha=1., frameon=True)
-    ax.set(
-        ylabel="Frequency",
-        title=f"{filename}\n # Data Points = {num_points}"
-    )
-
-    # ADJUST GRID BY HAND TO MAKE SURE IMPLEMENTATION IS CORRECT
-    ax.grid(alpha=0.5, axis="y")
-    ax.grid(alpha=0, axis="x")
-
-    # THIS IS CALLED WHEN RADIAL VELOCITY IS DESIRED
-    if identifier == "vr":
-
-        # MAKE CORRECT ADJUSTMENTS TO PLOTS
-        ax.set(xlabel="Radial velocity [kms$^{-1}$]")
-        plt.savefig(f"{save_dir}/{filename}_RadVel_HIST.png")
+# x-axis label and file name suffix of the histogram of each quantity
+HISTOGRAM_LABELS = {
+    "vr": ("Radial velocity [kms$^{-1}$]", "RadVel"),
+    "np": ("Number density [cm$^{-3}$]", "Density"),
+    "Temp": ("Temperature [K]", "Temperature")
+}
+
+
+class HistogramFigure:
+    """
+    Histogram figure of one quantity in one distance bin (combined,
+    SPC and SPAN-I histograms, mean +- standard deviation and median
+    with quartiles). The figure and its artists are created once and
+    only updated with new data for each plot, which is a lot faster
+    than creating a new figure for every plot.
+    """
+
+    def __init__(self):
+        self.fig, self.ax = plt.subplots()
+
+        # Mean +- standard deviation and quartile spans over the full
+        # height of the axes (like axvspan), below the histograms
+        self.std_span = self.ax.add_patch(patches.Rectangle(
+            (0, 0), 0, 1, transform=self.ax.get_xaxis_transform(),
+            color="tab:green", alpha=0.5
+        ))
+        self.quart_span = self.ax.add_patch(patches.Rectangle(
+            (0, 0), 0, 1, transform=self.ax.get_xaxis_transform(),
+            color="lightcoral", alpha=0.5
+        ))
+
+        # Histograms (step lines) of combined, SPC and SPAN-I data
+        self.hist_comb = self.ax.stairs([0], [0, 1], color="grey", lw=2.5)
+        self.hist_spc = self.ax.stairs([0], [0, 1], color="black", lw=1.5,
+                                       ls="--")
+        self.hist_span = self.ax.stairs([0], [0, 1], color="tab:blue",
+                                        lw=1.5, ls="--")
+
+        # Mean and median
+        self.mean_line = self.ax.axvline(0, ls="--", lw=2,
+                                         color="darkgreen")
+        self.median_line = self.ax.axvline(0, ls="--", lw=2, color="maroon")
+
+        # ADJUST GRID BY HAND TO MAKE SURE IMPLEMENTATION IS CORRECT
+        self.ax.grid(alpha=0.5, axis="y")
+        self.ax.grid(alpha=0, axis="x")
+
+    def update(self, data, filename, identifier):
+        """Show the histogram of 'identifier' for the binned 'data'"""
+        # SANITY CHECK
+        assert identifier in HISTOGRAM_LABELS, \
+            f"IDENTIFIER {identifier} UNKNOWN!"
+
+        # MISC. INFORMATION
+        num_points = len(data[identifier])  # Number of meas. in binned sample
+        mean = np.mean(data[identifier])  # Mean of data
+        stddev = np.std(data[identifier])  # Stddev of data
+        median = np.median(data[identifier])  # Median of data
+
+        # Histogram of all data points, binned automatically (as with
+        # plt.hist(bins="auto")), and SPC and SPAN-I data in the same bins.
+        # NaN values are left out (as by plt.hist)
+        counts, bins = np.histogram(data[identifier].dropna(), bins="auto")
+        self.hist_comb.set_data(counts, bins)
+        self.hist_comb.set_label(f"comb. ({num_points})")
+
+        for inst, label, hist in [("SPC", "SPC", self.hist_spc),
+                                  ("SPAN", "SPAN-I", self.hist_span)]:
+            data_inst = data[identifier][data["Inst"] == inst]
+            hist.set_data(np.histogram(data_inst.dropna(), bins=bins)[0],
+                          bins)
+            hist.set_label(f"{label} ({data_inst.shape[0]})")
+
+        # Mean and standard deviation
+        self.mean_line.set_xdata([mean, mean])
+        self.mean_line.set_label(f"MEAN = {mean:.3f}")
+        self.std_span.set_x(mean - stddev)
+        self.std_span.set_width(2 * stddev)
+
+        # Median and quantiles
+        q1, q3 = np.percentile(data[identifier], [25, 75])
+        self.median_line.set_xdata([median, median])
+        self.median_line.set_label(f"MEDIAN = {median:.3f}")
+        self.quart_span.set_x(q1)
+        self.quart_span.set_width(q3 - q1)
+
+        # General Plot adjustments (limits from the new data)
+        self.ax.relim()
+        self.ax.autoscale_view()
+        self.ax.legend(framealpha=1., frameon=True)
+        self.ax.set(
+            xlabel=HISTOGRAM_LABELS[identifier][0],
+            ylabel="Frequency",
+            title=f"{filename}\n # Data Points = {num_points}"
+        )
 
-    # THIS IS CALLED WHEN NUMBER DENSITY IS DESIRED
-    elif identifier == "np":
+    def save(self, save_dir, filename, identifier):
+        """Save figure with the file name of quantity 'identifier'"""
+        self.fig.savefig(
+            f"{save_dir}/{filename}_{HISTOGRAM_LABELS[identifier][1]}"
+            f"_HIST.png"
+        )
 
-        # MAKE CORRECT ADJUSTMENTS TO PLOTS
-        ax.set(xlabel="Number density [cm$^{-3}$]")
-        plt.savefig(f"{save_dir}/{filename}_Density_HIST.png")
+    def close(self):
+        """Close figure to release its memory"""
+        plt.close(self.fig)
 
-    # THIS IS CALLED WHEN TEMPERATURE IS DESIRED
-    elif identifier == "Temp":
 
-        # MAKE CORRECT ADJUSTMENTS TO PLOTS
-        ax.set(xlabel="Temperature [K]")
-        plt.savefig(f"{save_dir}/{filename}_Temperature_HIST.png")
+def plot_histogram(save_dir, data, filename, identifier):
+    """Specified plot settings for histogram data."""
+    histogram = HistogramFigure()
+    histogram.update(data, filename, identifier)
+    histogram.save(save_dir, filename, identifier)
 
     # CLOSE FIGURE TO SAVE MEMORY
-    plt.close()
+    histogram.close()
+
 
+def plot_finals(stats, key_name, save_dir):
+    """
+    Specified final plotting attributes for measurement data ('stats'
+    is a PSPStatData object, see stats_dataread)
+    """
+    # Statistics of the parameter (views of the statistics array)
+    data = getattr(stats, key_name)
 
-def plot_finals(stat_data, key_name, save_dir):
-    """Specified final plotting attributes for measurement data."""
-    # Sub-slices of data frame
-    data_mean = stat_data[stat_data["Type"] == "mean"]
-    data_std = stat_data[stat_data["Type"] == "std"]
-    data_median = stat_data[stat_data["Type"] == "median"]
-    data_q1 = stat_data[stat_data["Type"] == "q1"]
-    data_q3 = stat_data[stat_data["Type"] == "q3"]
-    
     # Adjusted position parameter
-    distance = data_mean.posR * 1e3 / c.R_sun
+    distance = stats.dist
 
     # PLOTTING MEAN AND STDDEV OF DATA
     fig, ax = None, None
@@ -148,16 +181,14 @@ def plot_finals(stat_data, key_name, save_dir):
         fig, ax = plot_setup("Temperature")
 
     ax.plot(
-        distance, data_mean.__getattr__(key_name).values,
+        distance, data.mean,
         lw=2, color="tab:blue", label="Mean"
     )
 
     ax.fill_between(
         x=distance,
-        y1=data_mean.__getattr__(key_name).values -
-           data_std.__getattr__(key_name).values,
-        y2=data_mean.__getattr__(key_name).values +
-           data_std.__getattr__(key_name).values,
+        y1=data.mean - data.stddev,
+        y2=data.mean + data.stddev,
         color="lightblue", label="1$\\sigma$")
 
     plt.legend()
@@ -188,14 +219,14 @@ def plot_finals(stat_data, key_name, save_dir):
 
     ax.plot(
         distance,
-        data_median.__getattr__(key_name).values,
+        data.median,
         lw=2, color="maroon", label="median"
     )
 
     ax.fill_between(
         x=distance,
-        y1=data_q1.__getattr__(key_name).values,
-        y2=data_q3.__getattr__(key_name).values,
+        y1=data.q1,
+        y2=data.q3,
         color="lightcoral", alpha=0.5,
         label="q1/q3"
     )
@@ -262,34 +293,47 @@ def plot_setup_obs_epoch():
     return fig, ax_r, ax_vr, ax_np
 
 
+def epoch_datetime(epoch):
+    """
+    Datetime values of an epoch column, which is integer nanoseconds
+    since 1970 (UTC). Float columns are read as Julian date in seconds,
+    as in data files written by older versions.
+    """
+    if pd.api.types.is_integer_dtype(epoch):
+        return pd.to_datetime(epoch, unit="ns")
+
+    return pd.to_datetime(epoch / 86400, unit="D", origin="julian")
+
+
 def plot_fill_epoch(label, ax_r, ax_vr, ax_np, spc_data, span_data, save_dir):
     """Filling epoch plots"""
     spc_color = "black"
     span_color = "tab:red"
 
     # Create more readable epoch values
-    spc_epoch = pd.to_datetime(spc_data.epoch / 86400,
-                               unit="D", origin="julian")
-    span_epoch = pd.to_datetime(span_data.epoch / 86400,
-                                unit="D", origin="julian")
+    spc_epoch = epoch_datetime(spc_data.epoch)
+    span_epoch = epoch_datetime(span_data.epoch)
 
-    # Fill distance plot
-    ax_r.plot(span_epoch, span_data.posR * 1e3 / c.R_sun,
+    # Fill distance plot. Every line is reduced to the points that are
+    # visible at the resolution of the axes (see plotset_decimation)
+    ax_r.plot(*pdc.decimate_line(ax_r, span_epoch,
+                                 span_data.posR * 1e3 / R_SUN),
               c=span_color, label="SPAN",
               lw=2.5)
-    ax_r.plot(spc_epoch, spc_data.posR * 1e3 / c.R_sun,
+    ax_r.plot(*pdc.decimate_line(ax_r, spc_epoch,
+                                 spc_data.posR * 1e3 / R_SUN),
               c=spc_color, label="SPC",
               lw=2.5)
 
-    ax_vr.plot(span_epoch, span_data.vr, c=span_color, label="SPAN",
-    lw=2.5)
-    ax_vr.plot(spc_epoch, spc_data.vr, c=spc_color, label="SPC",
-    lw=2.5)
+    ax_vr.plot(*pdc.decimate_line(ax_vr, span_epoch, span_data.vr),
+               c=span_color, label="SPAN", lw=2.5)
+    ax_vr.plot(*pdc.decimate_line(ax_vr, spc_epoch, spc_data.vr),
+               c=spc_color, label="SPC", lw=2.5)
 
-    ax_np.plot(span_epoch, span_data.np, c=span_color, label="SPAN",
-    lw=2.5)
-    ax_np.plot(spc_epoch, spc_data.np, c=spc_color, label="SPC",
-    lw=2.5)
+    ax_np.plot(*pdc.decimate_line(ax_np, span_epoch, span_data.np),
+               c=span_color, label="SPAN", lw=2.5)
+    ax_np.plot(*pdc.decimate_line(ax_np, spc_epoch, spc_data.np),
+               c=spc_color, label="SPC", lw=2.5)
 
     # Finish up the plots
     plt.setp(ax_r.get_xticklabels(), visible=False)
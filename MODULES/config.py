@@ -4,4 +4,96 @@ import numpy as np
 import pandas as pd
 
 # GLOBAL VARIABLES
+# Encounters to evaluate (None: all encounter folders of the data
+# directory)
 ENCOUNTER_NUM = ["encounter_7", "encounter_8", "encounter_9"]
+
+# Number of worker processes for reading in CDF files in parallel (one
+# file per worker, 1 means sequential read-in)
+NUM_WORKERS = os.cpu_count() or 1
+
+# File format of intermediate data (binned data, ingress/egress data and
+# statistics): "npz" (compressed binary columns) or "json"
+STORAGE_BACKEND = "npz"
+
+# Cache of reduced CDF files (see MODULES/pspdata/data_cache.py) and
+# its maximum size in bytes, and the maximum size of the binary copies
+# of simulation mesh files (see MODULES/stat/stats_dataread.py)
+CACHE_DIR = f"{sys.path[0]}/cache"
+CACHE_MAX_SIZE = 10 * 1024 ** 3
+SIM_CACHE_MAX_SIZE = 1024 ** 3
+
+# Relative error of the quantile sketches used for the statistics in
+# streaming mode (see MODULES/stat/stats_stream.py) and the directory
+# of the per-bin spill files of that mode
+SKETCH_ERROR = 0.001
+SPILL_DIR = f"{CACHE_DIR}/spill"
+
+# Columns whose quantile sketches have an absolute error instead, with
+# buckets of fixed width (in the units of the column schema, see
+# MODULES/pspdata/data_schema.py): the epoch, which is far from 0
+# compared to its spread, and signed columns, whose quantiles can lie
+# close to 0. Their quantiles are off by at most half the width
+SKETCH_RESOLUTION = {"epoch": 1e9, "posTH": 1e-6, "posPH": 1e-6, "vr": 1e-2}
+
+# Maximum number of buckets of a quantile sketch per distance bin and
+# column, which bounds the memory of the sketches independent of the
+# number of data points. Beyond it, neighbouring buckets are combined,
+# which doubles the error bound of the column (e.g. the epoch of a bin
+# that spans several encounters ends up in buckets of hours)
+SKETCH_MAX_BUCKETS = 1024
+
+# Stored per-encounter partial aggregates and their manifest for
+# incremental runs of the data evaluation
+PARTIAL_DIR = f"{CACHE_DIR}/partials"
+
+# Catalogue of the raw CDF files (record count, epoch and distance range
+# and content hash of each file), refreshed for new or changed files
+CATALOGUE_FILE = f"{CACHE_DIR}/catalogue.json"
+
+# Distance bin size (R_sun) of the aggregate pyramid written by the data
+# evaluation (see MODULES/stat/stats_pyramid.py). Statistics for every
+# multiple of this bin size are derived from it without reading data
+PYRAMID_BIN_SIZE = 0.05
+
+# Decimation of dense time series before plotting (per-pixel min/max
+# for lines, one point per occupied pixel for scatter plots, see
+# MODULES/Plotting/plotset_decimation.py). False plots all points
+PLOT_DECIMATION = True
+
+# Run metrics (counters, timers and peak memory of each stage, see
+# MODULES/misc/metrics.py), one JSON Lines file per stage with the
+# events of all runs
+METRICS_DIR = f"{sys.path[0]}/METRICS"
+
+# Output of the profiling mode ("--profile" on every numbered script and
+# on the pipeline runner, see MODULES/misc/profiling.py): trace,
+# summary of the PROFILE_TOP most expensive functions and flame graph of
+# each stage (without call stacks of less than PROFILE_MIN_SHARE of the
+# total time)
+PROFILE_DIR = f"{sys.path[0]}/PROFILES"
+PROFILE_TOP = 30
+PROFILE_MIN_SHARE = 1e-4
+
+# Benchmarks of the evaluation steps on synthetic data (see benchmark.py
+# and MODULES/pspdata/data_synthetic.py): number of records per
+# instrument of each benchmarked size, repetitions per step (the fastest
+# counts) and the total time (seconds) short steps are repeated for at
+# least (so that their fastest time is stable), directory of the
+# synthetic data and file of the stored thresholds. "--update" stores
+# the times of a run, increased by the relative TOLERANCE, as thresholds
+BENCHMARK_SIZES = [10 ** 4, 10 ** 5, 10 ** 6]
+BENCHMARK_REPEAT = 3
+BENCHMARK_MIN_TIME = 1.0
+BENCHMARK_DIR = f"{CACHE_DIR}/benchmark"
+BENCHMARK_THRESHOLDS = f"{sys.path[0]}/BENCHMARK_THRESHOLDS.json"
+BENCHMARK_TOLERANCE = 0.5
+
+# Validation of units (for debugging): all numeric code works on plain
+# floats in the units of the column schema (see UNITS in
+# MODULES/pspdata/data_schema.py). With UNIT_VALIDATION, every unit
+# conversion is computed again with astropy units and compared to the
+# float result (relative UNIT_TOLERANCE), the results themselves are
+# the same in both modes
+UNIT_VALIDATION = False
+UNIT_TOLERANCE = 1e-6
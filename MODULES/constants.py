@@ -0,0 +1,17 @@
+# GLOBALS
+# Physical constants in SI units as plain floats, which cost nothing to
+# import (astropy.constants takes about a third of a second, in every
+# stage and every spawned worker process). Values of CODATA 2022 and
+# IAU 2015, as in astropy (compared in tests/test_constants.py)
+R_SUN = 695700000.0             # Nominal solar radius [m]
+M_SUN = 1.988409870698051e30    # Solar mass [kg]
+GM_SUN = 1.3271244e20           # Nominal solar mass parameter [m^3 s^-2]
+AU = 149597870700.0             # Astronomical unit [m]
+K_B = 1.380649e-23              # Boltzmann constant [J K^-1]
+M_P = 1.67262192595e-27         # Proton mass [kg]
+E_CHARGE = 1.602176634e-19      # Elementary charge [C]
+
+# Joule per electron volt of the SPAN-I temperatures (the elementary
+# charge of CODATA 2002, which the temperatures have always been
+# converted with, kept so that they do not change)
+EV = 1.60217653e-19
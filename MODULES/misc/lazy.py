@@ -0,0 +1,27 @@
+import importlib
+
+
+class LazyModule:
+    """
+    Module that is only imported on first access of one of its
+    attributes, for modules that are expensive to import and not needed
+    in every run (e.g. matplotlib.pyplot in a module that might never
+    plot, or spacepy in a run that only reads cached files):
+
+        plt = LazyModule("matplotlib.pyplot")
+        fig, ax = plt.subplots()    # matplotlib.pyplot imported here
+    """
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attribute: str):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+
+        return getattr(self._module, attribute)
+
+    def __repr__(self) -> str:
+        state = "imported" if self._module is not None else "not imported"
+        return f"<lazy module {self._name} ({state})>"
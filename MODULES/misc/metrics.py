@@ -0,0 +1,216 @@
+import os
+import json
+import time
+import atexit
+import threading
+import functools
+import contextlib
+import typing as tp
+from MODULES.config import METRICS_DIR
+from . import profiling
+
+# Peak memory is taken from the resource usage of the process, which is
+# only available on Unix systems
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# GLOBALS
+# Kinds of events: counters (e.g. number of data points after a
+# reduction step), timers (wall time in seconds, optionally with the
+# amount processed in that time, e.g. bytes), peak memory (bytes) and
+# marks (start of a section of the run, e.g. an encounter)
+COUNTER = "counter"
+TIMER = "timer"
+MEMORY = "memory"
+MARK = "mark"
+
+# State of the current process: stage and start of the run, events that
+# are not written yet, and the lists of open capture blocks
+_RUN = {"stage": None, "run": None, "start": None, "wall_start": None}
+_EVENTS = []
+_CAPTURES = []
+
+
+def start(stage: str, profile: bool = False) -> None:
+    """
+    Start the metrics of a run of 'stage' (e.g. "1_data_eval"). Events
+    are buffered until flush, which is also called when the process
+    exits (so that the events of an aborted run are not lost). With
+    'profile', the run is profiled as well (see profiling).
+    """
+    _RUN.update(stage=stage,
+                run=f"{time.strftime('%Y-%m-%dT%H:%M:%S')}-{os.getpid()}",
+                start=time.perf_counter(), wall_start=time.time())
+    _EVENTS.clear()
+    atexit.register(flush)
+
+    if profile:
+        profiling.start(stage)
+
+
+def record(kind: str, name: str, value, fields: tp.Dict = None,
+           **labels) -> None:
+    """
+    Buffer one event (see counter, timer, peak_memory and mark), with
+    additional 'fields' of the event besides the labels
+    """
+    event = {"kind": kind, "name": name, "value": value, "pid": os.getpid()}
+    if fields:
+        event.update(fields)
+    if labels:
+        event["labels"] = labels
+
+    # Within a capture block (e.g. in a worker process), events go to
+    # the list of the block instead of the buffer of the run
+    (_CAPTURES[-1] if _CAPTURES else _EVENTS).append(event)
+
+
+def counter(name: str, value: int, **labels) -> None:
+    """Count of 'name' (e.g. data points after a reduction step)"""
+    record(COUNTER, name, value, **labels)
+
+
+def timer(name: str, seconds: float, amount=None, start: float = None,
+          **labels) -> None:
+    """
+    Wall time of 'name' in seconds. 'amount' is what was processed in
+    that time (e.g. bytes read), so that the throughput can be compared
+    between runs. Timers of one contiguous span know their 'start'
+    (time.time()), which places them in the trace of the profiling mode.
+    """
+    if amount is not None:
+        labels["amount"] = amount
+
+    fields = None
+    if start is not None:
+        fields = {"start": start, "tid": threading.get_ident()}
+
+    record(TIMER, name, seconds, fields, **labels)
+
+
+def peak_memory(**labels) -> None:
+    """Peak resident memory (bytes) of this process and its children"""
+    if resource is None:
+        return None
+
+    # ru_maxrss is given in kilobytes (on Linux)
+    for who, name in [(resource.RUSAGE_SELF, "peak_memory"),
+                      (resource.RUSAGE_CHILDREN, "peak_memory_children")]:
+        record(MEMORY, name, resource.getrusage(who).ru_maxrss * 1024,
+               **labels)
+
+    return None
+
+
+def mark(name: str, value: str) -> None:
+    """Start of a section of the run (e.g. name "encounter")"""
+    record(MARK, name, value)
+
+
+@contextlib.contextmanager
+def timed(name: str, **labels):
+    """Time the enclosed block as timer 'name'"""
+    wall_start = time.time()
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        timer(name, time.perf_counter() - start_time, start=wall_start,
+              **labels)
+
+
+def timed_function(function: tp.Callable) -> tp.Callable:
+    """Decorator: time every call of 'function' (by its name)"""
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        with timed(function.__qualname__):
+            return function(*args, **kwargs)
+
+    return wrapper
+
+
+@contextlib.contextmanager
+def capture():
+    """
+    Collect the events of the enclosed block in a list of their own.
+    Worker processes return this list together with their result, and
+    the main process adds it to the run in the order of the results
+    (see extend), so that no two processes write to the same file.
+    """
+    events = []
+    _CAPTURES.append(events)
+    try:
+        yield events
+    finally:
+        _CAPTURES.pop()
+
+
+def extend(events: tp.List[tp.Dict]) -> None:
+    """Add events collected with capture (e.g. by a worker process)"""
+    (_CAPTURES[-1] if _CAPTURES else _EVENTS).extend(events)
+
+
+def events() -> tp.List[tp.Dict]:
+    """Events of the current run that are not written yet"""
+    return list(_EVENTS)
+
+
+def metrics_file(stage: str) -> str:
+    """JSON Lines file of all runs of 'stage'"""
+    return f"{METRICS_DIR}/{stage}.jsonl"
+
+
+def flush() -> tp.List[tp.Dict]:
+    """
+    Write the buffered events of the run, together with the wall time
+    of the stage and the peak memory, to the metrics file of the stage
+    (appended, one JSON object per line, tagged by stage and start of
+    the run). This ends the run, later calls do not write anything.
+    Returns the written events.
+    """
+    if _RUN["stage"] is None:
+        return []
+
+    timer("stage", time.perf_counter() - _RUN["start"],
+          start=_RUN["wall_start"], stage=_RUN["stage"])
+    peak_memory()
+
+    written = list(_EVENTS)
+    _EVENTS.clear()
+    stage, run = _RUN["stage"], _RUN["run"]
+    _RUN.update(stage=None, run=None, start=None, wall_start=None)
+
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    lines = [json.dumps({"stage": stage, "run": run, **event},
+                        default=lambda value: value.item())
+             for event in written]
+
+    # One write per flush, so that the lines of one run stay together
+    with open(metrics_file(stage), "a") as f:
+        f.write("\n".join(lines) + "\n")
+
+    profiling.finish(written)
+
+    return written
+
+
+def load(stage: str, run: str = None) -> tp.List[tp.Dict]:
+    """
+    Events of 'stage' from its metrics file, of one run ('run' as
+    written by flush, "last" for the latest one) or of all runs
+    """
+    file_name = metrics_file(stage)
+    if not os.path.isfile(file_name):
+        return []
+
+    with open(file_name, "r") as f:
+        loaded = [json.loads(line) for line in f if line.strip()]
+
+    if run == "last" and loaded:
+        run = loaded[-1]["run"]
+    if run is not None:
+        loaded = [event for event in loaded if event["run"] == run]
+
+    return loaded
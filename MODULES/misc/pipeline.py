@@ -0,0 +1,215 @@
+import os
+import json
+import time
+import subprocess
+import threading
+import typing as tp
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from . import metrics
+
+# GLOBALS
+# Status of a stage after a pipeline run
+STATUS_RUN = "run"
+STATUS_SKIP = "up to date"
+STATUS_FAIL = "failed"
+STATUS_BLOCKED = "not run (failed dependency)"
+
+# Directories that are skipped when looking for changed inputs (Python
+# writes them when a stage imports the modules of an input directory)
+IGNORED_DIRS = ["__pycache__"]
+
+
+class Stage:
+    """
+    One step of the evaluation pipeline: a command together with the
+    files/directories it reads ('inputs') and writes ('outputs'). All
+    paths are relative to the working directory of the pipeline.
+    """
+
+    def __init__(self, name: str, command: tp.List[str],
+                 inputs: tp.List[str], outputs: tp.List[str]):
+        self.name = name
+        self.command = list(command)
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+
+
+def newest_mtime(path: str) -> float:
+    """
+    Latest modification time of a file, or of all files in a directory
+    (recursively, without IGNORED_DIRS). Missing paths count as
+    infinitely new.
+    """
+    if not os.path.exists(path):
+        return float("inf")
+    if not os.path.isdir(path):
+        return os.path.getmtime(path)
+
+    newest = os.path.getmtime(path)
+    for root, dirs, files in os.walk(path):
+        dirs[:] = [name for name in dirs if name not in IGNORED_DIRS]
+        for file in files:
+            newest = max(newest, os.path.getmtime(f"{root}/{file}"))
+
+    return newest
+
+
+def contains(outer: str, inner: str) -> bool:
+    """Whether path 'inner' is equal to or inside of path 'outer'"""
+    outer = os.path.normpath(outer)
+    inner = os.path.normpath(inner)
+
+    return os.path.commonpath([outer, inner]) == outer
+
+
+def dependencies(stages: tp.List[Stage]) -> tp.Dict[str, tp.Set[str]]:
+    """
+    Names of the stages each stage depends on, i.e. the stages writing
+    to one of its inputs (or to a location inside an input directory)
+    """
+    depends = {}
+
+    for stage in stages:
+        depends[stage.name] = {
+            other.name for other in stages
+            if other is not stage and any(
+                contains(output, path) or contains(path, output)
+                for output in other.outputs for path in stage.inputs
+            )
+        }
+
+    return depends
+
+
+def up_to_date(stage: Stage, state: tp.Dict, cwd: str) -> bool:
+    """
+    Whether the last successful run of a stage (from 'state') used the
+    same command, all its outputs still exist and none of its inputs
+    changed since it was started
+    """
+    last_run = state.get(stage.name)
+
+    if last_run is None or last_run["command"] != stage.command:
+        return False
+    if not all(os.path.exists(f"{cwd}/{path}") for path in stage.outputs):
+        return False
+
+    return all(newest_mtime(f"{cwd}/{path}") <= last_run["start"]
+               for path in stage.inputs)
+
+
+def load_state(state_file: str) -> tp.Dict:
+    """Last successful run of each stage (empty if there is none)"""
+    if not os.path.isfile(state_file):
+        return {}
+
+    with open(state_file, "r") as f:
+        return json.load(f)
+
+
+def store_state(state_file: str, state: tp.Dict) -> None:
+    """Write the pipeline state (via a temporary file)"""
+    os.makedirs(os.path.dirname(state_file), exist_ok=True)
+
+    tmp_name = f"{state_file}.{os.getpid()}.tmp"
+    with open(tmp_name, "w") as f:
+        json.dump(state, f, indent=1, sort_keys=True)
+    os.replace(tmp_name, state_file)
+
+
+def run(stages: tp.List[Stage], state_file: str, cwd: str,
+        force: bool = False) -> tp.Dict[str, tp.Tuple[str, float]]:
+    """
+    Run all stages that are not up to date. A stage is started as soon
+    as all stages it depends on are finished, so that independent
+    stages run concurrently. The output of each stage is printed in one
+    block once it is finished.
+
+    :param stages: LIST,
+        Pipeline stages (in the order of the report)
+    :param state_file: STR,
+        File of the last successful run of each stage
+    :param cwd: STR,
+        Working directory of the stages
+    :param force: BOOL,
+        Run all stages, even if they are up to date
+    :return: DICT,
+        Status and wall time (in seconds) of each stage
+    """
+    depends = dependencies(stages)
+    state = load_state(state_file)
+    lock = threading.Lock()
+    results = {}
+
+    def run_stage(stage):
+        start = time.time()
+        wall_start = time.perf_counter()
+
+        process = subprocess.run(stage.command, cwd=cwd,
+                                 stdout=subprocess.PIPE,
+                                 stderr=subprocess.STDOUT, text=True)
+        wall_time = time.perf_counter() - wall_start
+        metrics.timer("stage_run", wall_time, start=start, stage=stage.name,
+                      returncode=process.returncode)
+
+        with lock:
+            print(f"\n##### {stage.name} ({wall_time:.1f} s) #####")
+            print(process.stdout, end="", flush=True)
+
+            if process.returncode != 0:
+                return STATUS_FAIL, wall_time
+
+            state[stage.name] = {"command": stage.command, "start": start}
+            store_state(state_file, state)
+
+        return STATUS_RUN, wall_time
+
+    pending = list(stages)
+    num_pending = len(pending) + 1
+    running = {}
+    with ThreadPoolExecutor(max_workers=max(len(stages), 1)) as pool:
+        while pending or running:
+            for stage in list(pending):
+                status = [results.get(name, (None,))[0]
+                          for name in depends[stage.name]]
+
+                if any(s in (STATUS_FAIL, STATUS_BLOCKED) for s in status):
+                    results[stage.name] = (STATUS_BLOCKED, 0.0)
+                elif all(s is not None for s in status):
+                    # Only decided now, as the stages it depends on might
+                    # just have changed its inputs
+                    if not force and up_to_date(stage, state, cwd):
+                        results[stage.name] = (STATUS_SKIP, 0.0)
+                    else:
+                        running[pool.submit(run_stage, stage)] = stage
+                else:
+                    continue
+
+                pending.remove(stage)
+
+            if not running:
+                # Nothing started and nothing running: the remaining
+                # stages depend on each other
+                assert not pending or len(pending) < num_pending, \
+                    f"CYCLIC STAGE DEPENDENCIES: " \
+                    f"{[stage.name for stage in pending]}!"
+                num_pending = len(pending)
+                continue
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                results[running.pop(future).name] = future.result()
+
+    return {stage.name: results[stage.name] for stage in stages}
+
+
+def report(results: tp.Dict[str, tp.Tuple[str, float]],
+           total_time: float) -> None:
+    """Print status and wall time of each stage"""
+    print("\n##### PIPELINE SUMMARY #####")
+    for name, (status, wall_time) in results.items():
+        print(f"{name:<30} {status:<28} {wall_time:>9.1f} s")
+
+    print(f"{'TOTAL (WALL TIME)':<59} {total_time:>9.1f} s")
+    print(f"{'SUM OF STAGES':<59} "
+          f"{sum(result[1] for result in results.values()):>9.1f} s")
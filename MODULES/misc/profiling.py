@@ -0,0 +1,193 @@
+import os
+import io
+import glob
+import json
+import pstats
+import cProfile
+import contextlib
+import typing as tp
+from MODULES.config import PROFILE_DIR, PROFILE_TOP, PROFILE_MIN_SHARE
+
+# GLOBALS
+# Environment variable with the directory of the profiled run. It is
+# inherited by worker processes (whatever the start method), which then
+# profile their calls as well (see profiled)
+PROFILE_ENV = "PSP_PROFILE_RUN"
+
+# Profiler of the stage and the process it runs in
+_STATE = {"profiler": None, "pid": None, "stage": None}
+
+
+def start(stage: str) -> None:
+    """
+    Profile the current process for the run of 'stage' (deterministic
+    profiler, see finish for the output)
+    """
+    run_dir = f"{PROFILE_DIR}/{stage}"
+    os.makedirs(run_dir, exist_ok=True)
+    for old_file in glob.glob(f"{run_dir}/*.prof"):
+        os.remove(old_file)
+    os.environ[PROFILE_ENV] = run_dir
+
+    _STATE.update(profiler=cProfile.Profile(), pid=os.getpid(), stage=stage)
+    _STATE["profiler"].enable()
+
+
+def active() -> bool:
+    """Whether the stage (or the stage of this worker) is profiled"""
+    return PROFILE_ENV in os.environ
+
+
+@contextlib.contextmanager
+def profiled(name: str):
+    """
+    Profile the enclosed block (e.g. the reduction of one file) if it
+    runs in a worker process of a profiled stage. In the process of the
+    stage itself, the block is covered by the profiler of the stage.
+    Without profiling, this costs one lookup of the environment.
+    """
+    run_dir = os.environ.get(PROFILE_ENV)
+
+    if run_dir is None or os.getpid() == _STATE["pid"]:
+        yield
+        return
+
+    # A forked worker inherits the (running) profiler of the stage,
+    # which would never be written
+    if _STATE["profiler"] is not None:
+        _STATE["profiler"].disable()
+        _STATE["profiler"] = None
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(f"{run_dir}/{name}.{os.getpid()}.prof")
+
+
+def finish(events: tp.List[tp.Dict]) -> None:
+    """
+    Stop profiling the stage and write the results to PROFILE_DIR:
+
+    - <stage>_trace.json: the timed spans of the run (see metrics.timed,
+      labelled with encounter, instrument and file where known) in the
+      Chrome trace format, which can be opened in chrome://tracing,
+      Perfetto or speedscope
+    - <stage>_summary.txt: the PROFILE_TOP functions with the largest
+      cumulative and own time, over the stage and all worker processes
+    - <stage>_stacks.txt: the call stacks of the profile as a flame
+      graph in the collapsed format (see folded_stacks), which can be
+      opened in speedscope or drawn with flamegraph.pl
+    """
+    if _STATE["profiler"] is None or os.getpid() != _STATE["pid"]:
+        return None
+
+    stage = _STATE["stage"]
+    run_dir = f"{PROFILE_DIR}/{stage}"
+    _STATE["profiler"].disable()
+    _STATE["profiler"].dump_stats(f"{run_dir}/stage.{os.getpid()}.prof")
+    _STATE.update(profiler=None, pid=None, stage=None)
+    os.environ.pop(PROFILE_ENV, None)
+
+    # Spans of all timers that know when they started (timestamps and
+    # durations in microseconds)
+    trace = {
+        "traceEvents": [
+            {"name": event["name"], "ph": "X", "pid": event["pid"],
+             "tid": event.get("tid", 0), "ts": event["start"] * 1e6,
+             "dur": event["value"] * 1e6, "args": event.get("labels", {})}
+            for event in events if "start" in event
+        ],
+        "displayTimeUnit": "ms"
+    }
+    with open(f"{PROFILE_DIR}/{stage}_trace.json", "w") as f:
+        json.dump(trace, f, default=lambda value: value.item())
+
+    summary = io.StringIO()
+    stats = pstats.Stats(*sorted(glob.glob(f"{run_dir}/*.prof")),
+                         stream=summary)
+    stats.strip_dirs()
+    for sort_key in ["cumulative", "tottime"]:
+        summary.write(f"##### {stage}: TOP {PROFILE_TOP} BY {sort_key}\n")
+        stats.sort_stats(sort_key).print_stats(PROFILE_TOP)
+
+    with open(f"{PROFILE_DIR}/{stage}_summary.txt", "w") as f:
+        f.write(summary.getvalue())
+
+    with open(f"{PROFILE_DIR}/{stage}_stacks.txt", "w") as f:
+        f.writelines(f"{line}\n" for line in folded_stacks(stats))
+
+    print(f"\nPROFILE OF {stage} WRITTEN TO {PROFILE_DIR}")
+
+    return None
+
+
+def folded_stacks(stats: pstats.Stats,
+                  min_share: float = PROFILE_MIN_SHARE) -> tp.List[str]:
+    """
+    Call stacks of a profile in the collapsed format of flame graphs:
+    one line "caller;...;function microseconds" per stack, with the own
+    time of the last function on that stack.
+
+    cProfile only records pairs of caller and callee, not whole stacks.
+    The time of a function on a stack is therefore split among its
+    callees in proportion to their time when called from it (as in
+    gprof). Recursive calls stay in the time of the outer call, stacks
+    with less than 'min_share' of the total time in that of the caller.
+
+    :param stats: Stats,
+        Profile (e.g. merged over the stage and all worker processes)
+    :param min_share: FLOAT,
+        Smallest share of the total time of a stack that is kept
+    :return: LIST,
+        Lines of the flame graph
+    """
+    callees = {}
+    for function, (*_, callers) in stats.stats.items():
+        for caller, (*_, edge_time) in callers.items():
+            callees.setdefault(caller, []).append((function, edge_time))
+
+    def label(function):
+        file_name, line, name = function
+        return f"{name} ({os.path.basename(file_name)}:{line})" \
+            .replace(";", ",")
+
+    # Stacks start with the time of each function that was not spent
+    # in calls from profiled functions (e.g. called from the unprofiled
+    # main function of a stage)
+    roots = []
+    for function, (*_, total_time, callers) in stats.stats.items():
+        root_time = total_time - sum(
+            edge_time for caller, (*_, edge_time) in callers.items()
+            if caller != function
+        )
+        if root_time > 0:
+            roots.append((function, root_time))
+    min_time = min_share * sum(root_time for _, root_time in roots)
+
+    lines = []
+    pending = [((function,), root_time) for function, root_time in roots]
+    while pending:
+        stack, stack_time = pending.pop()
+        function = stack[-1]
+
+        # Share of the function's total time spent on this stack
+        total_time = stats.stats[function][3]
+        scale = stack_time / total_time if total_time > 0 else 0
+
+        own_time = stack_time
+        for callee, edge_time in callees.get(function, []):
+            callee_time = min(edge_time * scale, own_time)
+            if callee in stack or callee_time < min_time:
+                continue
+            pending.append((stack + (callee,), callee_time))
+            own_time -= callee_time
+
+        micro_seconds = round(own_time * 1e6)
+        if micro_seconds > 0:
+            lines.append(f"{';'.join(label(f) for f in stack)} "
+                         f"{micro_seconds}")
+
+    return sorted(lines)
@@ -0,0 +1,204 @@
+import os
+import zipfile
+import numpy as np
+import pandas as pd
+from MODULES.config import STORAGE_BACKEND
+
+# GLOBALS
+# File extensions of the available storage backends. "npz" is a
+# compressed binary file of typed column arrays, "json" is the old
+# pandas JSON format that is kept for compatibility
+EXTENSIONS = {"npz": ".npz", "json": ".json"}
+HEADER_KEY = "__header__"
+INDEX_KEY = "__index__"
+CATEGORY_PREFIX = "__categories__"
+BLOCK_PREFIX = "block"
+
+
+def file_stem(file_name: str) -> str:
+    """Strip the storage backend extension (if any) from file name"""
+    for extension in EXTENSIONS.values():
+        if file_name.endswith(extension):
+            return file_name[:-len(extension)]
+
+    return file_name
+
+
+def write_frame(file_name: str, data: pd.DataFrame,
+                backend: str = STORAGE_BACKEND) -> str:
+    """
+    Write data frame to file with the chosen backend. The extension of
+    'file_name' is replaced by the one of the backend. Files of the same
+    data set written with other backends are removed, so that readers
+    never fall back to outdated data (see read_frame).
+
+    :param file_name: STR,
+        File name, with or without extension
+    :param data: DataFrame,
+        Data to write
+    :param backend: STR,
+        "npz" or "json"
+    :return: STR,
+        Name of written file
+    """
+    assert backend in EXTENSIONS, f"BACKEND {backend} NOT RECOGNIZED!"
+
+    stem = file_stem(file_name)
+    file_name = f"{stem}{EXTENSIONS[backend]}"
+    remove_other_backends(stem, backend)
+
+    if backend == "json":
+        data.to_json(file_name)
+        return file_name
+
+    # Columns are grouped into one 2D array per data type (like the
+    # blocks of a DataFrame), which keeps the number of arrays in the
+    # file (and the per-array overhead on read-in) small. Categorical
+    # columns (e.g. the instrument) are stored as their codes, with the
+    # categories in an array of their own, and other strings as
+    # fixed-width unicode arrays, so that no pickling is necessary
+    blocks = {}
+    header = []
+    categories = {}
+    for column, series in data.items():
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            categories[f"{CATEGORY_PREFIX}{column}"] = \
+                series.cat.categories.to_numpy().astype(str)
+            values = series.cat.codes.to_numpy()
+        else:
+            values = series.to_numpy()
+        if values.dtype == object:
+            values = values.astype(str)
+        blocks.setdefault(values.dtype.str, []).append(values)
+        header.append((column, values.dtype.str))
+
+    arrays = {
+        HEADER_KEY: np.array(header, dtype=str).reshape(-1, 2),
+        INDEX_KEY: data.index.to_numpy(),
+        **categories
+    }
+    for dtype, columns in blocks.items():
+        arrays[f"{BLOCK_PREFIX}{dtype}"] = np.stack(columns)
+
+    # Same layout as numpy.savez_compressed, but with the fastest zlib
+    # compression level (almost the same file size for this data)
+    with zipfile.ZipFile(file_name, "w", compression=zipfile.ZIP_DEFLATED,
+                         compresslevel=1) as zip_file:
+        for key, array in arrays.items():
+            with zip_file.open(f"{key}.npy", "w", force_zip64=True) as f:
+                np.lib.format.write_array(f, array, allow_pickle=False)
+
+    return file_name
+
+
+def remove_other_backends(stem: str, backend: str) -> None:
+    """Remove the files of data set 'stem' of all but 'backend'"""
+    for other, extension in EXTENSIONS.items():
+        if other != backend and os.path.isfile(f"{stem}{extension}"):
+            os.remove(f"{stem}{extension}")
+
+
+def read_frame(file_name: str) -> pd.DataFrame:
+    """
+    Read data frame from file written with write_frame. The extension
+    of 'file_name' does not matter: the file of the configured backend
+    is preferred, then any other existing one.
+    """
+    stem = file_stem(file_name)
+
+    for backend in backend_order():
+        name = f"{stem}{EXTENSIONS[backend]}"
+
+        if not os.path.isfile(name):
+            continue
+
+        if backend == "json":
+            return pd.read_json(name)
+
+        with np.load(name, allow_pickle=False) as arrays:
+            blocks = {}
+            columns = {}
+            for column, dtype in arrays[HEADER_KEY]:
+                if dtype not in blocks:
+                    blocks[dtype] = iter(arrays[f"{BLOCK_PREFIX}{dtype}"])
+                columns[column] = next(blocks[dtype])
+
+                if f"{CATEGORY_PREFIX}{column}" in arrays.files:
+                    columns[column] = pd.Categorical.from_codes(
+                        columns[column],
+                        arrays[f"{CATEGORY_PREFIX}{column}"]
+                    )
+
+            data = pd.DataFrame(columns, index=arrays[INDEX_KEY])
+
+        return data
+
+    raise FileNotFoundError(f"NO DATA FILE FOR {stem}!")
+
+
+def backend_order() -> list:
+    """Backends in the order they are looked up when reading"""
+    return [STORAGE_BACKEND] + \
+        [backend for backend in EXTENSIONS if backend != STORAGE_BACKEND]
+
+
+def list_frames(directory: str) -> list:
+    """
+    Sorted list of all data files in 'directory', one file name per
+    data set (without extension). If a data set exists for several
+    backends, it is only listed once.
+    """
+    stems = set()
+
+    for name in os.listdir(directory):
+        stem = file_stem(name)
+        if stem != name:
+            stems.add(stem)
+
+    return sorted(stems)
+
+
+def bin_partitions(directory: str, r_min: float = None,
+                   r_max: float = None) -> list:
+    """
+    List of binned data sets (PSP_BIN_<start>-<end>) in 'directory'
+    that overlap the distance range between 'r_min' and 'r_max' (in
+    R_sun). Files of other bins are never opened.
+    """
+    partitions = []
+
+    for stem in list_frames(directory):
+        bin_start, bin_end = [
+            float(value) for value in stem.split("_")[-1].split("-")
+        ]
+
+        if r_min is not None and bin_end <= r_min:
+            continue
+        if r_max is not None and bin_start >= r_max:
+            continue
+
+        partitions.append(stem)
+
+    return partitions
+
+
+def split_partitions(directory: str, encounters: list = None,
+                     directions: list = None) -> list:
+    """
+    List of ingress/egress data sets (<encounter>_<direction>) in
+    'directory', restricted to the given encounters (e.g.
+    "encounter_7") and directions ("INGRESS", "EGRESS")
+    """
+    partitions = []
+
+    for stem in list_frames(directory):
+        encounter, direction = stem.rsplit("_", 1)
+
+        if encounters is not None and encounter not in encounters:
+            continue
+        if directions is not None and direction not in directions:
+            continue
+
+        partitions.append(stem)
+
+    return partitions
@@ -1,37 +1,57 @@
 import sys
+import typing as tp
+from . import metrics
 
 # GLOBALS
 FILE_NAME = f"{sys.path[0]}/EXECUTE_LOG.dat"
 
+# Line labels of the number of data points after each reduction step
+STEP_LABELS = {"raw": "RAW DATA", "dqf": "DQF DATA",
+               "time_avg": "TIME AVG DATA"}
 
-def start_log():
-    """Start the log-file"""
-    with open(FILE_NAME, "w") as f:
-        f.write("# Logging execution of calculation routine.\n\n")
-
-
-def log_encounter(enc_number):
-    """Log encounter number"""
-    with open(FILE_NAME, "a") as f:
-        f.write(f"## CURRENTLY HANDLING {enc_number}\n\n")
+# Reasons why a file was not read (see data_handling.file_metrics)
+SKIP_LABELS = {"cache": "FROM CACHE",
+               "catalogue": "OUTSIDE OF DOMAIN (CATALOGUE)"}
 
 
-def log_inst(name):
-    """Log encounter number"""
-    with open(FILE_NAME, "a") as f:
-        f.write(f"### INSTRUMENT: {name}\n\n")
+def render_log(events: tp.List[tp.Dict]) -> None:
+    """
+    Write the log-file of the data evaluation from the events of its
+    run (see metrics): encounter and instrument sections, and for each
+    file the bytes and time read per CDF variable (or why it was not
+    read), the number of data points after each reduction step and the
+    number of measurements rejected by each quality rule. Wall time and
+    peak memory of the run come last.
+    """
+    lines = ["# Logging execution of calculation routine.\n\n"]
 
+    for event in events:
+        kind, name, value = event["kind"], event["name"], event["value"]
+        labels = event.get("labels", {})
 
-def append_numpts(num_pts, case):
-    """Append length of different reduction steps"""
+        if kind == metrics.MARK and name == "encounter":
+            lines.append(f"## CURRENTLY HANDLING {value}\n\n")
+        elif kind == metrics.MARK and name == "instrument":
+            lines.append(f"### INSTRUMENT: {value}\n\n")
+        elif kind == metrics.TIMER and name == "read_variable":
+            lines.append(f"READ {labels['variable']}:\t "
+                         f"{labels['amount']:.5e} B in {value:.3f} s\n")
+        elif kind == metrics.COUNTER and name == "skipped_file":
+            lines.append(f"NOT READ:\t {SKIP_LABELS[labels['reason']]}\n")
+        elif kind == metrics.COUNTER and name == "data_points":
+            lines.append(f"{STEP_LABELS[labels['step']]}:\t {value:.5e}\n")
+            if labels["step"] == "time_avg":
+                lines.append("\n")
+        elif kind == metrics.COUNTER and name == "rejected":
+            lines.append(f"REJECTED ({labels['rule']}):\t {value:.5e}\n")
+        elif kind == metrics.TIMER and name == "stage":
+            lines.append(f"TOTAL WALL TIME:\t {value:.3f} s\n")
+        elif kind == metrics.MEMORY and name == "peak_memory":
+            lines.append(f"PEAK MEMORY:\t {value:.5e} B\n")
 
-    with open(FILE_NAME, "a") as f:
-        if case == "raw":
-            f.write(f"RAW DATA:\t {num_pts:.5e}\n")
-        if case == "dqf":
-            f.write(f"DQF DATA:\t {num_pts:.5e}\n")
-        if case == "time_avg":
-            f.write(f"TIME AVG DATA:\t {num_pts:.5e}\n\n")
+    # Written at once (the log used to be reopened for every line)
+    with open(FILE_NAME, "w") as f:
+        f.write("".join(lines))
 
 
 def eof_comparison(out_filename, sim_eq, sim_pol, mli_ml, psp):
@@ -45,17 +65,17 @@ def eof_comparison(out_filename, sim_eq, sim_pol, mli_ml, psp):
             f"AT 40 Rs:\n\n"
             f"\t\t EQ\t\t POL\t\t PSP\n\n"
             f"VR\t\t {sim_eq.vr[-1]:.0f}\t\t "
-            f"{sim_pol.vr[-1]:.0f}\t\t {psp.vr.mean.values[-1]:.0f}\n\n"
+            f"{sim_pol.vr[-1]:.0f}\t\t {psp.vr.mean[-1]:.0f}\n\n"
             f"NP\t\t {sim_eq.np[-1]:.1e}\t\t "
-            f"{sim_pol.np[-1]:.1e}\t\t {psp.np.mean.values[-1]:.1e}\n\n"
+            f"{sim_pol.np[-1]:.1e}\t\t {psp.np.mean[-1]:.1e}\n\n"
             f"T\t\t {sim_eq.T[-1]:.1e}\t\t "
-            f"{sim_pol.T[-1]:.1e}\t\t {psp.T.mean.values[-1]:.1e}\n\n"
+            f"{sim_pol.T[-1]:.1e}\t\t {psp.T.mean[-1]:.1e}\n\n"
             f"RP\t\t {sim_eq.rampressure[-1]:.1e}\t\t "
             f"{sim_pol.rampressure[-1]:.1e}\t\t "
-            f"{psp.rampressure.mean.values[-1]:.1e}\n\n"
+            f"{psp.rampressure.mean[-1]:.1e}\n\n"
             f"ML\t\t {sim_eq.massloss[-1]:.1e}\t\t "
             f"{mli_ml[-1]:.1e}\t\t "
-            f"{psp.massloss.mean.values[-1]:.1e}\n\n"
+            f"{psp.massloss.mean[-1]:.1e}\n\n"
         )
 
     pass
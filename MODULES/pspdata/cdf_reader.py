@@ -0,0 +1,198 @@
+import os
+import time
+import numpy as np
+import typing as tp
+from MODULES.misc.lazy import LazyModule
+
+# CDF library (is needed to interface with the measurement data files)
+# see https://cdf.gsfc.nasa.gov/. spacepy is imported on first use (see
+# LazyModule), runs that only read the cache or stand-ins never load it
+os.environ["CDF_LIB"] = "/data/home/simons97/LocalApplications/cdf/lib"
+pycdf = LazyModule("spacepy.pycdf")
+
+# GLOBALS
+# Extension of local stand-ins for CDF files: uncompressed numpy
+# archives with one array per CDF variable (e.g. the synthetic data of
+# MODULES/pspdata/data_synthetic.py), read in place of the CDF file
+STANDIN_EXTENSION = ".npz"
+
+
+def open_file(file_name: str):
+    """
+    Open a CDF file, or its stand-in (see STANDIN_EXTENSION). Both are
+    mappings of variable names to records that can be sliced, and both
+    have to be closed.
+    """
+    if file_name.endswith(STANDIN_EXTENSION):
+        return StandInFile(file_name)
+
+    return pycdf.CDF(file_name)
+
+
+class CDFReader:
+    """
+    Reader of the variables of one CDF file (or of its stand-in, see
+    open_file). The variables that are
+    needed have to be declared, each of them is read from the file only
+    once (on first access) and then handed out from memory. The number
+    of bytes read and the time spent reading are recorded per variable
+    in 'read_stats'. With restrict, only some ranges of records are
+    read (and handed out as if the file had no other records).
+
+    Use as context manager, the file is closed when leaving the block:
+
+        with CDFReader(file_name, ["Epoch", "np_fit"]) as reader:
+            epoch = reader["Epoch"]
+    """
+
+    def __init__(self, file_name: str, variables: tp.List[str]):
+        self.file_name = file_name
+        self.variables = list(variables)
+        self.cdf = None
+        self.values = {}
+        self.read_stats = {}
+        self.ranges = None
+
+    def __enter__(self):
+        self.cdf = open_file(self.file_name)
+
+        # SANITY CHECK: all declared variables have to be in the file
+        missing = [key for key in self.variables if key not in self.cdf]
+        if missing:
+            self.close()
+            raise KeyError(f"VARIABLES {missing} NOT IN {self.file_name}!")
+
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self) -> None:
+        """Close the CDF file (values read so far stay available)"""
+        if self.cdf is not None:
+            self.cdf.close()
+            self.cdf = None
+
+    def __getitem__(self, key: str) -> np.ndarray:
+        """All values of variable 'key' (read from file only once)"""
+        if key not in self.values:
+            if self.ranges is None:
+                self.values[key] = self.read(key, ...)
+            else:
+                self.values[key] = self.read_records(key, 0, self.size())
+
+        return self.values[key]
+
+    def restrict(self, ranges: tp.List[tp.Tuple[int, int]]) -> None:
+        """
+        Only read (and hand out) the records in 'ranges', a sorted list
+        of (start, stop) record numbers, from now on. Variables that are
+        already in memory are reduced to these records as well.
+        """
+        self.ranges = [(int(start), int(stop)) for start, stop in ranges]
+
+        for key, values in self.values.items():
+            self.values[key] = np.concatenate(
+                [values[:0]] + [values[start:stop]
+                                for start, stop in self.ranges]
+            )
+
+    def size(self) -> int:
+        """Number of records in the restricted ranges"""
+        return sum(stop - start for start, stop in self.ranges)
+
+    def records(self, key: str):
+        """
+        View of the records of variable 'key' that reads only the
+        records that are sliced (e.g. to process a large variable in
+        chunks), without keeping them in memory
+        """
+        return RecordView(self, key)
+
+    def num_records(self, key: str) -> int:
+        """Number of records of variable 'key' (without reading them)"""
+        if key in self.values:
+            return len(self.values[key])
+        if self.ranges is not None:
+            return self.size()
+
+        return len(self.cdf[key])
+
+    def read(self, key: str, index) -> np.ndarray:
+        """Read 'index' (e.g. a slice of records) of variable 'key'"""
+        # SANITY CHECK: only declared variables are read
+        assert key in self.variables, \
+            f"VARIABLE {key} NOT DECLARED FOR {self.file_name}!"
+        assert self.cdf is not None, f"{self.file_name} IS CLOSED!"
+
+        start = time.perf_counter()
+        values = np.asarray(self.cdf[key][index])
+        read_time = time.perf_counter() - start
+
+        stats = self.read_stats.setdefault(key, {"bytes": 0, "seconds": 0.})
+        stats["bytes"] += values.nbytes
+        stats["seconds"] += read_time
+
+        return values
+
+    def read_records(self, key: str, start: int, stop: int) -> np.ndarray:
+        """
+        Read records 'start' to 'stop' of variable 'key', counted within
+        the restricted ranges (see restrict)
+        """
+        pieces = [self.read(key, slice(0, 0))]
+        offset = 0
+
+        for range_start, range_stop in self.ranges:
+            first = max(start - offset, 0)
+            last = min(stop - offset, range_stop - range_start)
+            if first < last:
+                pieces.append(self.read(key, slice(range_start + first,
+                                                   range_start + last)))
+            offset += range_stop - range_start
+
+        return np.concatenate(pieces)
+
+
+class RecordView:
+    """Records of one CDF variable, read on slicing (see CDFReader)"""
+
+    def __init__(self, reader: CDFReader, key: str):
+        self.reader = reader
+        self.key = key
+
+    def __len__(self) -> int:
+        return self.reader.num_records(self.key)
+
+    def __getitem__(self, index) -> np.ndarray:
+        if self.reader.ranges is None:
+            return self.reader.read(self.key, index)
+
+        # Only (step 1) slices within the restricted ranges
+        start, stop, _ = index.indices(len(self))
+        return self.reader.read_records(self.key, start, stop)
+
+
+class StandInFile:
+    """
+    Stand-in for a CDF file (see open_file). Unlike CDF variables, the
+    arrays of a numpy archive can only be loaded as a whole, so each
+    variable is loaded once and then sliced from memory.
+    """
+
+    def __init__(self, file_name: str):
+        self.archive = np.load(file_name, allow_pickle=False)
+        self.arrays = {}
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.archive.files
+
+    def __getitem__(self, key: str) -> np.ndarray:
+        if key not in self.arrays:
+            self.arrays[key] = self.archive[key]
+
+        return self.arrays[key]
+
+    def close(self) -> None:
+        self.archive.close()
+        self.arrays = {}
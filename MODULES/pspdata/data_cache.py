@@ -0,0 +1,118 @@
+import os
+import hashlib
+import numpy as np
+from MODULES.config import CACHE_DIR, CACHE_MAX_SIZE
+
+# GLOBALS
+# Increase when the reduction of a CDF file changes, so that old cache
+# entries are not used anymore
+CACHE_VERSION = 4
+LENGTH_PREFIX = "length_"
+
+
+def file_hash(file_name: str) -> str:
+    """SHA-256 hash of file content, read in chunks of 1 MB"""
+    file_hasher = hashlib.sha256()
+
+    with open(file_name, "rb") as f:
+        for chunk in iter(lambda: f.read(2 ** 20), b""):
+            file_hasher.update(chunk)
+
+    return file_hasher.hexdigest()
+
+
+def cache_key(file_name: str, inst: str, *settings,
+              content_hash: str = None) -> str:
+    """
+    Key of the cache entry of a CDF file. Besides the file content, all
+    settings that change the reduced data (time window, distance
+    restriction, ...) have to be passed to be part of the key. A known
+    'content_hash' of the file (e.g. from the data catalogue) saves
+    reading the whole file.
+    """
+    if content_hash is None:
+        content_hash = file_hash(file_name)
+
+    key_hasher = hashlib.sha256()
+    key_hasher.update(content_hash.encode())
+
+    for item in (CACHE_VERSION, inst) + settings:
+        key_hasher.update(f"|{item}".encode())
+
+    return key_hasher.hexdigest()
+
+
+def cache_file(key: str) -> str:
+    """Location of a cache entry"""
+    return f"{CACHE_DIR}/{key}.npz"
+
+
+def load(key: str):
+    """
+    Load the data columns and reduction step lengths of a cache entry.
+    Returns None if there is no entry for 'key'.
+    """
+    file_name = cache_file(key)
+
+    if not os.path.isfile(file_name):
+        return None
+
+    with np.load(file_name, allow_pickle=False) as cached:
+        columns = {}
+        lengths = {}
+
+        for name in cached.files:
+            if name.startswith(LENGTH_PREFIX):
+                lengths[name[len(LENGTH_PREFIX):]] = int(cached[name])
+            else:
+                columns[name] = cached[name]
+
+    # Update modification time, which marks the entry as recently used
+    # for the eviction
+    os.utime(file_name)
+
+    return columns, lengths
+
+
+def store(key: str, columns: dict, lengths: dict) -> None:
+    """Write data columns and reduction step lengths to the cache"""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+
+    entries = dict(columns)
+    for case, length in lengths.items():
+        entries[f"{LENGTH_PREFIX}{case}"] = np.array(length)
+
+    # Write to a temporary file first, so that an interrupted run (or a
+    # parallel worker) never leaves a half-written entry behind
+    file_name = cache_file(key)
+    tmp_name = f"{file_name[:-4]}.{os.getpid()}.tmp.npz"
+    np.savez(tmp_name, **entries)
+    os.replace(tmp_name, file_name)
+
+
+def evict(max_size: int = CACHE_MAX_SIZE, cache_dir: str = CACHE_DIR) -> None:
+    """
+    Remove least recently used cache entries until the total size of
+    the cache is below 'max_size' (in bytes). Other caches of npz files
+    that mark their entries as used in the same way (see load) can be
+    kept within their size by passing their 'cache_dir'.
+    """
+    if not os.path.isdir(cache_dir):
+        return None
+
+    entries = []
+    for name in os.listdir(cache_dir):
+        if not name.endswith(".npz"):
+            continue
+        stat = os.stat(f"{cache_dir}/{name}")
+        entries.append((stat.st_mtime, stat.st_size, name))
+
+    total_size = sum(entry[1] for entry in entries)
+
+    for _, size, name in sorted(entries):
+        if total_size <= max_size:
+            break
+        os.remove(f"{cache_dir}/{name}")
+        total_size -= size
+
+    return None
@@ -0,0 +1,159 @@
+import os
+import json
+import numpy as np
+import typing as tp
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from MODULES.config import CATALOGUE_FILE
+from MODULES.misc import profiling
+from . import data_cache
+from . import data_transformation as dt
+from .cdf_reader import CDFReader
+
+# GLOBALS
+# Increase when the content of the catalogue entries changes
+CATALOGUE_VERSION = 1
+
+# Variable with the spacecraft position of each instrument (see
+# distance)
+POSITION_VARIABLES = {"SPC": "sc_pos_HCI", "SPAN-I": "SUN_DIST"}
+
+# Record ranges separated by fewer records than this are read as one
+# range (the records in between are rejected by the distance rule)
+MAX_RANGE_GAP = 1024
+
+
+def distance(reader: CDFReader, inst: str) -> np.ndarray:
+    """
+    Heliocentric distance (km) of all records of a CDF file, computed
+    the same way as the "posR" column of the reduced data
+    """
+    position = reader[POSITION_VARIABLES[inst]]
+
+    if inst == "SPC":
+        return dt.pos_cart_to_sph(position[:, 0], position[:, 1],
+                                  position[:, 2])[0]
+
+    return position
+
+
+def file_entry(file_name: str, inst: str) -> tp.Dict:
+    """
+    Catalogue entry of a CDF file: size, modification time, content
+    hash, number of records and range of epoch (integer nanoseconds)
+    and distance (km). Only the epoch and position variables are read.
+    Profiled in worker processes in profiling mode (see
+    profiling.profiled).
+    """
+    stat = os.stat(file_name)
+
+    with profiling.profiled(f"catalogue_{os.path.basename(file_name)}"), \
+            CDFReader(file_name, ["Epoch", POSITION_VARIABLES[inst]]) \
+            as reader:
+        epoch = dt.epoch_to_ns(reader["Epoch"])
+        r = np.asarray(distance(reader, inst), dtype=np.float64)
+
+    # Ranges of empty files (or of all-NaN positions) are None
+    valid_r = r[~np.isnan(r)]
+
+    return {
+        "version": CATALOGUE_VERSION,
+        "inst": inst,
+        "size": stat.st_size,
+        "mtime": stat.st_mtime_ns,
+        "hash": data_cache.file_hash(file_name),
+        "num_records": int(epoch.size),
+        "epoch_min": int(epoch.min()) if epoch.size else None,
+        "epoch_max": int(epoch.max()) if epoch.size else None,
+        "r_min": float(valid_r.min()) if valid_r.size else None,
+        "r_max": float(valid_r.max()) if valid_r.size else None
+    }
+
+
+def load() -> tp.Dict:
+    """Catalogue of all files seen so far (empty if there is none yet)"""
+    if not os.path.isfile(CATALOGUE_FILE):
+        return {}
+
+    with open(CATALOGUE_FILE, "r") as f:
+        return json.load(f)
+
+
+def store(catalogue: tp.Dict) -> None:
+    """Write the catalogue (via a temporary file, see data_cache.store)"""
+    os.makedirs(os.path.dirname(CATALOGUE_FILE), exist_ok=True)
+
+    tmp_name = f"{CATALOGUE_FILE}.{os.getpid()}.tmp"
+    with open(tmp_name, "w") as f:
+        json.dump(catalogue, f, indent=1, sort_keys=True)
+    os.replace(tmp_name, CATALOGUE_FILE)
+
+
+def up_to_date(entry: tp.Dict, file_name: str, inst: str) -> bool:
+    """Whether 'entry' still describes the file (same size and mtime)"""
+    stat = os.stat(file_name)
+
+    return entry.get("version") == CATALOGUE_VERSION \
+        and entry["inst"] == inst \
+        and entry["size"] == stat.st_size \
+        and entry["mtime"] == stat.st_mtime_ns
+
+
+def refresh(file_names: tp.List[str], inst: str,
+            workers: int = 1) -> tp.List[tp.Dict]:
+    """
+    Catalogue entries of 'file_names'. Only new files and files that
+    changed size or modification time are read, the updated catalogue
+    is written back.
+
+    :param file_names: LIST,
+        CDF files of one instrument
+    :param inst: STR,
+        Instrument of the files ("SPC" or "SPAN-I")
+    :param workers: INT,
+        Number of worker processes for reading the files
+    :return: LIST,
+        Entries of the files, in the order of 'file_names'
+    """
+    catalogue = load()
+    keys = [os.path.abspath(file_name) for file_name in file_names]
+
+    outdated = [file_name for file_name, key in zip(file_names, keys)
+                if key not in catalogue
+                or not up_to_date(catalogue[key], file_name, inst)]
+
+    if outdated:
+        if workers > 1 and len(outdated) > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                entries = list(pool.map(file_entry, outdated, repeat(inst)))
+        else:
+            entries = [file_entry(file_name, inst) for file_name in outdated]
+
+        for file_name, entry in zip(outdated, entries):
+            catalogue[os.path.abspath(file_name)] = entry
+
+        store(catalogue)
+
+    return [catalogue[key] for key in keys]
+
+
+def domain_ranges(in_domain: np.ndarray,
+                  max_gap: int = MAX_RANGE_GAP) -> tp.List[tp.Tuple]:
+    """
+    Contiguous (start, stop) record ranges covering all records marked
+    in 'in_domain'. Ranges that are separated by less than 'max_gap'
+    records are joined, to keep the number of reads small.
+    """
+    # Rising and falling edges of the mask are the range boundaries
+    edges = np.diff(np.concatenate(([0], in_domain.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    stops = np.flatnonzero(edges == -1)
+
+    ranges = []
+    for start, stop in zip(starts.tolist(), stops.tolist()):
+        if ranges and start - ranges[-1][1] < max_gap:
+            ranges[-1] = (ranges[-1][0], stop)
+        else:
+            ranges.append((start, stop))
+
+    return ranges
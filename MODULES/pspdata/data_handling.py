@@ -1,81 +1,241 @@
 import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 import numpy as np
 import pandas as pd
+from . import data_cache
+from . import data_catalogue
+from . import data_schema
+from .cdf_reader import CDFReader
+from . import data_quality as dq
 from . import data_quality_spc as dqspc
 from . import data_quality_span as dqspan
 from . import data_transformation as dt
-from MODULES.misc import write_log
-from astropy.constants import R_sun
+from MODULES.misc import metrics
+from MODULES.misc import profiling
+from MODULES.constants import R_SUN
 
 # GLOBALS
 TIME_WINDOW = 10    # Time averaging window in seconds
+NS_PER_SECOND = 10 ** 9
+MAX_DISTANCE = 40   # Outer boundary of simulation domain in R_sun
+MAX_DISTANCE_KM = MAX_DISTANCE * R_SUN / 1e3   # The same in km (posR)
 
-# CDF library (is needed to interface with the measurement data files)
-# see https://cdf.gsfc.nasa.gov/
-os.environ["CDF_LIB"] = "/data/home/simons97/LocalApplications/cdf/lib"
-from spacepy import pycdf
+# CDF variables read for each instrument
+SPC_VARIABLES = ["general_flag", "Epoch", "sc_pos_HCI", "vp_fit_RTN",
+                 "np_fit", "wp_fit"]
+SPAN_VARIABLES = ["QUALITY_FLAG", "Epoch", "SUN_DIST", "VEL_RTN_SUN",
+                  "SC_VEL_RTN_SUN", "DENS", "TEMP", "EFLUX_VS_PHI"]
 
 
-def encounter_data(folder, data_frame, inst):
-    """Mother-loop for encounter period data stored in 'folder'"""
+def encounter_data(folder, data_frame, inst, workers=1, cache="use"):
+    """
+    Mother-loop for encounter period data stored in 'folder'. With more
+    than one worker, the files are reduced in parallel processes. Files
+    that lie completely outside of the simulation domain (according to
+    the data catalogue) are not read at all.
+
+    'cache' sets the handling of reduced files in the cache: "use"
+    (read from and write to cache), "rebuild" (only write) or "off"
+    """
     # SANITY CHECK: only SPC and SPAN-I allowed
     legal_inst = ["SPC", "SPAN-I"]
     assert inst in legal_inst, \
         "Only SPC and SPAN-I allowed!"
-
-    for file in sorted(os.listdir(folder)):
+    assert cache in ["use", "rebuild", "off"], \
+        f"Cache mode {cache} not recognized!"
+
+    files = sorted(os.listdir(folder))
+    file_names = [f"{folder}/{file}" for file in files]
+    entries = data_catalogue.refresh(file_names, inst, workers)
+
+    # Pool.map returns results in the order of the input, independent
+    # of which worker finishes first, so the merging and logging below
+    # stays in date order
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(file_data, file_names, repeat(inst),
+                                    repeat(cache), entries))
+    else:
+        results = map(file_data, file_names, repeat(inst), repeat(cache),
+                      entries)
+
+    frames = [data_frame]
+    for file, (columns, events) in zip(files, results):
         # Sanity check: print current file name
         print(f"CURRENTLY HANDLING {file}")
 
-        # Initialize empty data frame
-        data = pd.DataFrame()
+        # Metrics of the file (possibly collected in a worker process),
+        # added to the run in the order of the files
+        metrics.extend(events)
 
-        # open CDF file and generate pandas DataFrame that stores
-        # data from file
-        cdf_data = pycdf.CDF(f"{folder}/{file}")
+        frames.append(data_schema.from_arrays(columns))
 
-        # Either SPC or SPAN
-        if inst == "SPC":
-            data = data_generation_spc(cdf_data)
+    # Add the DataFrames of one encounter to the total array at once
+    return pd.concat(frames)
 
-        if inst == "SPAN-I":
-            data = data_generation_span(cdf_data)
 
-        # Add the DataFrame of one encounter to the total array
-        data_frame = pd.concat([data_frame, data])
+def file_data(file_name, inst, cache="use", entry=None):
+    """
+    Generate the time-averaged data of a single CDF file (see
+    reduce_file), together with the metrics events of the file (see
+    file_metrics). The events are returned instead of recorded, as this
+    might run in a worker process. In profiling mode, the call is
+    profiled in worker processes as well (see profiling.profiled).
+    """
+    # Encounter of the file (data/<encounter>/<instrument>/<file>)
+    encounter = os.path.basename(os.path.dirname(os.path.dirname(
+        os.path.abspath(file_name))))
+
+    with metrics.capture() as events, \
+            profiling.profiled(os.path.basename(file_name)):
+        wall_start = time.time()
+        start = time.perf_counter()
+        columns, lengths, read_stats = reduce_file(file_name, inst, cache,
+                                                   entry)
+        file_metrics(lengths, read_stats)
+
+        # Throughput of the file in bytes read per second (nothing is
+        # read for files from the cache)
+        metrics.timer(
+            "file", time.perf_counter() - start,
+            amount=sum(stats["bytes"] for stats in read_stats.values()),
+            start=wall_start, file=os.path.basename(file_name),
+            encounter=encounter, inst=inst, cached=not read_stats
+        )
+
+    return columns, events
+
+
+def file_metrics(lengths, read_stats):
+    """
+    Record bytes and time read per CDF variable (or why the file was not
+    read: taken from the cache, or outside of the simulation domain
+    according to the catalogue), the number of data points after each
+    reduction step and the number of measurements rejected by each
+    quality rule (in the order of the log-file, see
+    write_log.render_log)
+    """
+    if not read_stats:
+        metrics.counter("skipped_file", 1, reason="cache")
+    elif not any(stats["bytes"] for stats in read_stats.values()):
+        metrics.counter("skipped_file", 1, reason="catalogue")
+    else:
+        for key, stats in read_stats.items():
+            metrics.timer("read_variable", stats["seconds"],
+                          amount=stats["bytes"], variable=key)
+
+    for case in ["raw", "dqf"]:
+        metrics.counter("data_points", lengths[case], step=case)
+
+    for case, length in lengths.items():
+        if case.startswith(dq.REJECTED_PREFIX):
+            metrics.counter("rejected", length,
+                            rule=case[len(dq.REJECTED_PREFIX):])
 
-    return data_frame
+    metrics.counter("data_points", lengths["time_avg"], step="time_avg")
 
 
-def cdf_slice(cdf_file, key: str):
+def reduce_file(file_name, inst, cache="use", entry=None):
     """
-    Simple call to specific slice of cdf data.
-    
-    :param cdf_file: Name of cdf file
-    :param key: Name of desired key from cdf file
-    :return: Data slice
+    Time-averaged data of a single CDF file, as a dictionary of column
+    arrays in the column schema (see data_schema.to_arrays, cheap to
+    send back from a worker process), together with the number of data
+    points after each reduction step and the read statistics of the CDF
+    variables. 'entry' is the catalogue entry of the file (see
+    data_catalogue), which decides the records that have to be read.
     """
-    return cdf_file[key][...]
+    # The cache key covers the file content and all settings that
+    # change the reduced data
+    if cache != "off":
+        key = data_cache.cache_key(
+            file_name, inst, TIME_WINDOW, MAX_DISTANCE,
+            data_schema.SCHEMA_VERSION,
+            content_hash=None if entry is None else entry["hash"]
+        )
+
+        if cache == "use":
+            cached = data_cache.load(key)
+            if cached is not None:
+                return cached + ({},)
+
+    # Read the CDF file (closed when leaving the block) and generate
+    # pandas DataFrame that stores data from file
+    if inst == "SPC":
+        with CDFReader(file_name, SPC_VARIABLES) as reader:
+            unread = domain_records(reader, inst, entry)
+            data, lengths = data_generation_spc(reader)
 
+    else:
+        with CDFReader(file_name, SPAN_VARIABLES) as reader:
+            unread = domain_records(reader, inst, entry)
+            data, lengths = data_generation_span(reader)
 
-def data_generation_spc(cdf_file) -> pd.DataFrame:
+    # Records that were not read are outside of the domain, they count
+    # as rejected by the distance rule
+    lengths[f"{dq.REJECTED_PREFIX}distance"] += unread
+
+    columns = data_schema.to_arrays(data)
+
+    if cache != "off":
+        data_cache.store(key, columns, lengths)
+
+    return columns, lengths, reader.read_stats
+
+
+def domain_records(reader: CDFReader, inst: str, entry=None) -> int:
+    """
+    Restrict the reader to the records within the simulation domain
+    (see distance_restriction). With the catalogue entry of the file,
+    files completely outside of the domain are not read at all and files
+    completely inside are read as a whole. Otherwise, the position
+    variable is read first to find the record ranges within the domain.
+    Measurements outside of the domain that are still read (in short
+    gaps between ranges) are removed by the distance rule.
+
+    :param reader: CDFReader of the file
+    :param inst: STR,
+        Instrument ("SPC" or "SPAN-I")
+    :param entry: DICT,
+        Catalogue entry of the file (optional)
+    :return: INT,
+        Number of records that are not read
+    """
+    num_records = reader.num_records("Epoch")
+
+    if entry is not None and entry["r_min"] is not None \
+            and entry["r_min"] > MAX_DISTANCE_KM:
+        reader.restrict([])
+    elif entry is not None and entry["r_max"] is not None \
+            and entry["r_max"] <= MAX_DISTANCE_KM:
+        return 0
+    else:
+        in_domain = data_catalogue.distance(reader, inst) <= MAX_DISTANCE_KM
+        reader.restrict(data_catalogue.domain_ranges(in_domain))
+
+    return num_records - reader.num_records("Epoch")
+
+
+def data_generation_spc(reader: CDFReader) -> pd.DataFrame:
     """
     Generate dictionary of measurement data from cdf file and turn into
     pandas DataFrame.
     
-    :param cdf_file: CDF file
-    :return: DataFrame,
-        Data frame of measurements
+    :param reader: CDFReader of the file (see SPC_VARIABLES)
+    :return: DataFrame, DICT
+        Data frame of measurements (in the column schema, see
+        data_schema), number of data points after each reduction step
     """
     data_dict = {
-        "dqf": cdf_slice(cdf_file, key="general_flag"),
-        "epoch": cdf_slice(cdf_file, key="Epoch"),
-        "posX": cdf_slice(cdf_file, key="sc_pos_HCI")[:, 0],
-        "posY": cdf_slice(cdf_file, key="sc_pos_HCI")[:, 1],
-        "posZ": cdf_slice(cdf_file, key="sc_pos_HCI")[:, 2],
-        "vr": cdf_slice(cdf_file, key="vp_fit_RTN")[:, 0],
-        "np": cdf_slice(cdf_file, key="np_fit"),
-        "wp": cdf_slice(cdf_file, key="wp_fit")
+        "dqf": reader["general_flag"],
+        "epoch": dt.epoch_to_ns(reader["Epoch"]),
+        "posX": reader["sc_pos_HCI"][:, 0],
+        "posY": reader["sc_pos_HCI"][:, 1],
+        "posZ": reader["sc_pos_HCI"][:, 2],
+        "vr": reader["vp_fit_RTN"][:, 0],
+        "np": reader["np_fit"],
+        "wp": reader["wp_fit"]
     }
 
     # Create a pandas DataFrame Object and restrict to simulation domain
@@ -87,157 +247,223 @@ def data_generation_spc(cdf_file) -> pd.DataFrame:
         dt.pos_cart_to_sph(data.posX, data.posY, data.posZ)
     data["Temp"] = dt.wp_to_temp(data["wp"])
 
-    # Distance restriction and first logging
-    distance_restriction(data)
-    length_raw = data.shape[0]
-    write_log.append_numpts(length_raw, case="raw")
-
-    # Indices of non-usable data from general flag + reduction
-    bad_ind = dqspc.general_flag(data.dqf.values)
-    data.drop(bad_ind, inplace=True)
-    data.reset_index(drop=True, inplace=True)
+    # Distance restriction, non-usable data from general flag and
+    # "-1e-30" measurements, reduced all at once
+    num_meas = data.shape[0]
+    data, rejected = dq.apply_rules(data, SPC_RULES)
 
-    # Additional reduction from "-1e-30" meas. indices + reduction
-    mf_ind = dqspc.full_meas_eval(data)
-    data.drop(mf_ind, inplace=True)
-    data.reset_index(drop=True, inplace=True)
-    length_dqf = data.shape[0]
-    write_log.append_numpts(length_dqf, case="dqf")
+    # Logging ("raw" is the number of measurements within the domain)
+    lengths = {"raw": num_meas - rejected["distance"],
+               "dqf": data.shape[0]}
+    lengths.update(dq.rejection_lengths(rejected))
 
-    if not data.empty:
-        data["epoch"] = data["epoch"].apply(pd.Timestamp.to_julian_date) \
-                        * 86400     # In Seconds
+    # Time averaging (in double precision, the result is stored in the
+    # column schema)
+    data_tavg = data_schema.conform(time_averaging(data), "SPC")
+    lengths["time_avg"] = data_tavg.shape[0]
 
-    # Time averaging
-    data_tavg = time_averaging(data)
-    length_timeavg = data.shape[0]
-    write_log.append_numpts(length_timeavg, case="time_avg")
+    return data_tavg, lengths
 
-    return data_tavg
 
-
-def data_generation_span(cdf_file) -> pd.DataFrame:
+def data_generation_span(reader: CDFReader) -> pd.DataFrame:
     """
     Generate dictionary of measurement data from cdf file and turn into
     pandas DataFrame.
 
-    :param cdf_file: CDF file
-    :return: DataFrame,
-        Data frame of measurements
+    :param reader: CDFReader of the file (see SPAN_VARIABLES)
+    :return: DataFrame, DICT
+        Data frame of measurements (in the column schema, see
+        data_schema), number of data points after each reduction step
     """
+    num_meas = len(reader["Epoch"])
     data_dict = {
-        "dqf": cdf_slice(cdf_file, key="QUALITY_FLAG"),
-        "epoch": cdf_slice(cdf_file, key="Epoch"),
-        "posX": np.zeros(len(cdf_slice(cdf_file, key="Epoch"))),
-        "posY": np.zeros(len(cdf_slice(cdf_file, key="Epoch"))),
-        "posZ": np.zeros(len(cdf_slice(cdf_file, key="Epoch"))),
-        "posR": cdf_slice(cdf_file, key="SUN_DIST"),
+        "dqf": reader["QUALITY_FLAG"],
+        "epoch": dt.epoch_to_ns(reader["Epoch"]),
+        "posR": reader["SUN_DIST"],
 
         # In the case of SPAN-I, the ion velocity has to be corrected
         # by the spacecraft velocity
-        "vr": cdf_slice(cdf_file, key="VEL_RTN_SUN")[:, 0] -
-              cdf_slice(cdf_file, key="SC_VEL_RTN_SUN")[:, 0],
+        "vr": reader["VEL_RTN_SUN"][:, 0] - reader["SC_VEL_RTN_SUN"][:, 0],
 
-        "np": cdf_slice(cdf_file, key="DENS"),
-        "wp": np.zeros(len(cdf_slice(cdf_file, key="Epoch"))),
-        "Temp": cdf_slice(cdf_file, key="TEMP")
+        "np": reader["DENS"],
+        "Temp": reader["TEMP"]
     }
     # Create pandas DataFrame Object
     data = pd.DataFrame(data_dict)
 
-    # Prepare data quality assessment through FOV
-    dq_eflux = cdf_slice(cdf_file, key="EFLUX_VS_PHI")
-    fov_peak_idx = dqspan.array_peak(dq_eflux)
-    data["fov_peak_idx"] = fov_peak_idx
+    # Prepare data quality assessment through FOV (the flux variable is
+    # handed over directly and read in chunks of records)
+    data["fov_peak_idx"] = dqspan.array_peak(reader.records("EFLUX_VS_PHI"))
 
-    # Distance restriction (also cuts FOV index) and logging
-    distance_restriction(data)
-    length_raw = data.shape[0]
-    write_log.append_numpts(length_raw, case="raw")
+    # Reduce data by overall spacecraft distance and FOV coverage, all
+    # at once
+    data, rejected = dq.apply_rules(data, SPAN_RULES)
 
-    # Reduce data by FOV coverage and overall spacecraft distance
-    fov_idx = dqspan.fov_restriction(data["fov_peak_idx"])
-    data.drop(index=fov_idx, inplace=True)
-    length_dqf = data.shape[0]
-    write_log.append_numpts(length_dqf, case="dqf")
+    # Logging ("raw" is the number of measurements within the domain)
+    lengths = {"raw": num_meas - rejected["distance"],
+               "dqf": data.shape[0]}
+    lengths.update(dq.rejection_lengths(rejected))
 
     # Make conversion of temperature
     data.Temp = dt.ev_to_kelvin(data.Temp)
 
-    if not data.empty:
-        data["epoch"] = data["epoch"].apply(pd.Timestamp.to_julian_date) \
-                        * 86400  # In Seconds
-
-    # Time averaging
-    data_tavg = time_averaging(data)
-    length_timeavg = data.shape[0]
-    write_log.append_numpts(length_timeavg, case="time_avg")
+    # Time averaging (in double precision, the result is stored in the
+    # column schema)
+    data_tavg = data_schema.conform(time_averaging(data), "SPAN")
+    lengths["time_avg"] = data_tavg.shape[0]
 
-    return data_tavg
+    return data_tavg, lengths
 
 
 def distance_restriction(data_frame):
     """
-    Restrict evaluated data to distances below 40 R_sol, which is the
-    boundary of the simulation domain
+    Restrict evaluated data to distances below MAX_DISTANCE (40 R_sol),
+    which is the boundary of the simulation domain. Returns a boolean
+    mask of the measurements within the domain (posR is in km).
     """
-    idx = data_frame.index[data_frame["posR"] > 40 * R_sun / 1e3].tolist()
-    data_frame.drop(index=idx, inplace=True)
-    data_frame.reset_index(inplace=True)
+    data_schema.check_units(MAX_DISTANCE_KM, data_schema.UNITS["posR"],
+                            lambda u, c: MAX_DISTANCE * c.R_sun)
+
+    return data_frame["posR"].to_numpy() <= MAX_DISTANCE_KM
+
 
+# Quality rules of each instrument, see data_quality.apply_rules
+SPC_RULES = [
+    ("distance", distance_restriction),
+    ("general_flag", lambda data: dqspc.general_flag(data["dqf"])),
+    ("failed_meas", dqspc.full_meas_eval)
+]
+SPAN_RULES = [
+    ("distance", distance_restriction),
+    ("fov", lambda data: dqspan.fov_restriction(data["fov_peak_idx"]))
+]
 
+
+@metrics.timed_function
 def time_averaging(data):
     """
     Generating time-averaged data by moving a time window (specified
-    through 'TIME_WINDOW')
+    through 'TIME_WINDOW'). The epoch (integer nanoseconds) stays an
+    integer column, all other columns are averaged as floats.
     """
-    # Generate empty data frame with same column headers as data
-    averaged_frame = pd.DataFrame(columns=data.columns)
+    # Only numeric columns can be averaged, but the column headers of
+    # data are kept in the returned frame
+    numeric = data.select_dtypes(include=["number", "bool"])
 
-    # Store the length of frame (number of measurements) for later
-    # reference
-    size = data.shape[0]
+    # Start indices of all windows. The last measurement is never part
+    # of a window (see window_starts). The window is given in integer
+    # nanoseconds as well, so the boundaries are exact
+    epoch = data["epoch"].to_numpy()
+    starts = window_starts(epoch, TIME_WINDOW * NS_PER_SECOND)
 
-    # Start index and end index for time window initialization
-    start_idx = 0
-    end_idx = 0
+    # Slice out everything but the last measurement and reduce all
+    # columns at once over the contiguous window segments. NaN values
+    # are skipped, as in DataFrame.mean()
+    averages = np.empty((starts.size, numeric.shape[1]))
 
-    # Desired time window in seconds
-    time_window = TIME_WINDOW
+    if starts.size > 0:
+        values = numeric.to_numpy(dtype=np.float64)[:data.shape[0] - 1]
+        valid = ~np.isnan(values)
+        sums = np.add.reduceat(np.where(valid, values, 0), starts, axis=0)
+        counts = np.add.reduceat(valid, starts, axis=0)
 
-    # The loop can last until the start_idx reaches the end of the data
-    # array (size - 1 translates length to index number!)
-    while start_idx < size - 1:
+        averages.fill(np.nan)
+        np.divide(sums, counts, out=averages, where=counts > 0)
 
-        # Initialize time delta variable
-        time_delta = 0
+    averaged_frame = pd.DataFrame(averages, columns=numeric.columns)
+    averaged_frame["epoch"] = window_mean_epoch(epoch, starts)
 
-        # Loop can last while time_delta stays below window size
-        while time_delta < time_window:
+    return averaged_frame.reindex(columns=data.columns)
 
-            # Iteratively increase end_idx to size the window
-            end_idx += 1
 
-            # If end_idx hits the end of the array, stop (again,
-            # size - 1 translates length to index number)
-            if end_idx == size - 1:
+def window_mean_epoch(epoch: np.ndarray, starts: np.ndarray) -> np.ndarray:
+    """
+    Mean epoch (integer nanoseconds) of each window. The sums are taken
+    over the offsets to the window start, which can neither overflow nor
+    lose precision, unlike the sums of the epochs themselves.
+    """
+    if starts.size == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    window_epoch = epoch[:epoch.size - 1]
+    lengths = np.diff(np.append(starts, window_epoch.size))
+    offsets = window_epoch - np.repeat(epoch[starts], lengths)
+
+    mean_offsets = np.add.reduceat(offsets, starts) / lengths
+
+    return epoch[starts] + np.rint(mean_offsets).astype(np.int64)
+
+
+def window_starts(epoch: np.ndarray, time_window: float) -> np.ndarray:
+    """
+    Determine the start indices of consecutive averaging windows.
+
+    A window starting at index s ends before the first index e > s with
+    epoch[e] - epoch[s] >= time_window, and the next window starts at e.
+    The last measurement is never included in a window: if no such e is
+    found before the end of the array, the window stops at size - 1.
+
+    :param epoch: NDARRAY,
+        Measurement time stamps (integer nanoseconds, or seconds)
+    :param time_window: INT, FLOAT,
+        Size of the averaging window in units of 'epoch'
+    :return: NDARRAY,
+        Start indices of all windows
+    """
+    size = len(epoch)
+    if size < 2:
+        return np.array([], dtype=np.int64)
+
+    index = np.arange(size)
+
+    if np.all(epoch[1:] >= epoch[:-1]):
+        # For sorted epochs, the end of a window starting at any index
+        # can be found for all indices in one call. For float epochs, the
+        # result is then corrected for floating point round-off, so that
+        # the boundary is decided by the same difference as in the scalar
+        # definition (integer epochs are exact already)
+        end = np.searchsorted(epoch, epoch + time_window, side="left")
+        end = np.clip(end, index + 1, size)
+
+        while True:
+            back = end > index + 1
+            back[back] = epoch[end[back] - 1] - epoch[index[back]] \
+                >= time_window
+            if not back.any():
+                break
+            end[back] -= 1
+
+        while True:
+            fwd = end < size
+            fwd[fwd] = epoch[end[fwd]] - epoch[index[fwd]] < time_window
+            if not fwd.any():
                 break
+            end[fwd] += 1
 
-            # Determine time delta size (this loops back to the top if
-            # the time_delta is smaller than the window)
-            time_delta = data.epoch.iloc[end_idx] - data.epoch.iloc[start_idx]
+        end = np.minimum(end, size - 1).tolist()
 
-        # Once window size is reached or surpassed, slice out the window
-        # of the data set (excluding end_idx, which would bring the time
-        # window above the threshold and is given by iloc[a:b])
-        data_window = data.iloc[start_idx:end_idx]
-        avg = data_window.mean(numeric_only=True).to_frame().T
+    else:
+        # Unsorted epochs have to be scanned sequentially (windows do
+        # not overlap, so this is still a single pass)
+        end = None
 
-        # Extend the averaged_frame with the new result
-        averaged_frame = pd.concat(objs=[averaged_frame, avg])
+    # Walk the chain of windows, where every window starts at the end
+    # of the previous one
+    starts = []
+    start_idx = 0
+
+    while start_idx < size - 1:
+        starts.append(start_idx)
+
+        if end is not None:
+            start_idx = end[start_idx]
+            continue
+
+        end_idx = start_idx + 1
+        while end_idx < size - 1 and \
+                epoch[end_idx] - epoch[start_idx] < time_window:
+            end_idx += 1
 
-        # Set the old end_idx as the new start_idx (making them equal again)
-        # This is done here so the loop exits correctly.
         start_idx = end_idx
 
-    return averaged_frame
+    return np.array(starts, dtype=np.int64)
@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+import typing as tp
+
+# GLOBALS
+# Prefix of the rejection counts of the quality rules in the dictionary
+# of reduction step lengths (see data_handling)
+REJECTED_PREFIX = "rejected_"
+
+
+def apply_rules(data: pd.DataFrame,
+                rules: tp.List[tp.Tuple[str, tp.Callable]]) -> tp.Tuple:
+    """
+    Reduce data by a list of quality rules. Each rule is a function
+    that returns a boolean mask of the accepted measurements of the
+    (unreduced) data frame. All masks are combined and the data is
+    reduced in one step.
+
+    :param data: DataFrame,
+        Measurement data
+    :param rules: LIST,
+        (name, function) of each rule, in order of application
+    :return: TUPLE,
+        Reduced data frame, number of measurements rejected by each
+        rule (a measurement failing several rules is only counted for
+        the first of them)
+    """
+    accepted = np.ones(data.shape[0], dtype=bool)
+    rejected = {}
+
+    for name, rule in rules:
+        mask = np.asarray(rule(data), dtype=bool)
+        rejected[name] = int(np.count_nonzero(accepted & ~mask))
+        accepted &= mask
+
+    return data.take(np.flatnonzero(accepted)), rejected
+
+
+def rejection_lengths(rejected: tp.Dict[str, int]) -> tp.Dict[str, int]:
+    """Rejection counts as entries of the reduction step lengths"""
+    return {f"{REJECTED_PREFIX}{name}": count
+            for name, count in rejected.items()}
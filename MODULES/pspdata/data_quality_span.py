@@ -1,12 +1,17 @@
 import numpy as np
 
+# GLOBALS
+# Number of spectra read at once when determining the flux peaks (8 PHI
+# bins of 4-byte floats are 2 MB per chunk)
+PEAK_CHUNK = 2 ** 16
+
 
 def fov_restriction(peak_idx):
     """
     As suggested by R. Livi, the SPAN-I data is conservatively sorted by
     determining the azimuth bin of the flux peak, and then only accepted
     when the peak bin is approx. 150 degrees (where 180 would be the
-    heat shield)
+    heat shield). Returns a boolean mask of the accepted measurements.
     """
     # Hard-code the critical index here. There are 8 PHI-bins for SPAN
     # between (roughly) 180 and 100 degrees. According to Dr. Livi,
@@ -15,14 +20,23 @@ def fov_restriction(peak_idx):
     # so the first two indices (0, 1) are definitely too high, index 2
     # might be arguable (~152 degrees)
     crit_index = 1
-    fov_idx = np.where(peak_idx <= crit_index)[0]
+    fov_mask = np.asarray(peak_idx) > crit_index
 
-    return fov_idx
+    return fov_mask
 
 
-def array_peak(array):
-    """Get peak indices for nested array"""
+def array_peak(array, chunk_size=PEAK_CHUNK):
+    """
+    Get peak indices for nested array (index of the maximum of each
+    row). 'array' can also be a CDF variable, which is then read in
+    chunks of 'chunk_size' records, so that the full 2D array is never
+    in memory at once.
+    """
     num_meas = len(array)
-    peak_idx = np.array([np.argmax(array[i]) for i in range(num_meas)])
+    peak_idx = np.empty(num_meas, dtype=np.intp)
+
+    for start in range(0, num_meas, chunk_size):
+        chunk = np.asarray(array[start:start + chunk_size])
+        peak_idx[start:start + chunk.shape[0]] = np.argmax(chunk, axis=1)
 
     return peak_idx
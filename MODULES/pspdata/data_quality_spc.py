@@ -4,7 +4,7 @@ import pandas as pd
 
 def general_flag(general_flag_array: np.ndarray) -> np.ndarray:
     """
-    This function reads out index locations where data general flag is
+    This function marks the measurements where the data general flag is
     set to 0 (see documentation for PSP data). This requires correct
     handling of CDF array keys
 
@@ -12,58 +12,43 @@ def general_flag(general_flag_array: np.ndarray) -> np.ndarray:
         cdf_data["general_flag"][...] - Only good when set to 0. The
         input here must specifically be this array!
     :return: NDARRAY,
-        An array of the "faulty" indices. These indices correspond to
-        the index m in the m x n GENERAL CDF array, not a measurement
+        Boolean mask of the "good" measurements. The mask corresponds
+        to the index m in the m x n GENERAL CDF array, not a measurement
         subarray!
     """
     # Notable indices are where values are set to non-zero
     # From the data user guide: 0 means no condition present
-    index_list = np.asarray(general_flag_array != 0).nonzero()[0]
-
-    # This is the previous call. The numpy documentation encourages
-    # the use of .nonzero() over .where()
-    # index_list = np.where(general_flag_array != 0)[0]
-
-    return index_list
+    return np.asarray(general_flag_array) == 0
 
 
 def meas_failed(meas_array: np.ndarray) -> np.ndarray:
     """
-    Takes a 1D array and returns indices of failed measurements (as
-    indicated by a value of -1e30, SWEAP documentation)
+    Takes a 1D array and marks failed measurements (as indicated by a
+    value of -1e30, SWEAP documentation)
     
     :param meas_array: NDARRAY,
         Measurement array
     :return: NDARRAY,
-        Index array
+        Boolean mask of failed measurements
     """
-    index_list = np.asarray(meas_array <= -0.5e30).nonzero()[0]
-
-    # Again, numpy documentation suggests using the above instead of
-    # np.where()
-    # index_array = np.where(meas_array <= -0.5e30)[0]
-    
-    return index_list
+    return np.asarray(meas_array) <= -0.5e30
 
 
-def full_meas_eval(data_dict: pd.DataFrame):
+def full_meas_eval(data_dict: pd.DataFrame) -> np.ndarray:
     """
-    Assess additional failure indices by evaluating all desired
-    measurement values.
+    Assess additional failures by evaluating all desired measurement
+    values.
     
     :param data_dict: DataFrame,
         Data Frame of PSP measurement data
-    :return: LIST,
-        List of "bad" indices
+    :return: NDARRAY,
+        Boolean mask of measurements where none of the values failed
     """
-    col_ind = []
+    failed = np.zeros(data_dict.shape[0], dtype=bool)
 
     # This is very static, but should not make a problem as I am only
     # interested in these three parameters!
     for key in ["vr", "np", "wp"]:
-        col_ind.append(meas_failed(data_dict[key]))
-    
-    # Make an array of unique indices
-    col_ind = np.unique(np.concatenate(col_ind))
+        failed |= meas_failed(data_dict[key])
     
-    return col_ind
+    return ~failed
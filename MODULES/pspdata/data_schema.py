@@ -0,0 +1,148 @@
+import numpy as np
+import pandas as pd
+import typing as tp
+from MODULES.misc import storage
+from MODULES.config import UNIT_VALIDATION, UNIT_TOLERANCE
+
+# GLOBALS
+# Version of the column schema of the cleaned PSP measurements. Increase
+# when columns or data types change (it is part of the cache and
+# pyramid settings, so that old data is not mixed with new data)
+SCHEMA_VERSION = 1
+
+# Instrument tag of each measurement, stored as category (one byte per
+# measurement instead of a Python string)
+INST_COLUMN = "Inst"
+INSTRUMENTS = ["SPC", "SPAN"]
+INST_DTYPE = pd.CategoricalDtype(INSTRUMENTS)
+
+# Columns of the cleaned measurements (in order) and their data types.
+# Measurements are stored in single precision, which is still far more
+# precise than the instruments. The distance decides the bin of each
+# measurement and stays in double precision (in single precision, it
+# would only be exact to about 2 km at 40 R_sun, which moves data points
+# close to a bin edge into the neighbouring bin). All statistics are
+# still computed in double precision, they only change by the rounding
+# of the measurements (relative 1e-7, or absolute 1e-7 rad for angles
+# with a mean close to 0)
+COLUMNS = {
+    "epoch": np.dtype(np.int64),    # Nanoseconds since 1970-01-01 (UTC)
+    "posR": np.dtype(np.float64),   # Heliocentric distance [km]
+    "posTH": np.dtype(np.float32),  # Inclination [rad] (SPC only)
+    "posPH": np.dtype(np.float32),  # Azimuth [rad] (SPC only)
+    "vr": np.dtype(np.float32),     # Radial velocity [km/s]
+    "np": np.dtype(np.float32),     # Proton density [cm^-3]
+    "Temp": np.dtype(np.float32),   # Proton temperature [K]
+    INST_COLUMN: INST_DTYPE
+}
+
+# Units of the numeric columns (as parsed by astropy.units). The data
+# is held as plain floats in these units, astropy is only used to check
+# them in validation mode (see check_units)
+UNITS = {
+    "epoch": "ns",
+    "posR": "km",
+    "posTH": "rad",
+    "posPH": "rad",
+    "vr": "km / s",
+    "np": "cm-3",
+    "Temp": "K"
+}
+
+
+def conform(data: pd.DataFrame, inst: str = None) -> pd.DataFrame:
+    """
+    Cleaned measurements in the column schema: only the columns of
+    COLUMNS (in that order, missing ones are NaN), with their data
+    types.
+
+    :param data: DataFrame,
+        Measurement data (e.g. time-averaged data of one file, or data
+        read from a file of an older version)
+    :param inst: STR,
+        Instrument tag of all measurements ("SPC" or "SPAN"), if 'data'
+        has no instrument column yet
+    :return: DataFrame,
+        Data in the column schema
+    """
+    # SANITY CHECK: only known instruments allowed
+    assert inst is None or inst in INSTRUMENTS, \
+        f"INSTRUMENT {inst} NOT RECOGNIZED!"
+
+    columns = {}
+    for name, dtype in COLUMNS.items():
+        if name == INST_COLUMN and inst is not None:
+            columns[name] = pd.Categorical.from_codes(
+                np.full(data.shape[0], INSTRUMENTS.index(inst), np.int8),
+                dtype=INST_DTYPE
+            )
+        elif name in data:
+            columns[name] = data[name].astype(dtype)
+        else:
+            columns[name] = np.full(data.shape[0], np.nan, dtype=dtype)
+
+    return pd.DataFrame(columns, index=data.index)
+
+
+def to_arrays(data: pd.DataFrame) -> tp.Dict[str, np.ndarray]:
+    """
+    Column arrays of data in the column schema (e.g. for the cache or
+    to send back from a worker process). The instrument column is
+    returned as its category codes, so that no array is of object type.
+    """
+    arrays = {name: data[name].to_numpy() for name in COLUMNS
+              if name != INST_COLUMN}
+    arrays[INST_COLUMN] = data[INST_COLUMN].cat.codes.to_numpy()
+
+    return arrays
+
+
+def from_arrays(arrays: tp.Dict[str, np.ndarray]) -> pd.DataFrame:
+    """Data frame of column arrays written by to_arrays"""
+    columns = {name: arrays[name] for name in COLUMNS
+               if name != INST_COLUMN}
+    columns[INST_COLUMN] = pd.Categorical.from_codes(arrays[INST_COLUMN],
+                                                     dtype=INST_DTYPE)
+
+    return pd.DataFrame(columns)
+
+
+def read_samples(file_name: str) -> pd.DataFrame:
+    """
+    Cleaned measurements from file (see storage.read_frame), in the
+    column schema also if the file was written by an older version
+    """
+    return conform(storage.read_frame(file_name))
+
+
+def check_units(values, unit: str, reference: tp.Callable) -> None:
+    """
+    Validation mode (see UNIT_VALIDATION in config): compare 'values',
+    plain floats in 'unit' (e.g. UNITS["Temp"]), with the same quantity
+    computed with astropy units. Without validation mode, nothing is
+    done (and astropy is not imported).
+
+    :param values: NDARRAY, FLOAT,
+        Result of a unit conversion on plain floats
+    :param unit: STR,
+        Unit of 'values'
+    :param reference: CALLABLE,
+        Computes the quantity with units from the modules
+        astropy.units and astropy.constants (passed as arguments)
+    """
+    if not UNIT_VALIDATION:
+        return None
+
+    import astropy.units
+    import astropy.constants
+
+    expected = astropy.units.Quantity(
+        reference(astropy.units, astropy.constants)
+    ).to_value(unit)
+
+    # SANITY CHECK: float result has to match astropy
+    assert np.allclose(values, expected, rtol=UNIT_TOLERANCE, atol=0,
+                       equal_nan=True), \
+        f"VALUES IN {unit} DO NOT MATCH ASTROPY UNITS!"
+
+    return None
@@ -0,0 +1,263 @@
+import os
+import numpy as np
+import pandas as pd
+import typing as tp
+from MODULES.constants import R_SUN, GM_SUN, AU, K_B, M_P, EV
+from .cdf_reader import STANDIN_EXTENSION
+
+# GLOBALS
+# Orbit of PSP during encounters 7 to 9 (perihelion and aphelion in
+# R_sun, inclination of the orbit to the solar equator and argument of
+# the perihelion) and perihelion time of each encounter (UTC)
+PERIHELION = 16.0
+APHELION = 157.0
+INCLINATION = np.deg2rad(3.4)
+ARG_PERIHELION = np.deg2rad(60.)
+PERIHELIA = {
+    "encounter_7": "2021-01-17T17:40",
+    "encounter_8": "2021-04-29T08:48",
+    "encounter_9": "2021-08-09T19:11"
+}
+
+# Length of an encounter phase in days (centred on the perihelion, it
+# reaches beyond the simulation domain on both sides)
+ENCOUNTER_DAYS = 11
+
+# Solar wind at 1 AU (density in cm^-3, temperature in K), speed of the
+# slow and the fast wind (km/s) and period of the stream structure that
+# the spacecraft passes through (hours)
+DENSITY_1AU = 7.
+TEMPERATURE_1AU = 1e5
+SLOW_WIND = 300.
+FAST_WIND = 600.
+STREAM_PERIOD = 30.
+
+# Fraction of SPC measurements with a set general flag and of failed
+# fits (all fit values set to FILL_VALUE), see data_quality_spc
+SPC_FLAGGED = 0.1
+SPC_FAILED = 0.02
+FILL_VALUE = -1e30
+
+# Probability of the azimuth bin of the flux peak of SPAN-I (index 0 is
+# closest to the heat shield, peaks in bins 0 and 1 are rejected, see
+# data_quality_span)
+NUM_PHI_BINS = 8
+PHI_PEAK_PROBABILITY = [0.1, 0.15, 0.2, 0.2, 0.15, 0.1, 0.05, 0.05]
+
+# File names of one day of measurements of each instrument (as in the
+# SWEAP archive)
+FILE_NAMES = {
+    "SPC": "psp_swp_spc_l3i_{day}_v02" + STANDIN_EXTENSION,
+    "SPAN-I": "psp_swp_spi_sf00_l3_mom_inst_{day}_v04" + STANDIN_EXTENSION
+}
+
+
+def orbit(epoch: np.ndarray, perihelion: str) -> tp.Tuple:
+    """
+    Position and velocity of the spacecraft on a Kepler orbit (see
+    PERIHELION and APHELION) through the perihelion at 'perihelion'
+
+    :param epoch: NDARRAY,
+        Time of each record (datetime64)
+    :param perihelion: STR,
+        Time of the perihelion (UTC, ISO format)
+    :return: TUPLE,
+        Heliocentric position (km, n x 3), radial and tangential
+        velocity of the spacecraft (km/s)
+    """
+    q = PERIHELION * R_SUN
+    a = (APHELION + PERIHELION) / 2 * R_SUN
+    ecc = (APHELION - PERIHELION) / (APHELION + PERIHELION)
+
+    # Mean anomaly, and eccentric anomaly from Kepler's equation (Newton
+    # iteration, starting from the guess of Danby)
+    seconds = (epoch - np.datetime64(perihelion)) / np.timedelta64(1, "s")
+    mean_anomaly = np.sqrt(GM_SUN / a ** 3) * seconds
+    anomaly = mean_anomaly + 0.85 * ecc * np.sign(np.sin(mean_anomaly))
+
+    for _ in range(50):
+        step = (anomaly - ecc * np.sin(anomaly) - mean_anomaly) / \
+            (1 - ecc * np.cos(anomaly))
+        anomaly -= step
+        if np.all(np.abs(step) < 1e-12):
+            break
+
+    r = a * (1 - ecc * np.cos(anomaly))
+    true_anomaly = 2 * np.arctan2(np.sqrt(1 + ecc) * np.sin(anomaly / 2),
+                                  np.sqrt(1 - ecc) * np.cos(anomaly / 2))
+
+    # Specific angular momentum gives both velocity components
+    momentum = np.sqrt(GM_SUN * q * (1 + ecc))
+    v_radial = GM_SUN / momentum * ecc * np.sin(true_anomaly)
+    v_tangential = momentum / r
+
+    # Orbit plane, tilted against the solar equator by INCLINATION
+    angle = true_anomaly + ARG_PERIHELION
+    position = np.column_stack([r * np.cos(angle),
+                                r * np.sin(angle) * np.cos(INCLINATION),
+                                r * np.sin(angle) * np.sin(INCLINATION)])
+
+    return position / 1e3, v_radial / 1e3, v_tangential / 1e3
+
+
+def solar_wind(epoch: np.ndarray, r: np.ndarray,
+               rng: np.random.Generator) -> tp.Tuple:
+    """
+    Radial speed (km/s), proton density (cm^-3) and temperature (K) of
+    the solar wind at the distances 'r' (km): slow and fast streams
+    passing by, the density falling with r^-2 and the temperature with
+    r^-0.7 (each with log-normal fluctuations)
+    """
+    hours = (epoch - epoch[0]) / np.timedelta64(1, "h")
+    streams = (0.5 + 0.5 * np.sin(2 * np.pi * hours / STREAM_PERIOD)) ** 4
+    r_au = r * 1e3 / AU
+
+    speed = (SLOW_WIND + (FAST_WIND - SLOW_WIND) * streams) * \
+        rng.normal(1, 0.05, r.size)
+    density = DENSITY_1AU * r_au ** -2 * SLOW_WIND / speed * \
+        rng.lognormal(0, 0.3, r.size)
+    temperature = TEMPERATURE_1AU * r_au ** -0.7 * (1 + streams) * \
+        rng.lognormal(0, 0.3, r.size)
+
+    return speed, density, temperature
+
+
+def record_epoch(perihelion: str, num_records: int,
+                 rng: np.random.Generator) -> np.ndarray:
+    """
+    Time of 'num_records' records, evenly spread over the encounter
+    phase around 'perihelion' with a random jitter of the cadence
+    """
+    start = np.datetime64(perihelion, "ns") - \
+        np.timedelta64(ENCOUNTER_DAYS * 12, "h")
+    cadence = ENCOUNTER_DAYS * 86400e9 / num_records
+
+    offsets = (np.arange(num_records) + rng.uniform(0, 0.5, num_records)) \
+        * cadence
+
+    return start + offsets.astype(np.int64).astype("timedelta64[ns]")
+
+
+def spc_variables(perihelion: str, num_records: int,
+                  rng: np.random.Generator) -> tp.Dict:
+    """CDF variables of SPC (see data_handling.SPC_VARIABLES)"""
+    epoch = record_epoch(perihelion, num_records, rng)
+    position, _, _ = orbit(epoch, perihelion)
+    speed, density, temperature = solar_wind(
+        epoch, np.linalg.norm(position, axis=1), rng
+    )
+
+    velocity = np.column_stack([speed, rng.normal(0, 20, num_records),
+                                rng.normal(0, 20, num_records)])
+    thermal_speed = np.sqrt(2 * K_B * temperature / M_P) / 1e3
+
+    # Flagged measurements and failed fits
+    general_flag = np.where(rng.random(num_records) < SPC_FLAGGED,
+                            rng.integers(1, 16, num_records), 0)
+    failed = rng.random(num_records) < SPC_FAILED
+    velocity[failed] = FILL_VALUE
+    density[failed] = FILL_VALUE
+    thermal_speed[failed] = FILL_VALUE
+
+    return {
+        "general_flag": general_flag.astype(np.int32),
+        "Epoch": epoch,
+        "sc_pos_HCI": position,
+        "vp_fit_RTN": velocity,
+        "np_fit": density,
+        "wp_fit": thermal_speed
+    }
+
+
+def span_variables(perihelion: str, num_records: int,
+                   rng: np.random.Generator) -> tp.Dict:
+    """CDF variables of SPAN-I (see data_handling.SPAN_VARIABLES)"""
+    epoch = record_epoch(perihelion, num_records, rng)
+    position, v_radial, v_tangential = orbit(epoch, perihelion)
+    distance = np.linalg.norm(position, axis=1)
+    speed, density, temperature = solar_wind(epoch, distance, rng)
+
+    # The ion velocity is measured in the spacecraft frame
+    sc_velocity = np.column_stack([v_radial, v_tangential,
+                                   np.zeros(num_records)])
+    velocity = sc_velocity + np.column_stack(
+        [speed, rng.normal(0, 20, num_records),
+         rng.normal(0, 20, num_records)]
+    )
+
+    # Flux over the azimuth bins, with the peak in a random bin
+    peak = rng.choice(NUM_PHI_BINS, num_records, p=PHI_PEAK_PROBABILITY)
+    flux = rng.lognormal(18, 0.5, (num_records, NUM_PHI_BINS))
+    flux[np.arange(num_records), peak] *= 10
+
+    # SPAN-I gives the temperature in eV
+    temperature_ev = temperature * K_B / EV
+
+    return {
+        "QUALITY_FLAG": np.zeros(num_records, dtype=np.int32),
+        "Epoch": epoch,
+        "SUN_DIST": distance,
+        "VEL_RTN_SUN": velocity.astype(np.float32),
+        "SC_VEL_RTN_SUN": sc_velocity.astype(np.float32),
+        "DENS": density.astype(np.float32),
+        "TEMP": temperature_ev.astype(np.float32),
+        "EFLUX_VS_PHI": flux.astype(np.float32)
+    }
+
+
+def write_files(folder: str, inst: str, variables: tp.Dict) -> None:
+    """
+    Write the records of 'variables' to one stand-in file per day (see
+    FILE_NAMES), via a temporary file (see data_cache.store)
+    """
+    os.makedirs(folder, exist_ok=True)
+
+    days = variables["Epoch"].astype("datetime64[D]")
+    starts = np.flatnonzero(np.concatenate(([True], days[1:] != days[:-1])))
+    ends = np.append(starts[1:], days.size)
+
+    for start, end in zip(starts, ends):
+        day = pd.Timestamp(days[start]).strftime("%Y%m%d")
+        file_name = f"{folder}/{FILE_NAMES[inst].format(day=day)}"
+        tmp_name = f"{file_name[:-4]}.{os.getpid()}.tmp.npz"
+
+        np.savez(tmp_name, **{key: values[start:end]
+                              for key, values in variables.items()})
+        os.replace(tmp_name, file_name)
+
+
+def write_encounter(folder: str, num_records: int,
+                    perihelion: str = PERIHELIA["encounter_8"],
+                    seed: int = 0) -> None:
+    """
+    Write synthetic measurements of one encounter phase to the layout
+    of the data directory ('folder'/SPC and 'folder'/SPAN-I), which
+    can be evaluated like the CDF files of the archive
+
+    :param folder: STR,
+        Encounter folder (e.g. data/encounter_8)
+    :param num_records: INT,
+        Number of records of each instrument
+    :param perihelion: STR,
+        Time of the perihelion (UTC, ISO format, see PERIHELIA)
+    :param seed: INT,
+        Seed of the random fluctuations (the same seed gives the same
+        files)
+    """
+    rng = np.random.default_rng(seed)
+
+    write_files(f"{folder}/SPC", "SPC",
+                spc_variables(perihelion, num_records, rng))
+    write_files(f"{folder}/SPAN-I", "SPAN-I",
+                span_variables(perihelion, num_records, rng))
+
+
+def write_encounters(root: str, num_records: int,
+                     encounters: tp.List[str] = None, seed: int = 0) -> None:
+    """
+    Write synthetic measurements of 'encounters' (all encounters of
+    PERIHELIA by default) to the data directory 'root'
+    """
+    for i, encounter in enumerate(encounters or list(PERIHELIA)):
+        write_encounter(f"{root}/{encounter}", num_records,
+                        PERIHELIA[encounter], seed + i)
@@ -1,6 +1,7 @@
 import numpy as np
-# The warnings (for me) here don't seem to matter
-from astropy.constants import k_B, m_p
+import pandas as pd
+from MODULES.constants import K_B, M_P, EV
+from MODULES.pspdata import data_schema
 
 
 def pos_cart_to_sph(x, y, z):
@@ -26,8 +27,15 @@ def wp_to_temp(thermal_speed: np.ndarray) -> np.ndarray:
 		Temperature from wp = sqrt(2k_BT / m)
 	"""
 	wp_si = thermal_speed * 1e3
+	temperature = wp_si ** 2 * M_P / (2 * K_B)
+
+	data_schema.check_units(
+		temperature, data_schema.UNITS["Temp"],
+		lambda u, c: (np.asarray(thermal_speed) * u.km / u.s) ** 2 * c.m_p
+		/ (2 * c.k_B)
+	)
 	
-	return wp_si ** 2 * m_p.value / (2 * k_B.value)
+	return temperature
 
 
 def ev_to_kelvin(electron_volts: np.ndarray) -> np.ndarray:
@@ -35,8 +43,27 @@ def ev_to_kelvin(electron_volts: np.ndarray) -> np.ndarray:
 	Translation from eV unit for temperature (who thought that was a
 	good idea?) to K
 	"""
+	# SPAN-I gives single precision values, the division by k_B is done
+	# in double precision
+	temperature = np.divide(electron_volts * EV, K_B, dtype=np.float64)
+
+	data_schema.check_units(
+		temperature, data_schema.UNITS["Temp"],
+		lambda u, c: np.asarray(electron_volts) * EV * u.J / c.k_B
+	)
+
+	return temperature
 
-	return electron_volts * 1.60217653e-19 / k_B
+
+def epoch_to_ns(epoch_array: np.ndarray) -> np.ndarray:
+	"""
+	Transforms absolute time (datetime.datetime or datetime64, UTC) into
+	integer nanoseconds since 1970-01-01, converting the whole array at
+	once
+	"""
+	# pandas parses arrays of datetime objects a lot faster than numpy
+	return np.asarray(pd.to_datetime(epoch_array),
+	                  dtype="datetime64[ns]").view(np.int64)
 
 
 def abs_to_rel_time(epoch_array: np.ndarray) -> np.ndarray:
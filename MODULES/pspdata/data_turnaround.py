@@ -2,11 +2,15 @@ import sys
 import os
 import numpy as np
 import pandas as pd
-from astropy.constants import R_sun
+from MODULES.constants import R_SUN
+from MODULES.misc import storage
 
 # Global variables (save directory for individual data)
 SAVE_DIR = f"{sys.path[0]}/STATISTICS/SPLIT_DATA"
 
+# Designation of the turn-around points (in neither ingress nor egress)
+TURNAROUND = "TURNAROUND"
+
 # SANITY CHECK: Does the data directory even exist?
 if not os.path.isdir(SAVE_DIR):
 	print(f"\n{SAVE_DIR} IS NOT A VALID DIRECTORY!\n")
@@ -16,7 +20,37 @@ if not os.path.isdir(SAVE_DIR):
 def ingress_egress_slicing(encounter_num, encounter_data):
 	"""
 	Slice encounter data array into ingress and egress period through
-	minimum of distance array
+	minimum of distance array. Returns the parts (see
+	ingress_egress_parts), so that they do not have to be sliced again.
+	"""
+	parts = ingress_egress_parts(encounter_data)
+
+	# Save the data of both periods (the turn-around points are not
+	# part of either of them)
+	for designation, df in parts:
+		if designation == TURNAROUND:
+			continue
+
+		# Write to files
+		file_name = f"{SAVE_DIR}/{encounter_num}_{designation}"
+		storage.write_frame(file_name, df)
+
+	return parts
+
+
+def ingress_egress_parts(encounter_data):
+	"""
+	Split encounter data into ingress and egress period through minimum
+	of distance array (of each instrument separately). The turn-around
+	points themselves are returned as a part of their own, so that all
+	parts together hold all data points of the encounter.
+
+	:param encounter_data: DataFrame,
+		Data of one encounter (SPC and SPAN, see "Inst" column)
+	:return: LIST,
+		(designation, DataFrame) of each part, where designation is
+		"INGRESS" or "EGRESS" (decided by the distance at start and end
+		of the part), the turn-around points come last as TURNAROUND
 	"""
 	# Initialize designation
 	designation = "unclear"
@@ -38,8 +72,12 @@ def ingress_egress_slicing(encounter_num, encounter_data):
 	# Combine again
 	data_part1 = pd.concat(objs=[span_in, spc_in], ignore_index=True)
 	data_part2 = pd.concat(objs=[span_out, spc_out], ignore_index=True)
-	
-	# Save the data from both dictionary
+	data_turn = pd.concat(
+		objs=[span_data.iloc[[tap_span], :], spc_data.iloc[[tap_spc], :]],
+		ignore_index=True
+	)
+
+	parts = []
 	for df in [data_part1, data_part2]:
 
 		# Skip if there are now entries in the ingress/egress data
@@ -48,19 +86,19 @@ def ingress_egress_slicing(encounter_num, encounter_data):
 		
 		# Some definitions for correct file naming
 		df.reset_index(drop=True, inplace=True)
-		r_start = df.posR.iloc[0] * 1e3 / R_sun.value
-		r_end = df.posR.iloc[-1] * 1e3 / R_sun.value
+		r_start = df.posR.iloc[0] * 1e3 / R_SUN
+		r_end = df.posR.iloc[-1] * 1e3 / R_SUN
 		
 		if r_start - r_end >= 0:
 			designation = "INGRESS"
 		elif r_start - r_end < 0:
 			designation = "EGRESS"
-		
-		save_append_r = f"{r_start:.1f}-{r_end:.1f}"
-		
-		# Write to files
-		file_name = f"{SAVE_DIR}/{encounter_num}_{designation}"
-		df.to_json(f"{file_name}.json")
+
+		parts.append((designation, df))
+
+	parts.append((TURNAROUND, data_turn))
+
+	return parts
 
 
 def find_turn_around(distance_array: np.ndarray) -> int:
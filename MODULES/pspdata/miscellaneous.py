@@ -1,6 +1,10 @@
 import sys
 import numpy as np
-import matplotlib.pyplot as plt
+from MODULES.misc.lazy import LazyModule
+
+# matplotlib is imported on first use (see LazyModule)
+plt = LazyModule("matplotlib.pyplot")
+from MODULES.Plotting import plotset_decimation as pdc
 
 # NECESSARY GLOBALS
 PLOT_SAVE_DIR = f"{sys.path[0]}/PLOTS"
@@ -23,9 +27,11 @@ def theta_time_analysis(theta_list: list,
     fig, ax = plt.subplots(figsize=(7, 5))
     num_arr = len(theta_list)
 
+    # Each array is reduced to the points that shape the scatter at the
+    # resolution of the axes (see plotset_decimation)
     for i in range(num_arr):
-        ax.scatter(rel_time[i], theta_list[i], label=label[i],
-                   s=5, zorder=100)
+        ax.scatter(*pdc.decimate_scatter(ax, rel_time[i], theta_list[i]),
+                   label=label[i], s=5, zorder=100)
 
     # Add median and stddev
     ax.axhline(theta_mean, ls="--", lw=2, color="black",
@@ -1,11 +1,17 @@
 import numpy as np
+import pandas as pd
 import typing as tp
 import logging
+from MODULES.misc import metrics
 
 # Logging functionality. Comment out first line to enable logging.
 logging.disable(logging.CRITICAL)
 logging.basicConfig(level=logging.DEBUG, format="%(message)s")
 
+# Statistics evaluated for each distance bin (this is the order of the
+# "Type" blocks in the statistics file)
+STAT_TYPES = ["mean", "std", "median", "q1", "q3"]
+
 
 def decimal_length(number: float) -> int:
     """Find the number of decimal points on a WRITTEN float."""
@@ -15,6 +21,149 @@ def decimal_length(number: float) -> int:
     return decimal_points
 
 
+def bin_segments(bin_index: np.ndarray) -> tp.Tuple:
+    """
+    Sort data points by their bin index once. Afterwards, the data
+    points of each bin form one contiguous segment.
+
+    :param bin_index: NDARRAY,
+        Bin index of each data point (e.g. from np.digitize)
+    :return: TUPLE,
+        Sorting order of the data points (stable, so the original order
+        is kept within a bin), sorted unique bin indices and start
+        index of each bin segment in the sorted data
+    """
+    # Stable sorting of small integers is a radix sort in numpy, which
+    # is a lot faster than sorting the full 64-bit bin indices
+    sort_index = bin_index
+    if bin_index.size > 0 and \
+            bin_index.max() - bin_index.min() < np.iinfo(np.uint16).max:
+        sort_index = (bin_index - bin_index.min()).astype(np.uint16)
+
+    order = np.argsort(sort_index, kind="stable")
+    sorted_index = bin_index[order]
+
+    starts = np.flatnonzero(
+        np.concatenate(([True], sorted_index[1:] != sorted_index[:-1]))
+    )
+    if order.size == 0:
+        starts = starts[:0]
+
+    return order, sorted_index[starts], starts
+
+
+@metrics.timed_function
+def binned_statistics(data, order: np.ndarray,
+                      starts: np.ndarray) -> pd.DataFrame:
+    """
+    Mean, standard deviation, median and quartiles of all numeric
+    columns of 'data' for every bin segment (see bin_segments). NaN
+    values are skipped, as in pandas.
+
+    :param data: DataFrame,
+        Data points (unsorted)
+    :param order: NDARRAY,
+        Sorting order by bin index
+    :param starts: NDARRAY,
+        Start indices of bin segments in sorted data
+    :return: DataFrame,
+        One block of rows per statistic, tagged by the "Type" column
+        (mean, std, median, q1, q3), with one row per bin each
+    """
+    numeric = data.select_dtypes(include=["number", "bool"])
+    num_bins = starts.size
+
+    # Bin number of each (sorted) data point
+    ends = np.append(starts[1:], order.size)
+    segment = np.repeat(np.arange(num_bins), ends - starts)
+
+    stats = {stat_type: {} for stat_type in STAT_TYPES}
+
+    for column in numeric.columns:
+        values = numeric[column].to_numpy(dtype=np.float64)[order]
+        valid = ~np.isnan(values)
+        counts = segment_sum(valid, starts).astype(int)
+
+        # Moments (the standard deviation is the sample standard
+        # deviation, with ddof = 1)
+        mean = segment_sum(np.where(valid, values, 0), starts) / \
+            np.where(counts > 0, counts, np.nan)
+        deviation = np.where(valid, values - mean[segment], 0)
+        variance = segment_sum(deviation ** 2, starts) / \
+            np.where(counts > 1, counts - 1, np.nan)
+
+        # For quantiles, sort values within each segment (in place).
+        # NaN values are sorted to the end of their segment and not
+        # counted
+        for start, end in zip(starts, ends):
+            values[start:end].sort()
+
+        stats["mean"][column] = mean
+        stats["std"][column] = np.sqrt(variance)
+        stats["median"][column] = segment_median(values, starts, counts)
+        stats["q1"][column] = segment_quantile(values, starts, counts, 0.25)
+        stats["q3"][column] = segment_quantile(values, starts, counts, 0.75)
+
+    return pd.concat(
+        objs=[
+            pd.DataFrame(stats[stat_type], columns=numeric.columns)
+            .assign(Type=stat_type)
+            for stat_type in STAT_TYPES
+        ],
+        ignore_index=True
+    )
+
+
+def segment_counts(labels: np.ndarray, order: np.ndarray,
+                   starts: np.ndarray, names: list) -> tp.Dict:
+    """Number of data points with each label (e.g. instrument) per bin"""
+    labels = labels[order]
+
+    if starts.size == 0:
+        return {name: np.zeros(0, dtype=int) for name in names}
+
+    return {name: np.add.reduceat(labels == name, starts)
+            for name in names}
+
+
+def segment_sum(values: np.ndarray, starts: np.ndarray) -> np.ndarray:
+    """Sum of values in each segment"""
+    if starts.size == 0:
+        return np.zeros(0)
+
+    return np.add.reduceat(values, starts)
+
+
+def segment_quantile(sorted_values: np.ndarray, starts: np.ndarray,
+                     counts: np.ndarray, q: float) -> np.ndarray:
+    """
+    Quantile of each segment (with linear interpolation, as in
+    pandas). 'counts' is the number of valid values at the beginning
+    of each (sorted) segment.
+    """
+    position = (counts - 1) * q
+    lower = np.floor(position).astype(int)
+    upper = np.minimum(lower + 1, counts - 1)
+    fraction = position - lower
+
+    # Empty segments get index 0 to be able to index, but are NaN
+    empty = counts == 0
+    val_lo = sorted_values[np.where(empty, 0, starts + lower)]
+    val_up = sorted_values[np.where(empty, 0, starts + upper)]
+
+    return np.where(empty, np.nan, val_lo + (val_up - val_lo) * fraction)
+
+
+def segment_median(sorted_values: np.ndarray, starts: np.ndarray,
+                   counts: np.ndarray) -> np.ndarray:
+    """Median of each segment (mean of the central values if even)"""
+    empty = counts == 0
+    val_lo = sorted_values[np.where(empty, 0, starts + (counts - 1) // 2)]
+    val_up = sorted_values[np.where(empty, 0, starts + counts // 2)]
+
+    return np.where(empty, np.nan, (val_lo + val_up) / 2)
+
+
 # TODO: This function might be redundant now!
 def create_bins(lower_bound, upper_bound, bin_size):
     """
@@ -1,97 +1,175 @@
+import io
 import os
+import hashlib
 import numpy as np
-import astropy.constants as c
 import pandas as pd
+import typing as tp
+from MODULES.config import CACHE_DIR, SIM_CACHE_MAX_SIZE
+from MODULES.constants import R_SUN, M_SUN, M_P
+from MODULES.misc import storage
+from MODULES.pspdata import data_cache
+from MODULES.pspdata import data_schema
+from .stats_databin import STAT_TYPES
+
+# GLOBALS
+# Binary copies of the parsed simulation mesh files (see read_sim_mesh)
+SIM_CACHE_DIR = f"{CACHE_DIR}/sim_mesh"
+
+# Simulation mesh files already read by this process
+_SIM_MESH = {}
+
+# Attribute names of the stat types of the statistics file and of
+# quantities that are named differently in the file (see PSPStatData)
+STAT_NAMES = {"stddev": "std"}
+QUANTITY_ALIASES = {"T": "Temp"}
+
+# Units of the derived quantities (the other quantities have the units
+# of the column schema, see data_schema.UNITS): mass loss per year of
+# 365 days and ram pressure
+DERIVED_UNITS = {"massloss": "solMass", "rampressure": "Pa"}
 
 
 class PSPStatData:
-    def __init__(self, filename, sim_data):
-        stat_data = pd.read_json(filename)
-
-        # Correct for maximum distance of simulation data
-        # co_index = np.where(raw_data[:, 0] >= sim_data.dist[-1])[0][0]
-        # raw_data = raw_data[:co_index]
-
-        # Positional data
-        self.dist = stat_data[stat_data["Type"] == "mean"].posR * \
-                    1e3 / c.R_sun.value
-        # self.num_meas = raw_data[:, 16]
-
-        # Create subclasses which contain necessary stat data
-        self.vr = StatDataSplit(stat_data, "vr")
-        self.np = StatDataSplit(stat_data, "np")
-        self.T = StatDataSplit(stat_data, "Temp")
-
-        # BRIEFLY CALCULATE MASS LOSS RATE (FIX THIS UP)
-        class MassLoss:
-            def __init__(self, dist, vr, nump):
-                self.mean = massloss(dist * c.R_sun.value,
-                                     vr.mean * 1e3,
-                                     nump.mean * c.m_p.value * 1e6)
-                self.stddev = massloss(dist * c.R_sun.value,
-                                       vr.stddev * 1e3,
-                                       nump.mean * c.m_p.value * 1e6) + \
-                              massloss(dist * c.R_sun.value,
-                                       vr.mean * 1e3,
-                                       nump.stddev * c.m_p.value * 1e6)
-
-        self.massloss = MassLoss(self.dist, self.vr, self.np)
-
-        # RAM PRESSURE
-        class RamPressure:
-            def __init__(self, vr, nump):
-                self.mean = (vr.mean * 1e3) ** 2 * \
-                            nump.mean * c.m_p.value * 1e6
-
-                self.stddev = (vr.mean * 1e3) ** 2 * \
-                              nump.stddev * c.m_p.value * 1e6 + \
-                              2 * (vr.stddev * 1e3) * \
-                              nump.mean * c.m_p.value * 1e6
-
-        self.rampressure = RamPressure(self.vr, self.np)
-
-
-class StatDataSplit:
-    """Sub-class to access relevant statistical data"""
-
-    def __init__(self, stat_data, key):
-        data_mean = stat_data[stat_data["Type"] == "mean"]
-        data_std = stat_data[stat_data["Type"] == "std"]
-        data_median = stat_data[stat_data["Type"] == "median"]
-        data_q1 = stat_data[stat_data["Type"] == "q1"]
-        data_q3 = stat_data[stat_data["Type"] == "q3"]
-
-        self.mean = data_mean[key].reset_index(drop=True)
-        self.stddev = data_std[key].reset_index(drop=True)
-        self.median = data_median[key].reset_index(drop=True)
-        self.q1 = data_q1[key].reset_index(drop=True)
-        self.q3 = data_q3[key].reset_index(drop=True)
+    """
+    Statistics of the PSP measurements per distance bin, held in one
+    contiguous array 'data' of shape (stat type x quantity x bin), with
+    the stat types in the order of STAT_NAMES. Every statistic of every
+    quantity is a view into this array:
 
+        stats.vr.mean, stats.T.stddev or stats.view("np", "q1")
 
-class SimMeshData:
-    def __init__(self, filename):
-        # Get first valid index (skip first cell?)
-        index = skip_nan_sim_data(filename)
+    Besides the columns of the statistics file, mass loss rate and ram
+    pressure are quantities as well (mean and standard deviation only).
+    """
+
+    def __init__(self, data: np.ndarray, quantities: tp.List[str]):
+        self.data = data
+        self.quantities = list(quantities)
+        self.index = {key: i for i, key in enumerate(self.quantities)}
+
+        # Positional data (mean distance of each bin in R_sol)
+        self.dist = self.view("posR", "mean") * 1e3 / R_SUN
+
+    @classmethod
+    def read(cls, filename: str):
+        """Statistics from file written by the data evaluation"""
+        stat_data = storage.read_frame(filename)
+
+        # Rows are sorted into one block per stat type at once (within a
+        # block, the rows keep the order of the bins)
+        type_codes = pd.Categorical(stat_data["Type"],
+                                    categories=STAT_TYPES).codes
+        order = np.argsort(type_codes, kind="stable")
+        numeric = stat_data.drop(columns="Type")
+        quantities = list(numeric.columns)
+
+        values = numeric.to_numpy(dtype=np.float64)[order]
+        values = values.reshape(len(STAT_TYPES), -1, len(quantities))
+
+        # Derived quantities, mass loss rate and ram pressure, from the
+        # mean and standard deviation of velocity and density (distance
+        # and velocity in m and m/s, posR and vr are in km and km/s)
+        index = {key: i for i, key in enumerate(quantities)}
+        dist = values[0, :, index["posR"]] * 1e3
+        vr_mean, vr_std = values[:2, :, index["vr"]] * 1e3
+        np_mean, np_std = values[:2, :, index["np"]]
+
+        derived = np.full((len(STAT_TYPES), values.shape[1], 2), np.nan)
+        derived[0, :, 0] = massloss(dist, vr_mean,
+                                    np_mean * M_P * 1e6)
+        derived[1, :, 0] = \
+            massloss(dist, vr_std, np_mean * M_P * 1e6) + \
+            massloss(dist, vr_mean, np_std * M_P * 1e6)
+        derived[0, :, 1] = vr_mean ** 2 * np_mean * M_P * 1e6
+        derived[1, :, 1] = vr_mean ** 2 * np_std * M_P * 1e6 + \
+            2 * vr_std * np_mean * M_P * 1e6
+
+        data_schema.check_units(
+            derived[0, :, 0], DERIVED_UNITS["massloss"],
+            lambda u, c: 4 * np.pi * (dist * u.m) ** 2 *
+            vr_mean * u.m / u.s * np_mean * u.cm ** -3 * c.m_p * 365 * u.day
+        )
+        data_schema.check_units(
+            derived[0, :, 1], DERIVED_UNITS["rampressure"],
+            lambda u, c: (vr_mean * u.m / u.s) ** 2 *
+            np_mean * u.cm ** -3 * c.m_p
+        )
+
+        data = np.concatenate((values, derived), axis=2).transpose(0, 2, 1)
+
+        return cls(np.ascontiguousarray(data),
+                   quantities + ["massloss", "rampressure"])
+
+    def __getattr__(self, name: str):
+        """Statistics of one quantity (e.g. stats.vr), see QuantityStats"""
+        key = QUANTITY_ALIASES.get(name, name)
+
+        if name == "index" or key not in self.index:
+            raise AttributeError(name)
+
+        return QuantityStats(self.data[:, self.index[key]])
+
+    def view(self, quantity: str, stat: str) -> np.ndarray:
+        """
+        One statistic ("mean", "stddev", "median", "q1", "q3" or the
+        stat type of the file, e.g. "std") of one quantity for all bins
+        """
+        stat = STAT_NAMES.get(stat, stat)
+        quantity = QUANTITY_ALIASES.get(quantity, quantity)
+
+        return self.data[STAT_TYPES.index(stat), self.index[quantity]]
+
+    def cut(self, max_distance: float = 40.0):
+        """
+        Statistics of the bins up to 'max_distance' (R_sol), e.g. the
+        outer boundary of the simulation domain. The bins are sorted by
+        distance, so this is a slice (a view) of the data.
+        """
+        keep = np.flatnonzero(~(self.dist > max_distance))
 
-        # Handle simulation mesh data (skip rows integer is 1 more than index)
-        raw_data = np.loadtxt(filename, skiprows=index + 1, delimiter=",")
+        if np.array_equal(keep, np.arange(keep.size)):
+            return PSPStatData(self.data[:, :, :keep.size], self.quantities)
 
-        # Find out if any other indices correspond to nan-values in
-        # distance and remove them
-        more_nan = np.where(np.isnan(raw_data[:, 8]))[0]
-        raw_data = np.delete(raw_data, more_nan, axis=0)
+        return PSPStatData(self.data[:, :, keep], self.quantities)
+
+
+class QuantityStats:
+    """All statistics of one quantity (views, see PSPStatData)"""
+
+    __slots__ = ["data"]
+
+    def __init__(self, data: np.ndarray):
+        self.data = data
+
+    def __getattr__(self, name: str) -> np.ndarray:
+        stat = STAT_NAMES.get(name, name)
+
+        if stat not in STAT_TYPES:
+            raise AttributeError(name)
+
+        return self.data[STAT_TYPES.index(stat)]
+
+
+class SimMeshData:
+    def __init__(self, filename):
+        # Valid rows of the simulation mesh data (see read_sim_mesh)
+        raw_data = read_sim_mesh(filename)
 
         # Assign necessary values
-        self.dist = raw_data[:, 8] / c.R_sun.value
+        self.dist = raw_data[:, 8] / R_SUN
         self.vr = cart_to_rad_vel(raw_data) * 1e-3
         self.np = sim_rho_to_rho(raw_data)
+        data_schema.check_units(
+            self.np, data_schema.UNITS["np"],
+            lambda u, c: 10 ** raw_data[:, 6] * u.kg / u.m ** 3 / c.m_p
+        )
         self.T = 10 ** raw_data[:, 3]
 
         # COMPUTE DERIVED VALUES (MASS LOSS AND RAM PRESSURE)
         si_density = 10 ** raw_data[:, 6]
 
         # Compute massloss rate from values in M_sol / year
-        self.massloss = massloss(self.dist * c.R_sun.value,
+        self.massloss = massloss(self.dist * R_SUN,
                                  self.vr * 1e3,
                                  si_density)
 
@@ -99,49 +177,91 @@ class SimMeshData:
         self.rampressure = si_density * (self.vr * 1e3) ** 2
 
 
-def cut_stat_data(stat_df) -> None:
-    """Trim stat data to radial distances less then 40 Rs"""
-    # Mark all indices of data frame where radial distance bin location
-    # is above 40 Rs (the outer boundary of the simulation domain)
-    crit_ind = stat_df.dist.index[stat_df.dist > 40.0]
+def read_sim_mesh(filename: str) -> np.ndarray:
+    """
+    Valid rows of a simulation mesh file (radial profile exported from
+    ParaView as CSV). The file is parsed only once, the result is kept
+    in a binary copy in SIM_CACHE_DIR, which is used as long as the file
+    keeps its size and modification time (or content hash), and in
+    memory for further calls of the same process. The binary copies are
+    kept within SIM_CACHE_MAX_SIZE (see config), least recently used
+    ones are removed first.
+
+    :param filename: STR,
+        CSV file with one header line
+    :return: NDARRAY,
+        2D array of the rows without NaN values in the first column (at
+        the start of the profile) and in the distance column
+    """
+    stat = os.stat(filename)
+    memo_key = (os.path.abspath(filename), stat.st_size, stat.st_mtime_ns)
+    if memo_key in _SIM_MESH:
+        return _SIM_MESH[memo_key]
 
-    # Loop over all attributes of the stat. data object. It has the
-    # structure: STATClass.attr.stat_type.DataFrame
-    top_keys = stat_df.__dict__.keys()
+    path_hash = hashlib.sha256(memo_key[0].encode()).hexdigest()[:16]
+    cache_file = f"{SIM_CACHE_DIR}/{os.path.basename(filename)}." \
+                 f"{path_hash}.npz"
 
-    for key in top_keys:
-        # This object might be a pandas Series or a subclass
-        sub_obj = getattr(stat_df, key)
+    # The binary copy is used if the file has the same size and
+    # modification time as before, or else the same content. The file
+    # is read at most once, for both its hash and the parser
+    raw_data = None
+    content = None
+    content_hash = None
+    if os.path.isfile(cache_file):
+        with np.load(cache_file, allow_pickle=False) as cached:
+            if (int(cached["size"]), int(cached["mtime"])) == memo_key[1:]:
+                _SIM_MESH[memo_key] = cached["data"]
 
-        # If "mean" is part of the keys, the object is a subclass
-        if 'mean' in sub_obj.__dict__.keys():
-            for key2 in sub_obj.__dict__.keys():
-                sub_obj_2 = getattr(sub_obj, key2)
-                sub_obj_2.drop(index=crit_ind, inplace=True)
+                # Mark the copy as recently used (see data_cache.evict)
+                os.utime(cache_file)
+                return _SIM_MESH[memo_key]
 
-        # Otherwise, the object itself can be reduced
-        else:
-            sub_obj.drop(index=crit_ind, inplace=True)
+            content = read_bytes(filename)
+            content_hash = hashlib.sha256(content).hexdigest()
+            if str(cached["hash"]) == content_hash:
+                raw_data = cached["data"]
 
-    return None
+    if raw_data is None:
+        if content is None:
+            content = read_bytes(filename)
+            content_hash = hashlib.sha256(content).hexdigest()
 
+        # The C parser of pandas is several times faster than
+        # np.loadtxt (values may differ from it in the last digit)
+        raw_data = pd.read_csv(io.BytesIO(content),
+                               dtype=np.float64).to_numpy()
 
-def skip_nan_sim_data(filename):
-    """
-    Skip entries in data file with NaN-values. This is a result of
-    the radial profile generated by paraview starting at R = 0, whereas
-    the domain starts at R = 1 R_s
-    """
-    # First always skipped because of header
-    raw_data = np.loadtxt(filename, skiprows=1, delimiter=",")
+        # The radial profile generated by paraview starts at R = 0,
+        # whereas the domain starts at R = 1 R_s: the rows before the
+        # first valid primary value are skipped, as well as any other
+        # rows with NaN values in distance (one pass over the data)
+        started = np.cumsum(~np.isnan(raw_data[:, 0])) > 0
+        raw_data = raw_data[started & ~np.isnan(raw_data[:, 8])]
+
+    store_sim_mesh(cache_file, raw_data, memo_key[1:], content_hash)
+    data_cache.evict(SIM_CACHE_MAX_SIZE, SIM_CACHE_DIR)
+
+    _SIM_MESH[memo_key] = raw_data
+
+    return raw_data
+
+
+def read_bytes(filename: str) -> bytes:
+    """Complete content of a file"""
+    with open(filename, "rb") as f:
+        return f.read()
+
+
+def store_sim_mesh(cache_file: str, raw_data: np.ndarray, file_stat: tuple,
+                   content_hash: str) -> None:
+    """Write the binary copy of a simulation mesh file (see read_sim_mesh)"""
+    os.makedirs(SIM_CACHE_DIR, exist_ok=True)
 
-    # Find first valid primary index
-    first_value = 0
-    while True:
-        if np.isnan(raw_data[first_value][0]):
-            first_value += 1
-        else:
-            return first_value
+    tmp_name = f"{cache_file[:-4]}.{os.getpid()}.tmp.npz"
+    np.savez(tmp_name, data=raw_data, size=np.array(file_stat[0]),
+             mtime=np.array(file_stat[1]), hash=np.array(content_hash))
+    os.replace(tmp_name, cache_file)
 
 
 def cart_to_rad_vel(raw_data):
@@ -162,7 +282,7 @@ def cart_to_rad_vel(raw_data):
 def sim_rho_to_rho(raw_data):
     """Transforms logarithmic SI values into linear CGS values"""
     log_rho = raw_data[:, 6]
-    rho = 10 ** log_rho / c.m_p.value * 1e-6
+    rho = 10 ** log_rho / M_P * 1e-6
 
     return rho
 
@@ -171,7 +291,7 @@ def massloss(distance, velocity, density):
     """Mass loss rate in solar masses per year"""
     ml = 4 * np.pi * distance ** 2 * velocity * density
 
-    return ml / c.M_sun.value * (3600 * 24 * 365)
+    return ml / M_SUN * (3600 * 24 * 365)
 
 
 def massloss_interpolate(directory):
@@ -181,10 +301,10 @@ def massloss_interpolate(directory):
 
     for file in os.listdir(directory):
         # Cut-off ".csv"
-        distance = float(file[:-4]) / c.R_sun.value
+        distance = float(file[:-4]) / R_SUN
 
         mom_den = massloss_from_contour(f"{directory}/{file}")
-        mass_loss = mom_den * 31557600 / c.M_sun.value
+        mass_loss = mom_den * 31557600 / M_SUN
 
         distance_values = np.append(distance_values, distance)
         massloss_values = np.append(massloss_values, mass_loss)
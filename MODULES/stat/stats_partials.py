@@ -0,0 +1,131 @@
+import os
+import json
+import typing as tp
+from MODULES.pspdata import data_cache
+from . import stats_stream as ss
+
+# GLOBALS
+# The manifest lists, for each encounter with stored partial aggregates,
+# the settings and input files (with content hashes) they were computed
+# from
+MANIFEST_NAME = "MANIFEST.json"
+INSTRUMENT_DIRS = ["SPC", "SPAN-I"]
+
+
+def load_manifest(partial_dir: str) -> tp.Dict:
+    """Manifest of stored partials (empty if there is none yet)"""
+    file_name = f"{partial_dir}/{MANIFEST_NAME}"
+
+    if not os.path.isfile(file_name):
+        return {}
+
+    with open(file_name, "r") as f:
+        return json.load(f)
+
+
+def store_manifest(partial_dir: str, manifest: tp.Dict) -> None:
+    """Write the manifest (via a temporary file, see data_cache.store)"""
+    os.makedirs(partial_dir, exist_ok=True)
+
+    file_name = f"{partial_dir}/{MANIFEST_NAME}"
+    tmp_name = f"{file_name}.{os.getpid()}.tmp"
+    with open(tmp_name, "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp_name, file_name)
+
+
+def input_state(encounter_folder: str, settings: list,
+                known: tp.Dict = None) -> tp.Dict:
+    """
+    Settings and input files of an encounter, as stored in the
+    manifest. Files are identified by their content hash. The hash of
+    a file that did not change size and modification time since the
+    'known' (previous) state is taken over instead of reading the file
+    again.
+
+    :param encounter_folder: STR,
+        Data folder of the encounter (with SPC and SPAN-I sub-folders)
+    :param settings: LIST,
+        All settings that change the partials (bin size, time window,
+        ...), must be JSON serializable
+    :param known: DICT,
+        Previous state of this encounter from the manifest (optional)
+    :return: DICT,
+        {"settings": [...], "files": {name: [size, mtime, hash]}}
+    """
+    known_files = {} if known is None else known["files"]
+    files = {}
+
+    for inst_dir in INSTRUMENT_DIRS:
+        folder = f"{encounter_folder}/{inst_dir}"
+
+        for file in sorted(os.listdir(folder)):
+            name = f"{inst_dir}/{file}"
+            stat = os.stat(f"{folder}/{file}")
+
+            previous = known_files.get(name)
+            if previous is not None and \
+                    previous[:2] == [stat.st_size, stat.st_mtime_ns]:
+                file_hash = previous[2]
+            else:
+                file_hash = data_cache.file_hash(f"{folder}/{file}")
+
+            files[name] = [stat.st_size, stat.st_mtime_ns, file_hash]
+
+    return {"settings": list(settings), "files": files}
+
+
+def up_to_date(partial_dir: str, manifest: tp.Dict, encounter: str,
+               state: tp.Dict) -> bool:
+    """
+    Whether the stored partials of an encounter were computed from the
+    same settings and input file contents as in 'state'
+    """
+    known = manifest.get(encounter)
+
+    if known is None or known["settings"] != state["settings"]:
+        return False
+
+    hashes = {name: entry[2] for name, entry in state["files"].items()}
+    known_hashes = {name: entry[2] for name, entry in known["files"].items()}
+
+    return hashes == known_hashes and \
+        os.path.isfile(accumulator_file(partial_dir, encounter))
+
+
+def accumulator_file(partial_dir: str, encounter: str) -> str:
+    """Location of the bin statistics of an encounter"""
+    return f"{partial_dir}/{encounter}.npz"
+
+
+def store_partial(partial_dir: str, manifest: tp.Dict, encounter: str,
+                  accumulator: ss.BinAccumulator, state: tp.Dict) -> None:
+    """
+    Store the bin statistics of an encounter and add it to the
+    manifest. The manifest is written right away, so that an
+    interrupted run does not need to recompute finished encounters.
+    """
+    os.makedirs(partial_dir, exist_ok=True)
+
+    accumulator.save(accumulator_file(partial_dir, encounter))
+    manifest[encounter] = state
+    store_manifest(partial_dir, manifest)
+
+
+def load_partial(partial_dir: str, encounter: str) -> ss.BinAccumulator:
+    """Bin statistics of an encounter"""
+    return ss.BinAccumulator.load(accumulator_file(partial_dir, encounter))
+
+
+def remove_partial(partial_dir: str, manifest: tp.Dict, encounter: str,
+                   spill_dir: str) -> None:
+    """Remove all partials of an encounter (statistics and bin data)"""
+    file_name = accumulator_file(partial_dir, encounter)
+    if os.path.isfile(file_name):
+        os.remove(file_name)
+
+    ss.remove_part(spill_dir, encounter)
+
+    if encounter in manifest:
+        del manifest[encounter]
+        store_manifest(partial_dir, manifest)
@@ -0,0 +1,210 @@
+import os
+import json
+import shutil
+import numpy as np
+import pandas as pd
+import typing as tp
+from MODULES.constants import R_SUN
+from MODULES.config import PYRAMID_BIN_SIZE, SKETCH_ERROR, \
+    SKETCH_RESOLUTION, SKETCH_MAX_BUCKETS
+from MODULES.pspdata.data_schema import SCHEMA_VERSION
+from MODULES.misc import metrics
+from . import stats_stream as ss
+
+# GLOBALS
+# The pyramid holds one BinAccumulator (counts, means, M2 and quantile
+# sketches per distance bin of size PYRAMID_BIN_SIZE) for each part of
+# an encounter (ingress, egress, turn-around, see data_turnaround) and
+# each instrument. The index lists the parts of each encounter.
+INDEX_NAME = "PYRAMID.json"
+LABELS = ["SPC", "SPAN"]
+LABEL_COLUMN = "Inst"
+
+
+def base_bins(pos_r: np.ndarray) -> np.ndarray:
+    """Base distance bin of each position (posR in km)"""
+    return np.digitize(np.asarray(pos_r) * 1e3 / R_SUN,
+                       np.arange(0, 100, PYRAMID_BIN_SIZE))
+
+
+def supports(bin_size: float) -> bool:
+    """Whether statistics for 'bin_size' can be derived from the pyramid"""
+    factor = round(bin_size / PYRAMID_BIN_SIZE)
+    return factor >= 1 and \
+        abs(factor * PYRAMID_BIN_SIZE - bin_size) < 1e-9 * bin_size
+
+
+def bin_factor(bin_size: float) -> int:
+    """Number of base bins in a bin of 'bin_size' (R_sun)"""
+    # SANITY CHECK: only multiples of the base bin size can be derived
+    assert supports(bin_size), \
+        f"BIN SIZE {bin_size} IS NO MULTIPLE OF {PYRAMID_BIN_SIZE}!"
+
+    return int(round(bin_size / PYRAMID_BIN_SIZE))
+
+
+def part_file(pyramid_dir: str, part: str, label: str) -> str:
+    """Location of the accumulator of one part and instrument"""
+    return f"{pyramid_dir}/{part}_{label}.npz"
+
+
+def load_index(pyramid_dir: str) -> tp.Dict:
+    """Index of the pyramid (empty if there is none yet)"""
+    file_name = f"{pyramid_dir}/{INDEX_NAME}"
+
+    if not os.path.isfile(file_name):
+        return {}
+
+    with open(file_name, "r") as f:
+        return json.load(f)
+
+
+def store_index(pyramid_dir: str, index: tp.Dict) -> None:
+    """Write the index (via a temporary file, see data_cache.store)"""
+    os.makedirs(pyramid_dir, exist_ok=True)
+
+    file_name = f"{pyramid_dir}/{INDEX_NAME}"
+    tmp_name = f"{file_name}.{os.getpid()}.tmp"
+    with open(tmp_name, "w") as f:
+        json.dump(index, f, indent=1, sort_keys=True)
+    os.replace(tmp_name, file_name)
+
+
+def prepare(pyramid_dir: str, encounters: tp.List[str]) -> tp.Dict:
+    """
+    Index of the pyramid, reduced to 'encounters' (the parts of all
+    other encounters are removed). A pyramid of another base bin size,
+    sketch error, resolution, size or layout (see stats_stream) or column
+    schema (see data_schema) is removed completely.
+    """
+    index = load_index(pyramid_dir)
+
+    if index.get("bin_size") != PYRAMID_BIN_SIZE or \
+            index.get("alpha") != SKETCH_ERROR or \
+            index.get("resolution") != SKETCH_RESOLUTION or \
+            index.get("max_buckets") != SKETCH_MAX_BUCKETS or \
+            index.get("sketch") != ss.SKETCH_VERSION or \
+            index.get("schema") != SCHEMA_VERSION:
+        if os.path.isdir(pyramid_dir):
+            shutil.rmtree(pyramid_dir)
+        index = {"bin_size": PYRAMID_BIN_SIZE, "alpha": SKETCH_ERROR,
+                 "resolution": SKETCH_RESOLUTION,
+                 "max_buckets": SKETCH_MAX_BUCKETS,
+                 "sketch": ss.SKETCH_VERSION, "schema": SCHEMA_VERSION,
+                 "encounters": {}}
+
+    for encounter in sorted(set(index["encounters"]) - set(encounters)):
+        remove_encounter(pyramid_dir, index, encounter)
+
+    store_index(pyramid_dir, index)
+
+    return index
+
+
+@metrics.timed_function
+def store_encounter(pyramid_dir: str, index: tp.Dict, encounter: str,
+                    parts: tp.List[tp.Tuple[str, pd.DataFrame]]) -> None:
+    """
+    Add the aggregates of the parts (designation, data) of an encounter
+    to the pyramid, replacing the ones of an earlier evaluation
+    """
+    remove_encounter(pyramid_dir, index, encounter)
+    os.makedirs(pyramid_dir, exist_ok=True)
+
+    # Parts with the same designation are merged
+    accumulators = {}
+    for designation, data in parts:
+        part = f"{encounter}_{designation}"
+
+        for label in LABELS:
+            label_data = data[data[LABEL_COLUMN] == label]
+            if label_data.shape[0] == 0:
+                continue
+
+            accumulator = accumulators.setdefault(
+                (part, label),
+                ss.BinAccumulator(LABELS, LABEL_COLUMN, SKETCH_ERROR)
+            )
+            accumulator.update(label_data, base_bins(label_data.posR))
+
+    for (part, label), accumulator in accumulators.items():
+        accumulator.save(part_file(pyramid_dir, part, label))
+
+    index["encounters"][encounter] = sorted(
+        {part for part, _ in accumulators}
+    )
+    store_index(pyramid_dir, index)
+
+
+def remove_encounter(pyramid_dir: str, index: tp.Dict,
+                     encounter: str) -> None:
+    """Remove the parts of an encounter from the pyramid"""
+    for part in index["encounters"].pop(encounter, []):
+        for label in LABELS:
+            file_name = part_file(pyramid_dir, part, label)
+            if os.path.isfile(file_name):
+                os.remove(file_name)
+
+
+def aggregate(pyramid_dir: str, bin_size: float,
+              parts: tp.List[str] = None,
+              labels: tp.List[str] = None) -> ss.BinAccumulator:
+    """
+    Statistics of distance bins of 'bin_size' (a multiple of
+    PYRAMID_BIN_SIZE), merged from the pyramid.
+
+    :param pyramid_dir: STR,
+        Directory of the pyramid
+    :param bin_size: FLOAT,
+        Distance bin size in R_sun
+    :param parts: LIST,
+        Parts to merge, e.g. "encounter_7_INGRESS" (default: all)
+    :param labels: LIST,
+        Instruments to merge (default: all)
+    :return: BinAccumulator,
+        Merged statistics, with bins numbered as np.digitize with
+        np.arange(0, 100, bin_size) (up to float round-off at the bin
+        edges)
+    """
+    factor = bin_factor(bin_size)
+    index = load_index(pyramid_dir)
+
+    if parts is None:
+        parts = [part for encounter_parts in index["encounters"].values()
+                 for part in encounter_parts]
+    if labels is None:
+        labels = LABELS
+
+    accumulator = ss.BinAccumulator(LABELS, LABEL_COLUMN, index["alpha"],
+                                    index["resolution"],
+                                    index["max_buckets"])
+    for part in parts:
+        for label in labels:
+            file_name = part_file(pyramid_dir, part, label)
+            if os.path.isfile(file_name):
+                accumulator.merge(ss.BinAccumulator.load(file_name))
+
+    # Base bin b covers [(b - 1), b) base sizes, so it is part of the
+    # coarse bin (b - 1) // factor + 1
+    if factor > 1:
+        accumulator.regroup(lambda keys: (keys - 1) // factor + 1)
+
+    return accumulator
+
+
+def has_part(pyramid_dir: str, part: str) -> bool:
+    """Whether the pyramid holds aggregates of 'part'"""
+    index = load_index(pyramid_dir)
+    return any(part in encounter_parts
+               for encounter_parts in index.get("encounters", {}).values())
+
+
+def bin_means(accumulator: ss.BinAccumulator) -> pd.DataFrame:
+    """
+    Means of all columns per bin, indexed by bin number (as a groupby
+    mean over the bins), NaN where a column has no values in a bin
+    """
+    return pd.DataFrame(
+        np.where(accumulator.count == 0, np.nan, accumulator.mean),
+        index=accumulator.keys, columns=accumulator.columns
+    )
@@ -0,0 +1,129 @@
+import os
+import numpy as np
+import pandas as pd
+import typing as tp
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from . import stats_dataread as dr
+
+# GLOBALS
+# Quantities compared between simulation profiles and PSP statistics
+# (attributes of SimMeshData and PSPStatData)
+QUANTITIES = ["vr", "np", "T", "massloss", "rampressure"]
+
+
+def observed_profiles(psp_stats: dr.PSPStatData) -> tp.Tuple:
+    """
+    Distance of the PSP bins (R_sun) and mean and standard deviation of
+    all QUANTITIES per bin (arrays of shape quantities x bins)
+    """
+    dist = psp_stats.dist
+    mean = np.stack([psp_stats.view(key, "mean") for key in QUANTITIES])
+    std = np.stack([psp_stats.view(key, "stddev") for key in QUANTITIES])
+
+    return dist, mean, std
+
+
+def interpolate_profile(file_name: str, dist: np.ndarray) -> np.ndarray:
+    """
+    Values of all QUANTITIES of a simulation profile, linearly
+    interpolated onto the distances 'dist' (R_sun). Distances outside of
+    the profile are NaN (no extrapolation).
+
+    :return: NDARRAY,
+        Array of shape quantities x bins
+    """
+    sim_data = dr.SimMeshData(file_name)
+
+    order = np.argsort(sim_data.dist, kind="stable")
+    sim_dist = sim_data.dist[order]
+    inside = (dist >= sim_dist[0]) & (dist <= sim_dist[-1])
+
+    values = np.full((len(QUANTITIES), dist.size), np.nan)
+    for i, key in enumerate(QUANTITIES):
+        values[i, inside] = np.interp(dist[inside], sim_dist,
+                                      getattr(sim_data, key)[order])
+
+    return values
+
+
+def fit_metrics(sim_values: np.ndarray, mean: np.ndarray,
+                std: np.ndarray) -> tp.Dict[str, np.ndarray]:
+    """
+    Goodness of fit of many runs at once. Only bins with a simulated
+    value and a finite, positive standard deviation are compared.
+
+    :param sim_values: NDARRAY,
+        Interpolated simulation values (runs x quantities x bins)
+    :param mean: NDARRAY,
+        Observed mean values (quantities x bins)
+    :param std: NDARRAY,
+        Observed standard deviations (quantities x bins)
+    :return: DICT,
+        Arrays (runs x quantities) of the reduced chi-square ("chi2",
+        mean squared deviation in units of the standard deviation), the
+        mean relative deviation from the observed mean ("mre") and the
+        number of bins compared ("bins")
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        deviation = sim_values - mean
+        normed = deviation / np.where(std > 0, std, np.nan)
+        relative = np.abs(deviation / mean)
+
+    valid = np.isfinite(normed) & np.isfinite(relative)
+    bins = valid.sum(axis=2)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        chi2 = np.where(valid, normed ** 2, 0).sum(axis=2) / bins
+        mre = np.where(valid, relative, 0).sum(axis=2) / bins
+
+    return {"chi2": chi2, "mre": mre, "bins": bins}
+
+
+def batch_scores(file_names: tp.List[str], psp_stats: dr.PSPStatData,
+                 workers: int = 1) -> pd.DataFrame:
+    """
+    Score simulation profiles against PSP statistics and rank them by
+    their total reduced chi-square (mean over all QUANTITIES). The
+    profiles are read and interpolated in parallel processes, the
+    metrics of all runs are computed at once.
+
+    :param file_names: LIST,
+        Simulation profiles (CSV files, see SimMeshData)
+    :param psp_stats: PSPStatData,
+        Observed statistics (e.g. cut to the simulation domain)
+    :param workers: INT,
+        Number of worker processes
+    :return: DataFrame,
+        One row per run, best run first: run name, rank, total chi2 and
+        chi2, mre and number of bins compared of each quantity
+    """
+    dist, mean, std = observed_profiles(psp_stats)
+
+    if workers > 1 and len(file_names) > 1:
+        chunk_size = max(1, len(file_names) // (4 * workers))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            profiles = list(pool.map(interpolate_profile, file_names,
+                                     repeat(dist), chunksize=chunk_size))
+    else:
+        profiles = [interpolate_profile(file_name, dist)
+                    for file_name in file_names]
+
+    sim_values = np.stack(profiles) if profiles else \
+        np.zeros((0,) + mean.shape)
+    metrics = fit_metrics(sim_values, mean, std)
+
+    scores = pd.DataFrame({
+        "run": [os.path.splitext(os.path.basename(file_name))[0]
+                for file_name in file_names],
+        "chi2_total": np.nanmean(metrics["chi2"], axis=1)
+    })
+    for i, key in enumerate(QUANTITIES):
+        for metric in ["chi2", "mre", "bins"]:
+            scores[f"{metric}_{key}"] = metrics[metric][:, i]
+
+    scores = scores.sort_values("chi2_total", kind="stable",
+                                na_position="last", ignore_index=True)
+    scores.insert(1, "rank", np.arange(1, scores.shape[0] + 1))
+
+    return scores
@@ -0,0 +1,610 @@
+import os
+import shutil
+import numpy as np
+import pandas as pd
+import typing as tp
+from MODULES.config import SKETCH_ERROR, SKETCH_RESOLUTION, \
+    SKETCH_MAX_BUCKETS
+from MODULES.misc import storage
+from . import stats_databin as db
+
+# GLOBALS
+# A sketch key combines the cell (e.g. distance bin) and the bucket of a
+# value into one integer: key = cell * CELL_FACTOR + CODE_OFFSET + code.
+# In logarithmic buckets, |code| <= MAX_BUCKET + 1 (the sign of code is
+# the sign of the value, code = 0 is the value 0), in buckets of fixed
+# width, code is the value in multiples of the width (|code| <
+# CODE_OFFSET, e.g. the epoch in seconds)
+MAX_BUCKET = 2 ** 19
+CODE_OFFSET = 2 ** 39
+CELL_FACTOR = 2 ** 40
+
+# Version of the key layout of stored sketches (part of the settings of
+# stored partials and of the pyramid, so that old sketches are not
+# merged with new ones)
+SKETCH_VERSION = 3
+
+
+class QuantileSketch:
+    """
+    Mergeable quantile sketch for many cells at once. Values are
+    counted in logarithmic buckets (as in DDSketch, Masson et al. 2019),
+    so every quantile of values of one sign is returned with a relative
+    error of at most 'alpha'. With a 'resolution', values are counted in
+    buckets of that width instead, and every quantile is returned with
+    an absolute error of at most half the resolution (for signed values
+    or values far from 0, like the epoch). Two sketches are merged by
+    adding up bucket counts.
+
+    No cell holds more than 'max_buckets' buckets: on overflow, every
+    two neighbouring buckets of all cells are combined (the level of
+    the sketch goes up by one), which doubles the resolution or squares
+    the bucket ratio gamma = (1 + alpha) / (1 - alpha). The size of the
+    sketch is therefore bounded by the number of cells, not by the
+    number of values. The level only depends on the values added in
+    the end, not on their order or on how sketches were merged.
+    """
+
+    def __init__(self, alpha: float = SKETCH_ERROR,
+                 resolution: float = None,
+                 max_buckets: int = SKETCH_MAX_BUCKETS):
+        self.alpha = alpha
+        self.resolution = resolution
+        self.max_buckets = max_buckets
+        self.log_gamma = np.log((1 + alpha) / (1 - alpha))
+        self.level = 0
+
+        # Sorted unique keys and number of values in each
+        self.keys = np.zeros(0, dtype=np.int64)
+        self.counts = np.zeros(0, dtype=np.int64)
+
+    def update(self, cells: np.ndarray, values: np.ndarray) -> None:
+        """Add values, each belonging to one cell (NaN is skipped)"""
+        valid = ~np.isnan(values)
+        keys = cells[valid].astype(np.int64) * CELL_FACTOR + \
+            CODE_OFFSET + self.bucket_code(values[valid])
+
+        keys, counts = np.unique(keys, return_counts=True)
+        self.add(keys, counts)
+
+    def merge(self, other) -> None:
+        """Add all counts of another sketch (with same error bound)"""
+        assert other.alpha == self.alpha and \
+            other.resolution == self.resolution, \
+            "ONLY SKETCHES WITH SAME ERROR BOUND CAN BE MERGED!"
+
+        # Both sketches are brought to the coarser of their levels
+        keys, counts = other.keys, other.counts
+        if other.level < self.level:
+            keys, counts = self.coarsen_keys(keys, counts,
+                                             self.level - other.level)
+        elif other.level > self.level:
+            self.keys, self.counts = self.coarsen_keys(
+                self.keys, self.counts, other.level - self.level
+            )
+            self.level = other.level
+
+        self.add(keys, counts)
+
+    def add(self, keys: np.ndarray, counts: np.ndarray) -> None:
+        """Add counts of sorted unique keys (of the level of the sketch)"""
+        # Counts of known keys are added up, new keys are inserted at
+        # their place, which keeps the keys sorted without sorting them
+        position = np.searchsorted(self.keys, keys)
+        known = position < self.keys.size
+        known[known] = self.keys[position[known]] == keys[known]
+
+        self.counts = self.counts.copy()
+        self.counts[position[known]] += counts[known]
+        self.keys = np.insert(self.keys, position[~known], keys[~known])
+        self.counts = np.insert(self.counts, position[~known],
+                                counts[~known])
+
+        while self.max_cell_size() > self.max_buckets:
+            self.keys, self.counts = self.coarsen_keys(self.keys,
+                                                       self.counts, 1)
+            self.level += 1
+
+    def regroup(self, cell_map: tp.Callable) -> None:
+        """Combine cells, where 'cell_map' maps old to new cell numbers"""
+        codes = self.keys % CELL_FACTOR
+        cells = cell_map(self.keys // CELL_FACTOR)
+
+        keys = np.asarray(cells, dtype=np.int64) * CELL_FACTOR + codes
+        keys, inverse = np.unique(keys, return_inverse=True)
+        counts = np.bincount(inverse, weights=self.counts,
+                             minlength=keys.size).astype(np.int64)
+
+        self.keys = np.zeros(0, dtype=np.int64)
+        self.counts = np.zeros(0, dtype=np.int64)
+        self.add(keys, counts)
+
+    def max_cell_size(self) -> int:
+        """Largest number of buckets in one cell"""
+        if self.keys.size == 0:
+            return 0
+
+        cells = self.keys // CELL_FACTOR
+        bounds = np.flatnonzero(np.diff(cells)) + 1
+
+        return int(np.diff(np.concatenate(([0], bounds,
+                                           [cells.size]))).max())
+
+    def coarsen_keys(self, keys: np.ndarray, counts: np.ndarray,
+                     levels: int) -> tp.Tuple[np.ndarray, np.ndarray]:
+        """
+        Sorted unique keys and counts after combining every 2**levels
+        neighbouring buckets of each cell (codes keep their order, so
+        that the coarser keys are still sorted)
+        """
+        cells = keys // CELL_FACTOR
+        codes = self.coarsen_codes(keys % CELL_FACTOR - CODE_OFFSET,
+                                   levels)
+        keys = cells * CELL_FACTOR + CODE_OFFSET + codes
+
+        if keys.size == 0:
+            return keys, counts
+
+        starts = np.concatenate(([0], np.flatnonzero(np.diff(keys)) + 1))
+
+        return keys[starts], np.add.reduceat(counts, starts)
+
+    def coarsen_codes(self, codes: np.ndarray, levels: int) -> np.ndarray:
+        """Codes of buckets 'levels' levels coarser"""
+        factor = 2 ** levels
+
+        if self.resolution is not None:
+            return np.floor_divide(codes, factor)
+
+        # Logarithmic bucket b becomes ceil(b / factor), the bucket of
+        # gamma**factor that holds it
+        bucket = np.abs(codes) - MAX_BUCKET - 1
+        code = -np.floor_divide(-bucket, factor) + MAX_BUCKET + 1
+
+        return np.where(codes == 0, 0, np.sign(codes) * code)
+
+    def bucket_code(self, values: np.ndarray) -> np.ndarray:
+        """Signed bucket code of values (ordered like the values)"""
+        if self.resolution is not None:
+            code = np.rint(values / self.resolution)
+
+            # SANITY CHECK: codes must not reach into the next cell
+            assert np.all(np.abs(code) < CODE_OFFSET), \
+                "VALUES OUTSIDE OF THE RANGE OF THE SKETCH!"
+
+            return self.coarsen_codes(code.astype(np.int64), self.level)
+
+        magnitude = np.abs(values)
+        positive = magnitude > 0
+
+        bucket = np.zeros(values.shape, dtype=np.int64)
+        bucket[positive] = np.clip(
+            np.ceil(np.log(magnitude[positive]) / self.log_gamma),
+            -MAX_BUCKET, MAX_BUCKET
+        )
+
+        code = np.where(positive, bucket + MAX_BUCKET + 1, 0)
+
+        return self.coarsen_codes(np.where(values < 0, -code, code),
+                                  self.level)
+
+    def code_value(self, codes: np.ndarray) -> np.ndarray:
+        """Representative value of buckets, given their codes"""
+        factor = 2 ** self.level
+
+        if self.resolution is not None:
+            # Centre of the buckets of resolution-wide codes that are
+            # combined into one
+            return (codes * factor + (factor - 1) / 2) * self.resolution
+
+        log_gamma = self.log_gamma * factor
+        bucket = np.abs(codes) - MAX_BUCKET - 1
+        value = 2 * np.exp(bucket * log_gamma) / (1 + np.exp(log_gamma))
+
+        return np.where(codes == 0, 0, np.sign(codes) * value)
+
+    def error(self) -> float:
+        """
+        Error bound of the quantiles at the current level: relative for
+        logarithmic buckets, absolute for buckets of fixed width
+        """
+        if self.resolution is not None:
+            return self.resolution * 2 ** self.level / 2
+
+        gamma = np.exp(self.log_gamma * 2 ** self.level)
+
+        return (gamma - 1) / (gamma + 1)
+
+    def quantile(self, cells: np.ndarray, q: float) -> np.ndarray:
+        """
+        Quantile of each of the given cells, with linear interpolation
+        between neighbouring ranks (as in pandas). Empty cells are NaN.
+        """
+        key_cells = self.keys // CELL_FACTOR
+        cumulative = np.cumsum(self.counts)
+
+        # Number of values before and in each cell
+        first = np.searchsorted(key_cells, cells, side="left")
+        last = np.searchsorted(key_cells, cells, side="right")
+        before = np.where(first > 0, cumulative[first - 1], 0)
+        total = np.where(last > 0, cumulative[last - 1], 0) - before
+
+        position = (total - 1) * q
+        lower = np.floor(position)
+        fraction = position - lower
+
+        empty = total == 0
+        values = []
+        for rank in (lower, np.minimum(lower + 1, total - 1)):
+            index = np.searchsorted(cumulative, before + rank, side="right")
+            index = np.where(empty, 0, index)
+            codes = self.keys[index] % CELL_FACTOR - CODE_OFFSET
+            values.append(self.code_value(codes))
+
+        return np.where(empty, np.nan,
+                        values[0] + (values[1] - values[0]) * fraction)
+
+
+class BinAccumulator:
+    """
+    Running statistics of data points per distance bin. Counts, means
+    and squared deviations (M2) are merged exactly with the parallel
+    algorithm of Chan et al., quantiles come from QuantileSketch (with
+    the relative error 'alpha', or the absolute error of 'resolutions'
+    for the columns listed there, with at most 'max_buckets' buckets
+    per bin). Data can be added in chunks (e.g. per encounter) without
+    ever holding the full data set in memory.
+    """
+
+    def __init__(self, labels: tp.List[str] = ("SPC", "SPAN"),
+                 label_column: str = "Inst",
+                 alpha: float = SKETCH_ERROR,
+                 resolutions: tp.Dict[str, float] = None,
+                 max_buckets: int = SKETCH_MAX_BUCKETS):
+        self.labels = list(labels)
+        self.label_column = label_column
+        self.alpha = alpha
+        self.resolutions = dict(SKETCH_RESOLUTION if resolutions is None
+                                else resolutions)
+        self.max_buckets = max_buckets
+
+        # Set with the first data chunk
+        self.columns = None
+        self.keys = np.zeros(0, dtype=np.int64)
+        self.count = None
+        self.mean = None
+        self.m2 = None
+        self.label_count = np.zeros((0, len(self.labels)), dtype=np.int64)
+        self.sketches = {}
+
+    def update(self, data: pd.DataFrame, bin_index: np.ndarray) -> None:
+        """Add data points, each belonging to the bin in 'bin_index'"""
+        if self.columns is None:
+            numeric = data.select_dtypes(include=["number", "bool"])
+            self.columns = list(numeric.columns)
+            self.reset_columns()
+
+        order, keys, starts = db.bin_segments(bin_index)
+        ends = np.append(starts[1:], order.size)
+        segment = np.repeat(np.arange(keys.size), ends - starts)
+
+        shape = (keys.size, len(self.columns))
+        count = np.zeros(shape, dtype=np.int64)
+        mean = np.zeros(shape)
+        m2 = np.zeros(shape)
+
+        for i, column in enumerate(self.columns):
+            values = data[column].to_numpy(dtype=np.float64)
+
+            self.sketches[column].update(bin_index, values)
+
+            values = values[order]
+            valid = ~np.isnan(values)
+            count[:, i] = db.segment_sum(valid, starts)
+
+            mean[:, i] = db.segment_sum(np.where(valid, values, 0),
+                                        starts) / np.maximum(count[:, i], 1)
+            deviation = np.where(valid, values - mean[segment, i], 0)
+            m2[:, i] = db.segment_sum(deviation ** 2, starts)
+
+        label_count = np.stack(
+            list(db.segment_counts(data[self.label_column].to_numpy(),
+                                   order, starts, self.labels).values()),
+            axis=1
+        ).reshape(keys.size, len(self.labels))
+
+        self.combine(keys, count, mean, m2, label_count)
+
+    def merge(self, other) -> None:
+        """Add all data points of another accumulator"""
+        if other.columns is None:
+            return None
+        if self.columns is None:
+            self.columns = list(other.columns)
+            self.reset_columns()
+
+        assert other.columns == self.columns and \
+            other.labels == self.labels and \
+            other.resolutions == self.resolutions and \
+            other.max_buckets == self.max_buckets, \
+            "ONLY ACCUMULATORS OF SAME COLUMNS AND LABELS CAN BE MERGED!"
+
+        for column in self.columns:
+            self.sketches[column].merge(other.sketches[column])
+
+        self.combine(other.keys, other.count, other.mean, other.m2,
+                     other.label_count)
+
+    def regroup(self, cell_map: tp.Callable) -> None:
+        """
+        Combine bins (e.g. into coarser distance bins), where 'cell_map'
+        maps old to new bin numbers. Moments of the bins that are
+        combined are merged exactly (as in combine), the sketches are
+        regrouped as well.
+        """
+        new_keys = np.asarray(cell_map(self.keys), dtype=np.int64)
+        order = np.argsort(new_keys, kind="stable")
+        keys, starts = np.unique(new_keys[order], return_index=True)
+        group = np.repeat(np.arange(keys.size),
+                          np.diff(np.append(starts, order.size)))
+
+        def group_sum(values):
+            """Sums over the old bins of each new bin"""
+            if keys.size == 0:
+                return values[:0]
+            return np.add.reduceat(values[order], starts, axis=0)
+
+        self.label_count = group_sum(self.label_count)
+
+        if self.columns is not None:
+            # n = sum(n_i), mean = sum(n_i * mean_i) / n and
+            # M2 = sum(M2_i + n_i * (mean_i - mean)^2)
+            count = group_sum(self.count)
+            mean = group_sum(self.count * self.mean) / np.maximum(count, 1)
+            deviation = np.zeros(self.mean.shape)
+            deviation[order] = self.mean[order] - mean[group]
+            m2 = group_sum(self.m2 + self.count * deviation ** 2)
+
+            self.count, self.mean, self.m2 = count, mean, m2
+
+            for sketch in self.sketches.values():
+                sketch.regroup(cell_map)
+
+        self.keys = keys
+
+    def reset_columns(self) -> None:
+        """Empty statistics for the columns in self.columns"""
+        shape = (self.keys.size, len(self.columns))
+        self.count = np.zeros(shape, dtype=np.int64)
+        self.mean = np.zeros(shape)
+        self.m2 = np.zeros(shape)
+        self.sketches = {
+            column: QuantileSketch(self.alpha, self.resolutions.get(column),
+                                   self.max_buckets)
+            for column in self.columns
+        }
+
+    def combine(self, keys, count, mean, m2, label_count) -> None:
+        """Merge statistics of (sorted, unique) bins 'keys' into self"""
+        all_keys = np.union1d(self.keys, keys)
+        own = np.searchsorted(all_keys, self.keys)
+        new = np.searchsorted(all_keys, keys)
+
+        # Counts are added up, means and M2 combined following Chan et
+        # al. (n = n_a + n_b, delta = mean_b - mean_a)
+        n_a = np.zeros((all_keys.size, len(self.columns)), dtype=np.int64)
+        n_b = np.zeros_like(n_a)
+        mean_a = np.zeros(n_a.shape)
+        mean_b = np.zeros(n_a.shape)
+        m2_tot = np.zeros(n_a.shape)
+
+        n_a[own], mean_a[own], m2_tot[own] = self.count, self.mean, self.m2
+        n_b[new], mean_b[new] = count, mean
+        m2_tot[new] += m2
+
+        n_tot = n_a + n_b
+        weight_b = n_b / np.maximum(n_tot, 1)
+        delta = mean_b - mean_a
+
+        self.mean = mean_a + delta * weight_b
+        self.m2 = m2_tot + delta ** 2 * n_a * weight_b
+        self.count = n_tot
+
+        labels_tot = np.zeros((all_keys.size, len(self.labels)),
+                              dtype=np.int64)
+        labels_tot[own] += self.label_count
+        labels_tot[new] += label_count
+        self.label_count = labels_tot
+
+        self.keys = all_keys
+
+    def save(self, file_name: str) -> None:
+        """Write accumulator to (npz) file, see load"""
+        arrays = {
+            "alpha": np.array(self.alpha),
+            "labels": np.array(self.labels, dtype=str),
+            "label_column": np.array(self.label_column),
+            "resolution_columns": np.array(list(self.resolutions),
+                                           dtype=str),
+            "resolution_values": np.array(list(self.resolutions.values()),
+                                          dtype=np.float64),
+            "max_buckets": np.array(self.max_buckets),
+            "keys": self.keys,
+            "label_count": self.label_count
+        }
+        if self.columns is not None:
+            arrays.update({
+                "columns": np.array(self.columns, dtype=str),
+                "count": self.count,
+                "mean": self.mean,
+                "m2": self.m2
+            })
+            for i, column in enumerate(self.columns):
+                arrays[f"sketch_keys_{i}"] = self.sketches[column].keys
+                arrays[f"sketch_counts_{i}"] = self.sketches[column].counts
+                arrays[f"sketch_level_{i}"] = \
+                    np.array(self.sketches[column].level)
+
+        # Write to a temporary file first, so that an interrupted run
+        # never leaves a half-written file behind
+        tmp_name = f"{file_name[:-4]}.{os.getpid()}.tmp.npz"
+        np.savez(tmp_name, **arrays)
+        os.replace(tmp_name, file_name)
+
+    @classmethod
+    def load(cls, file_name: str):
+        """Read accumulator from file written with save"""
+        with np.load(file_name, allow_pickle=False) as arrays:
+            accumulator = cls(
+                labels=arrays["labels"].tolist(),
+                label_column=str(arrays["label_column"]),
+                alpha=float(arrays["alpha"]),
+                resolutions=dict(zip(
+                    arrays["resolution_columns"].tolist(),
+                    arrays["resolution_values"].tolist()
+                )),
+                max_buckets=int(arrays["max_buckets"])
+            )
+            accumulator.keys = arrays["keys"]
+            accumulator.label_count = arrays["label_count"]
+
+            if "columns" in arrays.files:
+                accumulator.columns = arrays["columns"].tolist()
+                accumulator.count = arrays["count"]
+                accumulator.mean = arrays["mean"]
+                accumulator.m2 = arrays["m2"]
+
+                for i, column in enumerate(accumulator.columns):
+                    sketch = QuantileSketch(
+                        accumulator.alpha,
+                        accumulator.resolutions.get(column),
+                        accumulator.max_buckets
+                    )
+                    sketch.keys = arrays[f"sketch_keys_{i}"]
+                    sketch.counts = arrays[f"sketch_counts_{i}"]
+                    sketch.level = int(arrays[f"sketch_level_{i}"])
+                    accumulator.sketches[column] = sketch
+
+        return accumulator
+
+    def label_counts(self) -> tp.Dict:
+        """Number of data points of each label per bin"""
+        return {label: self.label_count[:, i]
+                for i, label in enumerate(self.labels)}
+
+    def statistics(self) -> pd.DataFrame:
+        """
+        Statistics of all bins in the layout of binned_statistics
+        (blocks of rows tagged by "Type"). Mean and standard deviation
+        are exact, median and quartiles come from the sketches.
+        """
+        empty = self.count == 0
+        stats = {
+            "mean": np.where(empty, np.nan, self.mean),
+            "std": np.sqrt(
+                self.m2 / np.where(self.count > 1, self.count - 1, np.nan)
+            ),
+            "median": self.sketch_quantiles(0.5),
+            "q1": self.sketch_quantiles(0.25),
+            "q3": self.sketch_quantiles(0.75)
+        }
+
+        return pd.concat(
+            objs=[
+                pd.DataFrame(stats[stat_type], columns=self.columns)
+                .assign(Type=stat_type)
+                for stat_type in db.STAT_TYPES
+            ],
+            ignore_index=True
+        )
+
+    def sketch_quantiles(self, q: float) -> np.ndarray:
+        """Quantile 'q' for all bins and columns from sketches"""
+        return np.stack(
+            [self.sketches[column].quantile(self.keys, q)
+             for column in self.columns],
+            axis=1
+        ).reshape(self.keys.size, len(self.columns))
+
+
+def spill_bins(spill_dir: str, part_name: str, data: pd.DataFrame,
+               bin_index: np.ndarray) -> None:
+    """
+    Write the data points of each distance bin to their own directory
+    in 'spill_dir' (as data set 'part_name'), so that the data of one
+    bin can be read in later without the data of all others
+    """
+    order, keys, starts = db.bin_segments(bin_index)
+    ends = np.append(starts[1:], order.size)
+    sorted_data = data.iloc[order]
+
+    for key, start, end in zip(keys, starts, ends):
+        bin_dir = f"{spill_dir}/{key:06d}"
+        os.makedirs(bin_dir, exist_ok=True)
+        storage.write_frame(f"{bin_dir}/{part_name}",
+                            sorted_data.iloc[start:end])
+
+
+def remove_part(spill_dir: str, part_name: str) -> None:
+    """Remove the data set 'part_name' from all spilled bins"""
+    if not os.path.isdir(spill_dir):
+        return None
+
+    for name in os.listdir(spill_dir):
+        bin_dir = f"{spill_dir}/{name}"
+
+        for file in os.listdir(bin_dir):
+            if storage.file_stem(file) == part_name:
+                os.remove(f"{bin_dir}/{file}")
+
+        # Bins without any data are removed completely
+        if not os.listdir(bin_dir):
+            os.rmdir(bin_dir)
+
+    return None
+
+
+def read_spilled_bin(spill_dir: str, key: int,
+                     part_names: tp.List[str]) -> pd.DataFrame:
+    """
+    All data points of one spilled bin, with the parts concatenated in
+    the order of 'part_names' (parts that do not exist are skipped)
+    """
+    bin_dir = f"{spill_dir}/{key:06d}"
+    stems = storage.list_frames(bin_dir)
+
+    return pd.concat(
+        [storage.read_frame(f"{bin_dir}/{name}")
+         for name in part_names if name in stems],
+        ignore_index=True
+    )
+
+
+def exact_statistics(spill_dir: str, keys: np.ndarray,
+                     part_names: tp.List[str]) -> pd.DataFrame:
+    """
+    Exact statistics (binned_statistics) of the spilled bins 'keys',
+    computed with only one bin in memory at a time
+    """
+    bin_stats = []
+
+    for key in keys:
+        data = read_spilled_bin(spill_dir, key, part_names)
+        bin_stats.append(db.binned_statistics(
+            data, np.arange(data.shape[0]), np.array([0])
+        ))
+
+    # Each bin gives one row per statistic, which are sorted into the
+    # blocks of the full statistics frame
+    total_stats = pd.concat(bin_stats, ignore_index=True)
+    type_rank = total_stats["Type"].map(db.STAT_TYPES.index).to_numpy()
+
+    return total_stats.iloc[
+        np.argsort(type_rank, kind="stable")
+    ].reset_index(drop=True)
+
+
+def clear_spill(spill_dir: str) -> None:
+    """Remove all spilled data"""
+    if os.path.isdir(spill_dir):
+        shutil.rmtree(spill_dir)
@@ -0,0 +1,351 @@
+import io
+import os
+import sys
+import json
+import time
+import subprocess
+import contextlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from MODULES.pspdata import data_handling as dh
+from MODULES.pspdata import data_catalogue
+from MODULES.pspdata import data_synthetic as ds
+from MODULES.pspdata import data_turnaround as ta
+from MODULES.Plotting import plotset_general as pg
+from MODULES.Plotting import plotset_observations as po
+from MODULES.stat import stats_databin as db
+from MODULES.misc import metrics
+from MODULES.misc import storage
+from MODULES.misc.lazy import LazyModule
+from MODULES.constants import R_SUN
+from MODULES.config import BENCHMARK_SIZES, BENCHMARK_REPEAT, \
+    BENCHMARK_MIN_TIME, BENCHMARK_DIR, BENCHMARK_THRESHOLDS, \
+    BENCHMARK_TOLERANCE
+
+# "--update" STORES THE TIMES OF THIS RUN AS NEW THRESHOLDS (see
+# BENCHMARK_TOLERANCE in config) INSTEAD OF CHECKING AGAINST THEM.
+# "--profile" PROFILES THE RUN (see MODULES/misc/profiling.py)
+UPDATE = "--update" in sys.argv
+PROFILE = "--profile" in sys.argv
+
+# Benchmarked steps of the evaluation (ingestion covers reading, quality
+# rules and time averaging of all files of one encounter, the time
+# averaging is also given on its own)
+STEPS = ["ingestion", "time_averaging", "binning", "statistics",
+         "ingress_egress", "plotting"]
+DISTANCE_BIN_SIZE = 0.1
+
+# Entry points whose start-up (imports and module-level code, without
+# main) is timed in a fresh interpreter, with the arguments they need
+ENTRY_POINTS = {
+    "1_data_eval": ["1_data_eval.py", "0.1"],
+    "2_binned_stats": ["2_binned_stats.py", "0.1"],
+    "3_ingress_egress": ["3_ingress_egress.py", "0.1"],
+    "4_observation_plots": ["4_observation_plots.py"],
+    "5_comparison_plots": ["5_comparison_plots.py"],
+    "6_nirwave_poly_comparison": ["6_nirwave_poly_comparison.py"],
+    "7_batch_comparison": ["7_batch_comparison.py", "."],
+    "run_pipeline": ["run_pipeline.py", "0.1"]
+}
+# Stored data sets of the current evaluation whose write and read-in is
+# timed with each storage backend (see MODULES/misc/storage.py)
+STORAGE_DATA = ["BINNED_DATA", "SPLIT_DATA"]
+STARTUP_CODE = "import sys, runpy; sys.argv = sys.argv[1:]; " \
+    "sys.path[0] = sys.argv.pop(0); " \
+    "runpy.run_path(sys.argv[0], run_name='startup')"
+ROOT = sys.path[0]
+
+# matplotlib is imported on first use (see LazyModule)
+plt = LazyModule("matplotlib.pyplot")
+
+# The files of the synthetic encounters are catalogued separately from
+# the files of the data directory
+data_catalogue.CATALOGUE_FILE = f"{BENCHMARK_DIR}/catalogue.json"
+
+
+def synthetic_encounter(num_records: int) -> str:
+    """
+    Folder of a synthetic encounter with 'num_records' records per
+    instrument (written on first use, the same seed always gives the
+    same files)
+    """
+    folder = f"{BENCHMARK_DIR}/{num_records}/encounter_8"
+    done_file = f"{folder}/COMPLETE"
+
+    if not os.path.isfile(done_file):
+        print(f"WRITING SYNTHETIC ENCOUNTER WITH {num_records} RECORDS")
+        ds.write_encounter(folder, num_records)
+        open(done_file, "w").close()
+
+    return folder
+
+
+def repeat_timed(function, repeat: int = BENCHMARK_REPEAT,
+                 min_time: float = BENCHMARK_MIN_TIME):
+    """
+    Wall time (seconds) of each call, and the last result. The function
+    is called at least 'repeat' times, and until the calls took
+    'min_time' seconds in total.
+    """
+    seconds = []
+    while len(seconds) < repeat or sum(seconds) < min_time:
+        start = time.perf_counter()
+        result = function()
+        seconds.append(time.perf_counter() - start)
+
+    return seconds, result
+
+
+def benchmark_startup() -> dict:
+    """
+    Fastest start-up time of each entry point (see ENTRY_POINTS), of the
+    bare interpreter (for reference) and of a worker process started
+    with "spawn" (which imports the modules of the main script again,
+    as on macOS and Windows)
+    """
+    times = {}
+
+    seconds, _ = repeat_timed(lambda: subprocess.run(
+        [sys.executable, "-c", "pass"], check=True
+    ))
+    times["interpreter"] = min(seconds)
+
+    for name, (script, *args) in ENTRY_POINTS.items():
+        seconds, _ = repeat_timed(lambda: subprocess.run(
+            [sys.executable, "-c", STARTUP_CODE, ROOT, script] + args,
+            cwd=ROOT, stdout=subprocess.DEVNULL, check=True
+        ))
+        times[name] = min(seconds)
+
+    def worker_spawn():
+        with ProcessPoolExecutor(
+                max_workers=1,
+                mp_context=multiprocessing.get_context("spawn")) as pool:
+            pool.submit(os.getpid).result()
+
+    seconds, _ = repeat_timed(worker_spawn)
+    times["worker_spawn"] = min(seconds)
+
+    for step, step_time in times.items():
+        metrics.timer("benchmark", step_time, step=step, records="startup")
+
+    return times
+
+
+def benchmark_storage() -> tuple:
+    """
+    Fastest time to write and to read in all data sets of each of
+    STORAGE_DATA (as stored by the current evaluation in STATISTICS)
+    with each storage backend, and the size of the written files (MB)
+    """
+    frames = {}
+    for data_dir in STORAGE_DATA:
+        directory = f"{ROOT}/STATISTICS/{data_dir}"
+        if os.path.isdir(directory):
+            frames[data_dir] = {
+                stem: storage.read_frame(f"{directory}/{stem}")
+                for stem in storage.list_frames(directory)
+            }
+
+    times = {}
+    sizes = {}
+    for backend in storage.EXTENSIONS:
+        for data_dir, data_sets in frames.items():
+            directory = f"{BENCHMARK_DIR}/storage/{backend}/{data_dir}"
+            os.makedirs(directory, exist_ok=True)
+            step = f"{backend}_{data_dir.lower()}"
+
+            seconds, names = repeat_timed(lambda: [
+                storage.write_frame(f"{directory}/{stem}", data, backend)
+                for stem, data in data_sets.items()
+            ])
+            times[f"{step}_write"] = min(seconds)
+            sizes[step] = sum(os.path.getsize(name) for name in names) / 1e6
+
+            seconds, _ = repeat_timed(lambda: [
+                storage.read_frame(f"{directory}/{stem}")
+                for stem in data_sets
+            ])
+            times[f"{step}_read"] = min(seconds)
+
+    for step, step_time in times.items():
+        metrics.timer("benchmark", step_time, step=step, records="storage")
+
+    return times, sizes
+
+
+def benchmark_size(num_records: int) -> tuple:
+    """
+    Fastest wall time of each step (see STEPS) on a synthetic encounter
+    with 'num_records' records per instrument, and the number of rows
+    that go into the time averaging (after the quality rules)
+    """
+    folder = synthetic_encounter(num_records)
+    times = {}
+
+    # Ingestion, without the cache and in a single process. The time
+    # averaging of each file is taken from its timer, the rows it
+    # averages from the data point counters (see metrics)
+    averaging = []
+    rows = []
+
+    def ingestion():
+        with metrics.capture() as events, \
+                contextlib.redirect_stdout(io.StringIO()):
+            data = pd.concat(
+                [dh.encounter_data(f"{folder}/SPC", pd.DataFrame(), "SPC",
+                                   cache="off"),
+                 dh.encounter_data(f"{folder}/SPAN-I", pd.DataFrame(),
+                                   "SPAN-I", cache="off")],
+                ignore_index=True
+            )
+
+        averaging.append(sum(event["value"] for event in events
+                             if event["name"] == "time_averaging"))
+        rows.append(sum(event["value"] for event in events
+                        if event["name"] == "data_points" and
+                        event["labels"]["step"] == "dqf"))
+        return data
+
+    seconds, data = repeat_timed(ingestion)
+    times["ingestion"] = min(seconds)
+    times["time_averaging"] = min(averaging)
+
+    # Binning and statistics, as in the data evaluation
+    distance_bins = np.arange(0, 100, DISTANCE_BIN_SIZE)
+
+    seconds, (order, _, starts) = repeat_timed(
+        lambda: db.bin_segments(
+            np.digitize(data.posR * 1e3 / R_SUN, distance_bins)
+        )
+    )
+    times["binning"] = min(seconds)
+
+    seconds, _ = repeat_timed(
+        lambda: db.binned_statistics(data, order, starts)
+    )
+    times["statistics"] = min(seconds)
+
+    seconds, _ = repeat_timed(lambda: ta.ingress_egress_parts(data))
+    times["ingress_egress"] = min(seconds)
+
+    # Epoch plot of the whole encounter (as in the ingress/egress
+    # evaluation)
+    def plotting():
+        fig, ax_r, ax_vr, ax_np = po.plot_setup_obs_epoch()
+        po.plot_fill_epoch("benchmark", ax_r, ax_vr, ax_np,
+                           data.loc[data["Inst"] == "SPC"],
+                           data.loc[data["Inst"] == "SPAN"], BENCHMARK_DIR)
+        plt.close(fig)
+
+    seconds, _ = repeat_timed(plotting)
+    times["plotting"] = min(seconds)
+
+    for step, step_time in times.items():
+        metrics.timer("benchmark", step_time,
+                      amount=rows[-1] if step == "time_averaging" else None,
+                      step=step, records=num_records)
+
+    return times, rows[-1]
+
+
+def load_thresholds() -> dict:
+    """Stored thresholds (seconds) per size (or "startup") and step"""
+    if not os.path.isfile(BENCHMARK_THRESHOLDS):
+        return {}
+
+    with open(BENCHMARK_THRESHOLDS, "r") as f:
+        return json.load(f)
+
+
+def store_thresholds(results: dict) -> None:
+    """
+    Store the times of 'results' as thresholds, increased by the
+    tolerance (thresholds of other sizes are kept)
+    """
+    thresholds = load_thresholds()
+    for num_records, times in results.items():
+        thresholds[str(num_records)] = {
+            step: float(f"{step_time * (1 + BENCHMARK_TOLERANCE):.4g}")
+            for step, step_time in times.items()
+        }
+
+    tmp_name = f"{BENCHMARK_THRESHOLDS}.{os.getpid()}.tmp"
+    with open(tmp_name, "w") as f:
+        json.dump(thresholds, f, indent=1, sort_keys=True)
+    os.replace(tmp_name, BENCHMARK_THRESHOLDS)
+
+
+def report(results: dict, thresholds: dict, rows: dict,
+           sizes: dict) -> list:
+    """
+    Print the time and threshold of each step (and the rows per second
+    of the time averaging, see benchmark_size, and the file sizes of
+    the storage backends, see benchmark_storage), and return the steps
+    (size, "startup" or "storage", step) that are slower than their
+    threshold
+    """
+    regressions = []
+
+    print("\n##### BENCHMARK SUMMARY #####")
+    for num_records, times in results.items():
+        for step, step_time in times.items():
+            threshold = thresholds.get(str(num_records), {}).get(step)
+
+            if threshold is None:
+                status = "NO THRESHOLD"
+            elif step_time > threshold:
+                status = "REGRESSION"
+                regressions.append((num_records, step))
+            else:
+                status = "OK"
+
+            threshold_text = "-" if threshold is None \
+                else f"{threshold:.4g} s"
+            print(f"{num_records:>9} {step:<26} {step_time:>10.4g} s "
+                  f"{threshold_text:>12}   {status}")
+
+            if step == "time_averaging" and step_time > 0:
+                print(f"{'':>9} {'(rows per second)':<26} "
+                      f"{rows[num_records] / step_time:>12.3g}")
+
+            if step.endswith("_read") and step[:-5] in sizes:
+                print(f"{'':>9} {'(MB on disk)':<26} "
+                      f"{sizes[step[:-5]]:>12.3g}")
+
+    return regressions
+
+
+def main():
+    metrics.start("benchmark", profile=PROFILE)
+
+    results = {"startup": benchmark_startup()}
+    results["storage"], sizes = benchmark_storage()
+    rows = {}
+    for num_records in BENCHMARK_SIZES:
+        results[num_records], rows[num_records] = \
+            benchmark_size(num_records)
+
+    if UPDATE:
+        store_thresholds(results)
+        report(results, load_thresholds(), rows, sizes)
+        print(f"\nTHRESHOLDS WRITTEN TO {BENCHMARK_THRESHOLDS}")
+        regressions = []
+    else:
+        regressions = report(results, load_thresholds(), rows, sizes)
+
+    metrics.flush()
+
+    # Non-zero exit status if any step got slower than its threshold
+    if regressions:
+        print(f"\n{len(regressions)} STEP(S) SLOWER THAN THRESHOLD!")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    # Set-up plot parameters
+    pg.rc_setup()
+
+    main()
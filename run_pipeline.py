@@ -0,0 +1,107 @@
+import sys
+import time
+from MODULES.misc import pipeline
+from MODULES.misc import storage
+from MODULES.misc import metrics
+from MODULES.config import CACHE_DIR, STORAGE_BACKEND
+
+# SIZE OF DISTANCE BINS IN R_SOL
+BIN_LENGTH = sys.argv[1]
+
+# "--force" runs all stages, even if their outputs are up to date.
+# "--profile" profiles the runner and every stage (see
+# MODULES/misc/profiling.py). All other arguments (e.g. "--stream",
+# "--no-cache") are passed on to the data evaluation
+FORCE = "--force" in sys.argv
+PROFILE = "--profile" in sys.argv
+PROFILE_ARGS = ["--profile"] if PROFILE else []
+EVAL_ARGS = [arg for arg in sys.argv[2:]
+             if arg not in ["--force", "--profile"]]
+
+ROOT = sys.path[0]
+STATE_FILE = f"{CACHE_DIR}/pipeline_state.json"
+PSP_STATISTICS = \
+    f"STATISTICS/PSP_STATISTICS{storage.EXTENSIONS[STORAGE_BACKEND]}"
+
+# STAGES OF THE EVALUATION WITH THE FILES THEY READ AND WRITE (the order
+# of the stages only matters for the summary, stages are run as soon as
+# the stages writing their inputs are finished). Every stage reads the
+# shared code and settings in MODULES (config included)
+STAGES = [
+    # ANALYSE WHOLE DATA SET AND BIN ACCORDING TO BIN LENGTH
+    pipeline.Stage(
+        name="1_data_eval",
+        command=[sys.executable, "1_data_eval.py", BIN_LENGTH] +
+                EVAL_ARGS + PROFILE_ARGS,
+        inputs=["1_data_eval.py", "MODULES", "data"],
+        outputs=[PSP_STATISTICS, "STATISTICS/BINNED_DATA",
+                 "STATISTICS/SPLIT_DATA", "STATISTICS/PYRAMID",
+                 "PLOTS/datapoints.eps"]
+    ),
+    # HISTOGRAMS OF EACH BINNED FILE
+    pipeline.Stage(
+        name="2_binned_stats",
+        command=[sys.executable, "2_binned_stats.py", BIN_LENGTH] +
+                PROFILE_ARGS,
+        inputs=["2_binned_stats.py", "MODULES", "STATISTICS/BINNED_DATA"],
+        outputs=["PLOTS/BinHistograms"]
+    ),
+    # REITERATE PROCESS, BUT SPLIT BETWEEN INGRESS AND EGRESS
+    pipeline.Stage(
+        name="3_ingress_egress",
+        command=[sys.executable, "3_ingress_egress.py", BIN_LENGTH] +
+                PROFILE_ARGS,
+        inputs=["3_ingress_egress.py", "MODULES", "STATISTICS/SPLIT_DATA",
+                "STATISTICS/PYRAMID", PSP_STATISTICS],
+        outputs=["PLOTS/IngressEgressPlots"]
+    ),
+    # FINAL PLOTS OF OBSERVATIONAL DATA
+    pipeline.Stage(
+        name="4_observation_plots",
+        command=[sys.executable, "4_observation_plots.py"] + PROFILE_ARGS,
+        inputs=["4_observation_plots.py", "MODULES", PSP_STATISTICS],
+        outputs=["PLOTS/ObsDataPlots"]
+    ),
+    # COMPARISON PLOTS OF SIMULATION RESULTS AND OBSERVATIONS
+    pipeline.Stage(
+        name="5_comparison_plots",
+        command=[sys.executable, "5_comparison_plots.py"] + PROFILE_ARGS,
+        inputs=["5_comparison_plots.py", "MODULES", PSP_STATISTICS,
+                "STATISTICS/NIRwave_equatorial.csv",
+                "STATISTICS/NIRwave_polar.csv",
+                "STATISTICS/MASSLOSS_CONTOURS"],
+        outputs=["PLOTS/ComparisonPlots", "OUTER_BOUNDARY_COMPARISON.dat"]
+    ),
+    # COMPARISON BETWEEN NIRWAVE AND POLYTROPE
+    pipeline.Stage(
+        name="6_nirwave_poly_comparison",
+        command=[sys.executable, "6_nirwave_poly_comparison.py"] +
+                PROFILE_ARGS,
+        inputs=["6_nirwave_poly_comparison.py", "MODULES", PSP_STATISTICS,
+                "STATISTICS/NIRwave_equatorial.csv",
+                "STATISTICS/NIRwave_polar.csv",
+                "STATISTICS/poly_equatorial.csv",
+                "STATISTICS/poly_polar.csv"],
+        outputs=["PLOTS/eos-comparison"]
+    )
+]
+
+
+def main():
+    # Wall time of every stage (see metrics), profiled with "--profile"
+    metrics.start("run_pipeline", profile=PROFILE)
+
+    start = time.perf_counter()
+    results = pipeline.run(STAGES, STATE_FILE, ROOT, force=FORCE)
+    pipeline.report(results, time.perf_counter() - start)
+
+    metrics.flush()
+
+    # Non-zero exit status if any stage failed
+    if any(status in (pipeline.STATUS_FAIL, pipeline.STATUS_BLOCKED)
+           for status, _ in results.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
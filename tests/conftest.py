@@ -0,0 +1,8 @@
+import os
+import sys
+
+# The tests import the evaluation modules (MODULES) from the root of the
+# repository, as the numbered scripts do
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
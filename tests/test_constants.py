@@ -0,0 +1,26 @@
+import pytest
+from MODULES import constants
+
+astropy_constants = pytest.importorskip("astropy.constants")
+
+# Names of the constants in astropy.constants, and the relative
+# difference that is accepted (the proton mass differs by about 1e-9
+# between CODATA 2018 and 2022)
+ASTROPY_NAMES = {
+    "R_SUN": "R_sun",
+    "M_SUN": "M_sun",
+    "GM_SUN": "GM_sun",
+    "AU": "au",
+    "K_B": "k_B",
+    "M_P": "m_p",
+    "E_CHARGE": "e"
+}
+TOLERANCE = 1e-8
+
+
+@pytest.mark.parametrize("name", ASTROPY_NAMES)
+def test_matches_astropy(name):
+    reference = getattr(astropy_constants, ASTROPY_NAMES[name]).si.value
+
+    assert getattr(constants, name) == pytest.approx(reference,
+                                                      rel=TOLERANCE)
@@ -0,0 +1,74 @@
+import os
+import numpy as np
+import pytest
+from MODULES.pspdata import data_handling as dh
+from MODULES.pspdata import data_catalogue
+from MODULES.pspdata import data_synthetic as ds
+
+
+@pytest.fixture(scope="module")
+def encounter(tmp_path_factory):
+    """Synthetic encounter with a few thousand records per instrument"""
+    folder = tmp_path_factory.mktemp("data") / "encounter_8"
+    ds.write_encounter(str(folder), 5000)
+
+    return folder
+
+
+@pytest.mark.parametrize("inst, inst_dir", [("SPC", "SPC"),
+                                            ("SPAN-I", "SPAN-I")])
+def test_time_avg_length(encounter, inst, inst_dir):
+    directory = encounter / inst_dir
+    averaged = 0
+    for file in sorted(os.listdir(directory)):
+        columns, lengths, _ = dh.reduce_file(str(directory / file), inst,
+                                             cache="off")
+
+        # Counted after the time averaging, not before (files outside of
+        # the domain have no data points at all)
+        assert lengths["time_avg"] == columns["epoch"].size
+        assert lengths["time_avg"] <= lengths["dqf"] <= lengths["raw"]
+        averaged += lengths["dqf"] - lengths["time_avg"]
+
+    assert averaged > 0
+
+
+def full_load(monkeypatch, file_name, inst):
+    """
+    Reduced file with all records read, so that only the distance rule
+    restricts the data to the domain (as before the catalogue)
+    """
+    with monkeypatch.context() as patch:
+        patch.setattr(dh, "domain_records", lambda *args: 0)
+        columns, lengths, _ = dh.reduce_file(file_name, inst, cache="off")
+
+    return columns, lengths
+
+
+@pytest.mark.parametrize("inst, inst_dir", [("SPC", "SPC"),
+                                            ("SPAN-I", "SPAN-I")])
+def test_catalogue_pushdown(monkeypatch, encounter, inst, inst_dir):
+    directory = encounter / inst_dir
+    kinds = set()
+
+    for file in sorted(os.listdir(directory)):
+        file_name = str(directory / file)
+        entry = data_catalogue.file_entry(file_name, inst)
+        expected, expected_lengths = full_load(monkeypatch, file_name, inst)
+
+        # With the catalogue entry, and with the position read first
+        for file_entry in (entry, None):
+            columns, lengths, _ = dh.reduce_file(file_name, inst,
+                                                 cache="off",
+                                                 entry=file_entry)
+
+            assert lengths == expected_lengths
+            for name, values in expected.items():
+                np.testing.assert_array_equal(columns[name], values)
+
+        kinds.add("outside" if entry["r_min"] > dh.MAX_DISTANCE_KM else
+                  "inside" if entry["r_max"] <= dh.MAX_DISTANCE_KM else
+                  "partial")
+
+    # The encounter has files of all three kinds
+    assert kinds == {"outside", "inside", "partial"}
@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+import pytest
+from MODULES.constants import R_SUN
+from MODULES.pspdata import data_handling as dh
+from MODULES.pspdata import data_quality as dq
+
+FILL_VALUE = -1e30
+
+
+def measurements(size):
+    """
+    Measurements of both instruments, partly outside of the domain,
+    flagged, failed or outside of the field of view (often several at
+    once)
+    """
+    rng = np.random.default_rng(size)
+    data = pd.DataFrame({
+        "dqf": np.where(rng.random(size) < 0.2,
+                        rng.integers(1, 16, size), 0),
+        "posR": R_SUN / 1e3 * rng.uniform(30, 50, size),
+        "vr": rng.normal(350, 80, size),
+        "np": rng.lognormal(5, 1, size),
+        "wp": rng.normal(50, 10, size),
+        "fov_peak_idx": rng.integers(0, 8, size)
+    })
+    for key in ["vr", "np", "wp"]:
+        data.loc[rng.random(size) < 0.05, key] = FILL_VALUE
+
+    return data
+
+
+def sequential_spc(data):
+    """
+    Reduction as before the quality rules: distance restriction, then
+    dropping the flagged, then the failed measurements
+    """
+    data = data[data.posR <= dh.MAX_DISTANCE_KM].reset_index(drop=True)
+    rejected = {"distance": 0, "general_flag": data.shape[0]}
+
+    bad_ind = np.asarray(data.dqf.values != 0).nonzero()[0]
+    data = data.drop(bad_ind).reset_index(drop=True)
+    rejected["general_flag"] -= data.shape[0]
+    rejected["failed_meas"] = data.shape[0]
+
+    mf_ind = np.unique(np.concatenate(
+        [np.asarray(data[key] <= -0.5e30).nonzero()[0]
+         for key in ["vr", "np", "wp"]]
+    ))
+    data = data.drop(mf_ind).reset_index(drop=True)
+    rejected["failed_meas"] -= data.shape[0]
+
+    return data, rejected
+
+
+def sequential_span(data):
+    """Reduction as before: distance restriction, then the FOV"""
+    data = data[data.posR <= dh.MAX_DISTANCE_KM].reset_index(drop=True)
+    rejected = {"distance": 0, "fov": data.shape[0]}
+
+    fov_idx = np.where(data["fov_peak_idx"] <= 1)[0]
+    data = data.drop(index=fov_idx).reset_index(drop=True)
+    rejected["fov"] -= data.shape[0]
+
+    return data, rejected
+
+
+@pytest.mark.parametrize("rules, sequential", [
+    (dh.SPC_RULES, sequential_spc),
+    (dh.SPAN_RULES, sequential_span)
+])
+@pytest.mark.parametrize("size", [0, 1, 10_000])
+def test_sequential_parity(rules, sequential, size):
+    data = measurements(size)
+
+    reduced, rejected = dq.apply_rules(data, rules)
+    expected, expected_rejected = sequential(data)
+    expected_rejected["distance"] = \
+        int(np.count_nonzero(data.posR > dh.MAX_DISTANCE_KM))
+
+    pd.testing.assert_frame_equal(reduced.reset_index(drop=True), expected)
+    assert rejected == expected_rejected
+    assert list(rejected) == [name for name, _ in rules]
+    assert sum(rejected.values()) == size - reduced.shape[0]
+
+
+def test_rejection_lengths():
+    assert dq.rejection_lengths({"distance": 3, "fov": 0}) == {
+        f"{dq.REJECTED_PREFIX}distance": 3, f"{dq.REJECTED_PREFIX}fov": 0
+    }
@@ -0,0 +1,93 @@
+import os
+import sys
+import shutil
+import subprocess
+import numpy as np
+import pandas as pd
+import pytest
+from MODULES.pspdata import data_synthetic as ds
+from MODULES.misc import storage
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+NUM_RECORDS = 20000
+BIN_LENGTH = "0.5"
+
+
+@pytest.fixture
+def workdir(tmp_path):
+    """
+    Copy of the data evaluation with synthetic encounters in its data
+    directory (the evaluation works relative to its script location)
+    """
+    shutil.copy(f"{ROOT}/1_data_eval.py", tmp_path)
+    shutil.copytree(f"{ROOT}/MODULES", tmp_path / "MODULES",
+                    ignore=shutil.ignore_patterns("__pycache__"))
+
+    ds.write_encounters(str(tmp_path / "data"), NUM_RECORDS)
+    os.makedirs(tmp_path / "STATISTICS" / "BINNED_DATA")
+    os.makedirs(tmp_path / "STATISTICS" / "SPLIT_DATA")
+    os.makedirs(tmp_path / "PLOTS")
+
+    return tmp_path
+
+
+def data_eval(workdir, *args) -> str:
+    """Run the data evaluation and return its output"""
+    process = subprocess.run(
+        [sys.executable, "1_data_eval.py", BIN_LENGTH, *args],
+        cwd=workdir, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+        text=True
+    )
+    assert process.returncode == 0, process.stdout
+
+    return process.stdout
+
+
+def results(workdir) -> dict:
+    """Statistics and binned data points written by the data evaluation"""
+    stat_dir = workdir / "STATISTICS"
+    bin_dir = stat_dir / "BINNED_DATA"
+
+    frames = {"PSP_STATISTICS": storage.read_frame(
+        str(stat_dir / "PSP_STATISTICS")
+    )}
+    for stem in storage.list_frames(str(bin_dir)):
+        frames[stem] = storage.read_frame(str(bin_dir / stem))
+
+    # The row labels of the binned data depend on the order the data
+    # sets were concatenated in, only the rows themselves are compared
+    return {name: frame.reset_index(drop=True)
+            for name, frame in frames.items()}
+
+
+def modify_file(folder) -> None:
+    """Change the densities of one day of measurements in 'folder'"""
+    file_name = f"{folder}/{sorted(os.listdir(folder))[5]}"
+
+    with np.load(file_name) as arrays:
+        variables = dict(arrays)
+    variables["np_fit"] = np.where(variables["np_fit"] > 0,
+                                   variables["np_fit"] * 1.5,
+                                   variables["np_fit"])
+
+    tmp_name = f"{file_name[:-4]}.tmp.npz"
+    np.savez(tmp_name, **variables)
+    os.replace(tmp_name, file_name)
+
+
+def test_incremental_equals_full_run(workdir):
+    data_eval(workdir, "--incremental")
+    modify_file(workdir / "data" / "encounter_8" / "SPC")
+
+    # Only the encounter with the changed file is evaluated again
+    output = data_eval(workdir, "--incremental")
+    assert output.count("PARTIALS UP TO DATE") == 2
+    incremental = results(workdir)
+
+    data_eval(workdir)
+    full = results(workdir)
+
+    assert incremental.keys() == full.keys()
+    for name, frame in full.items():
+        pd.testing.assert_frame_equal(incremental[name], frame,
+                                      check_exact=True)
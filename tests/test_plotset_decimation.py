@@ -0,0 +1,92 @@
+import numpy as np
+import pytest
+from MODULES.Plotting import plotset_decimation as pdc
+
+COLUMNS = 200
+ROWS = 100
+
+
+def noisy_series(size=100_000, seed=0):
+    """Sorted epoch (datetime64) and a noisy signal with NaN gaps"""
+    rng = np.random.default_rng(seed)
+    x = np.datetime64("2021-01-01") + \
+        np.cumsum(rng.integers(1, 20, size)).astype("timedelta64[s]")
+    y = np.sin(np.linspace(0, 20, size)) + rng.normal(0, 0.3, size)
+    y[rng.choice(size, 50, replace=False)] = np.nan
+    y[40_000:40_500] = np.nan
+
+    return x, y
+
+
+def test_minmax_keeps_extremes_and_gaps():
+    x, y = noisy_series()
+    index = pdc.minmax_indices(x, y, COLUMNS)
+
+    assert index.size < 6 * COLUMNS
+    assert index[0] == 0 and index[-1] == x.size - 1
+
+    column = pdc.cell_index(pdc.numeric_x(x), COLUMNS)
+    for col in np.unique(column):
+        full = y[column == col]
+        kept = y[index][column[index] == col]
+        if np.all(np.isnan(full)):
+            continue
+        assert np.nanmin(kept) == np.nanmin(full)
+        assert np.nanmax(kept) == np.nanmax(full)
+
+        # A gap in the column stays a gap in the line
+        assert np.any(np.isnan(kept)) == np.any(np.isnan(full))
+
+
+def test_minmax_unsorted_unchanged():
+    x = np.random.default_rng(1).permutation(10_000).astype(float)
+    np.testing.assert_array_equal(pdc.minmax_indices(x, x, COLUMNS),
+                                  np.arange(x.size))
+
+
+def test_pixel_indices_keep_every_pixel():
+    rng = np.random.default_rng(2)
+    x = rng.uniform(0, 1, 200_000)
+    y = np.where(rng.uniform(size=x.size) < 0.5,
+                 rng.normal(0, 1, x.size), rng.normal(5, 0.2, x.size))
+    y[::97] = np.nan
+    index = pdc.pixel_indices(x, y, COLUMNS, ROWS)
+
+    valid = np.flatnonzero(~np.isnan(y))
+    column = np.full(x.size, -1)
+    column[valid] = pdc.cell_index(x[valid], COLUMNS)
+    pixel = np.full(x.size, -1)
+    pixel[valid] = column[valid] * ROWS + pdc.cell_index(y[valid], ROWS)
+
+    # One point per occupied pixel, in the original order, no NaN
+    assert np.all(np.diff(index) > 0)
+    assert not np.any(np.isnan(y[index]))
+    np.testing.assert_array_equal(np.sort(pixel[index]),
+                                  np.unique(pixel[valid]))
+
+    # The vertical spread of each pixel column is kept (up to a pixel at
+    # either end)
+    for col in range(COLUMNS):
+        full = y[column == col]
+        kept = y[index][column[index] == col]
+        assert np.ptp(kept) >= np.ptp(full) - 2 * np.ptp(y[valid]) / ROWS
+
+
+@pytest.mark.parametrize("decimation", [True, False])
+def test_decimate_scatter(monkeypatch, decimation):
+    matplotlib = pytest.importorskip("matplotlib")
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    monkeypatch.setattr(pdc, "PLOT_DECIMATION", decimation)
+    x, y = noisy_series()
+    fig, ax = plt.subplots(figsize=(4, 3), dpi=100)
+    x_plot, y_plot = pdc.decimate_scatter(ax, x, y)
+    plt.close(fig)
+
+    if decimation:
+        width, height = pdc.axes_extent(ax)
+        assert x_plot.size <= width * height
+        assert x_plot.size < np.count_nonzero(~np.isnan(y))
+    else:
+        assert x_plot.size == x.size
@@ -0,0 +1,36 @@
+import time
+import pstats
+import cProfile
+from MODULES.misc import profiling
+
+
+def inner():
+    time.sleep(0.02)
+
+
+def outer():
+    for _ in range(3):
+        inner()
+    time.sleep(0.01)
+
+
+def test_folded_stacks():
+    profiler = cProfile.Profile()
+    profiler.enable()
+    outer()
+    inner()
+    profiler.disable()
+
+    stats = pstats.Stats(profiler)
+    stats.strip_dirs()
+    lines = profiling.folded_stacks(stats)
+    stacks = {line.rsplit(" ", 1)[0]: int(line.rsplit(" ", 1)[1])
+              for line in lines}
+
+    # The sleep of inner is found below outer and on its own, and the
+    # stacks add up to the total time of the profile
+    nested = [stack for stack in stacks
+              if stack.startswith("outer (") and ";inner (" in stack]
+    assert nested
+    assert any(stack.startswith("inner (") for stack in stacks)
+    assert abs(sum(stacks.values()) / 1e6 - stats.total_tt) < 1e-3
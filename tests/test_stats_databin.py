@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+import pytest
+from MODULES.constants import R_SUN
+from MODULES.stat import stats_databin as db
+
+DISTANCE_BIN_SIZE = 0.1
+
+
+def random_frame(rng, size):
+    """
+    Binned measurements with NaN values, bins with a single data point
+    and a bin where one column is NaN throughout
+    """
+    data = pd.DataFrame({
+        "epoch": 1_600_000_000 * 10 ** 9 +
+        np.arange(size, dtype=np.int64) * 10 ** 10,
+        "posR": R_SUN / 1e3 * rng.uniform(15, 40, size),
+        "vr": rng.normal(350, 80, size).astype(np.float32),
+        "np": rng.lognormal(5, 1, size),
+        "Temp": rng.lognormal(13, 0.5, size),
+        "Inst": pd.Categorical(rng.choice(["SPC", "SPAN"], size),
+                               categories=["SPC", "SPAN"])
+    })
+    data.loc[rng.choice(size, size // 10, replace=False), "np"] = np.nan
+    data.loc[0, "posR"] = 50 * R_SUN / 1e3
+    data.loc[1, "posR"] = 12 * R_SUN / 1e3
+    data.loc[data.posR * 1e3 / R_SUN < 16, "Temp"] = np.nan
+
+    return data
+
+
+def groupby_statistics(data, bin_index):
+    """Statistics as computed before, with five pandas groupby passes"""
+    dist_groups = data.groupby(bin_index)
+
+    return pd.concat(
+        objs=[
+            dist_groups.mean(numeric_only=True).assign(Type="mean"),
+            dist_groups.std(numeric_only=True).assign(Type="std"),
+            dist_groups.median(numeric_only=True).assign(Type="median"),
+            dist_groups.quantile(q=0.25, numeric_only=True).assign(Type="q1"),
+            dist_groups.quantile(q=0.75, numeric_only=True).assign(Type="q3")
+        ],
+        ignore_index=True
+    )
+
+
+@pytest.mark.parametrize("size", [1, 50, 20_000])
+def test_groupby_parity(size):
+    rng = np.random.default_rng(size)
+    data = random_frame(rng, size)
+    bin_index = np.digitize(data.posR * 1e3 / R_SUN,
+                            np.arange(0, 100, DISTANCE_BIN_SIZE))
+
+    order, keys, starts = db.bin_segments(bin_index)
+    stats = db.binned_statistics(data, order, starts)
+    # The data used to be held in double precision throughout, the
+    # engine computes in double precision for single precision columns
+    expected = groupby_statistics(data.astype({"vr": np.float64}),
+                                  bin_index)
+
+    np.testing.assert_array_equal(keys, np.unique(bin_index))
+    assert list(stats.columns) == list(expected.columns)
+    pd.testing.assert_frame_equal(stats.drop(columns="epoch"),
+                                  expected.drop(columns="epoch"),
+                                  check_dtype=False, rtol=1e-12)
+
+    # The epoch (about 1.6e18 ns) is summed in another order, its mean
+    # is only the same to float round-off, and so is its spread
+    np.testing.assert_allclose(stats["epoch"], expected["epoch"],
+                               rtol=1e-10)
+
+    # Data points of each instrument, as counted with value_counts
+    counts = db.segment_counts(data["Inst"].to_numpy(), order, starts,
+                               ["SPC", "SPAN"])
+    for i, (_, group) in enumerate(data.groupby(bin_index)):
+        split_datapts = group["Inst"].value_counts()
+        assert counts["SPC"][i] == split_datapts.get("SPC", 0)
+        assert counts["SPAN"][i] == split_datapts.get("SPAN", 0)
@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+import pytest
+from MODULES.constants import R_SUN
+from MODULES.stat import stats_pyramid as pyr
+from MODULES.stat import stats_stream as ss
+
+
+def part_frame(rng, size):
+    """Measurements of one part of an encounter, with NaN values"""
+    data = pd.DataFrame({
+        "epoch": 1_600_000_000 * 10 ** 9 +
+        np.arange(size, dtype=np.int64) * 10 ** 10,
+        "posR": R_SUN / 1e3 * rng.uniform(15, 40, size),
+        "vr": rng.normal(350, 80, size),
+        "np": rng.lognormal(5, 1, size),
+        "Temp": rng.lognormal(13, 0.5, size),
+        "Inst": rng.choice(pyr.LABELS, size)
+    })
+    data.loc[rng.choice(size, size // 10, replace=False), "np"] = np.nan
+
+    return data
+
+
+@pytest.fixture(scope="module")
+def pyramid(tmp_path_factory):
+    """Pyramid of two encounters, and the data of each part"""
+    pyramid_dir = str(tmp_path_factory.mktemp("pyramid"))
+    rng = np.random.default_rng(0)
+    index = pyr.prepare(pyramid_dir, ["encounter_7", "encounter_8"])
+    data = {}
+
+    for encounter in ["encounter_7", "encounter_8"]:
+        parts = [(designation, part_frame(rng, 5000))
+                 for designation in ["INGRESS", "EGRESS"]]
+        pyr.store_encounter(pyramid_dir, index, encounter, parts)
+        data.update({f"{encounter}_{designation}": part_data
+                     for designation, part_data in parts})
+
+    return pyramid_dir, data
+
+
+@pytest.mark.parametrize("bin_size", [0.05, 0.1, 0.25, 1.0])
+@pytest.mark.parametrize("parts, labels", [
+    (None, None),
+    (["encounter_8_INGRESS", "encounter_7_EGRESS"], None),
+    (None, ["SPAN"])
+])
+def test_coarse_bins(pyramid, bin_size, parts, labels):
+    pyramid_dir, data = pyramid
+    merged = pyr.aggregate(pyramid_dir, bin_size, parts, labels)
+
+    # The same data binned directly at the coarse bin size
+    data = pd.concat([data[part] for part in (parts or data)],
+                     ignore_index=True)
+    data = data[data[pyr.LABEL_COLUMN].isin(labels or pyr.LABELS)]
+    bin_index = np.digitize(data.posR * 1e3 / R_SUN,
+                            np.arange(0, 100, bin_size))
+    direct = ss.BinAccumulator(pyr.LABELS, pyr.LABEL_COLUMN)
+    direct.update(data, bin_index)
+
+    np.testing.assert_array_equal(merged.keys, direct.keys)
+    np.testing.assert_array_equal(merged.count, direct.count)
+    np.testing.assert_array_equal(merged.label_count, direct.label_count)
+
+    # Moments are merged exactly (to float round-off), the sketches hold
+    # the same buckets, so the quantiles are identical
+    stats = merged.statistics()
+    expected = direct.statistics()
+    moments = expected.Type.isin(["mean", "std"])
+    pd.testing.assert_frame_equal(stats[moments], expected[moments],
+                                  rtol=1e-10)
+    pd.testing.assert_frame_equal(stats[~moments], expected[~moments],
+                                  check_exact=True)
@@ -0,0 +1,96 @@
+import numpy as np
+import pytest
+from MODULES.stat import stats_stream as ss
+
+CELLS = 50
+MAX_BUCKETS = 256
+
+
+def epoch_values(size):
+    """Epoch (ns) at 10 s cadence, spread over CELLS distance bins"""
+    rng = np.random.default_rng(size)
+    epoch = 1_600_000_000e9 + np.arange(size) * 1e10
+
+    return rng.integers(0, CELLS, size), epoch
+
+
+def density_values(size):
+    """Positive values over several orders of magnitude"""
+    rng = np.random.default_rng(size)
+
+    return rng.integers(0, CELLS, size), rng.lognormal(3, 2, size)
+
+
+def exact_quantile(cells, values, q):
+    """Quantile of the values of each cell, as in pandas"""
+    return np.array([np.quantile(values[cells == cell], q)
+                     for cell in range(CELLS)])
+
+
+@pytest.mark.parametrize("values, resolution", [
+    (epoch_values, 1e9),
+    (density_values, None)
+])
+def test_size_bounded(values, resolution):
+    sizes = []
+
+    for size in [10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6]:
+        cells, data = values(size)
+        sketch = ss.QuantileSketch(resolution=resolution,
+                                   max_buckets=MAX_BUCKETS)
+        for chunk in np.array_split(np.arange(size), 10):
+            sketch.update(cells[chunk], data[chunk])
+
+        assert sketch.max_cell_size() <= MAX_BUCKETS
+        sizes.append(sketch.keys.size)
+
+        # Combined buckets only widen the error bound
+        for q in (0.25, 0.5, 0.75):
+            estimate = sketch.quantile(np.arange(CELLS), q)
+            exact = exact_quantile(cells, data, q)
+            if resolution is None:
+                error = np.abs(estimate / exact - 1)
+            else:
+                error = np.abs(estimate - exact)
+            assert np.all(error <= sketch.error() * (1 + 1e-9))
+
+    assert max(sizes) <= CELLS * MAX_BUCKETS
+    assert sizes[-1] < 10 ** 5
+
+
+@pytest.mark.parametrize("resolution", [1e9, None])
+def test_merge_order(resolution):
+    cells, data = epoch_values(10 ** 5)
+    if resolution is None:
+        cells, data = density_values(10 ** 5)
+
+    full = ss.QuantileSketch(resolution=resolution, max_buckets=MAX_BUCKETS)
+    full.update(cells, data)
+
+    # Parts of different size reach different levels before the merge
+    merged = ss.QuantileSketch(resolution=resolution,
+                               max_buckets=MAX_BUCKETS)
+    for chunk in np.array_split(np.arange(data.size), [100, 3000, 40000]):
+        part = ss.QuantileSketch(resolution=resolution,
+                                 max_buckets=MAX_BUCKETS)
+        part.update(cells[chunk], data[chunk])
+        merged.merge(part)
+
+    assert merged.level == full.level > 0
+    np.testing.assert_array_equal(merged.keys, full.keys)
+    np.testing.assert_array_equal(merged.counts, full.counts)
+
+
+def test_regroup_bounded():
+    cells, data = epoch_values(10 ** 5)
+    sketch = ss.QuantileSketch(resolution=1e9, max_buckets=MAX_BUCKETS)
+    sketch.update(cells, data)
+
+    coarse = ss.QuantileSketch(resolution=1e9, max_buckets=MAX_BUCKETS)
+    coarse.update(cells // 10, data)
+    sketch.regroup(lambda keys: keys // 10)
+
+    assert sketch.max_cell_size() <= MAX_BUCKETS
+    assert sketch.level == coarse.level
+    np.testing.assert_array_equal(sketch.keys, coarse.keys)
+    np.testing.assert_array_equal(sketch.counts, coarse.counts)
@@ -0,0 +1,95 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from MODULES.misc import storage
+from MODULES.pspdata import data_schema
+
+
+def measurements(size=500):
+    """Cleaned measurements in the column schema, with NaN values"""
+    rng = np.random.default_rng(size)
+    data = pd.DataFrame({
+        "epoch": 1_600_000_000 * 10 ** 9 +
+        np.arange(size, dtype=np.int64) * 10 ** 10,
+        "posR": rng.uniform(1e7, 3e7, size),
+        "posTH": rng.normal(np.pi / 2, 0.05, size),
+        "posPH": rng.normal(0, 0.05, size),
+        "vr": rng.normal(350, 80, size),
+        "np": rng.lognormal(5, 1, size),
+        "Temp": rng.lognormal(13, 0.5, size),
+        "Inst": rng.choice(data_schema.INSTRUMENTS, size)
+    }, index=rng.permutation(size) + 1000)
+    data.loc[data.index[::7], "np"] = np.nan
+    data.loc[data.index[::11], "posTH"] = np.nan
+
+    return data_schema.conform(data)
+
+
+def test_npz_round_trip(tmp_path):
+    data = measurements()
+    file_name = storage.write_frame(f"{tmp_path}/PSP_BIN_16.0-16.1", data,
+                                    "npz")
+
+    assert file_name.endswith(".npz")
+    pd.testing.assert_frame_equal(storage.read_frame(file_name), data)
+
+
+def test_backend_parity(tmp_path):
+    data = measurements()
+    os.makedirs(f"{tmp_path}/npz")
+    os.makedirs(f"{tmp_path}/json")
+
+    from_npz = storage.read_frame(
+        storage.write_frame(f"{tmp_path}/npz/data", data, "npz")
+    )
+    from_json = storage.read_frame(
+        storage.write_frame(f"{tmp_path}/json/data", data, "json")
+    )
+
+    # JSON keeps neither the data types nor the exact epoch (as float),
+    # values are the same in the schema
+    pd.testing.assert_frame_equal(data_schema.conform(from_json),
+                                  from_npz, check_exact=False, rtol=1e-15)
+
+
+def test_other_backend_removed(tmp_path):
+    data = measurements()
+    storage.write_frame(f"{tmp_path}/data", data, "json")
+    storage.write_frame(f"{tmp_path}/data", data, "npz")
+
+    assert sorted(os.listdir(tmp_path)) == ["data.npz"]
+    assert storage.list_frames(str(tmp_path)) == ["data"]
+
+
+def test_bin_partitions(tmp_path):
+    data = measurements(10)
+    for start in np.arange(16.0, 17.0, 0.1):
+        storage.write_frame(
+            f"{tmp_path}/PSP_BIN_{start:.1f}-{start + 0.1:.1f}", data
+        )
+
+    assert len(storage.bin_partitions(str(tmp_path))) == 10
+    assert storage.bin_partitions(str(tmp_path), 16.25, 16.5) == [
+        "PSP_BIN_16.2-16.3", "PSP_BIN_16.3-16.4", "PSP_BIN_16.4-16.5"
+    ]
+    assert storage.bin_partitions(str(tmp_path), r_min=16.9) == \
+        ["PSP_BIN_16.9-17.0"]
+    assert storage.bin_partitions(str(tmp_path), r_max=16.0) == []
+
+
+@pytest.mark.parametrize("encounters, directions, expected", [
+    (None, None, ["encounter_7_EGRESS", "encounter_7_INGRESS",
+                  "encounter_8_EGRESS", "encounter_8_INGRESS"]),
+    (["encounter_8"], None, ["encounter_8_EGRESS", "encounter_8_INGRESS"]),
+    (None, ["INGRESS"], ["encounter_7_INGRESS", "encounter_8_INGRESS"]),
+    (["encounter_7"], ["EGRESS"], ["encounter_7_EGRESS"])
+])
+def test_split_partitions(tmp_path, encounters, directions, expected):
+    data = measurements(10)
+    for encounter in ["encounter_7", "encounter_8"]:
+        for direction in ["INGRESS", "EGRESS"]:
+            storage.write_frame(f"{tmp_path}/{encounter}_{direction}", data)
+
+    assert storage.split_partitions(str(tmp_path), encounters,
+                                    directions) == expected
@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+import pytest
+from MODULES.pspdata import data_handling as dh
+
+
+def loop_time_averaging(data, time_window):
+    """
+    Time averaging as it was done before the vectorization (moving the
+    window one measurement at a time), as reference
+    """
+    averaged_frame = pd.DataFrame(columns=data.columns)
+    size = data.shape[0]
+    start_idx = 0
+    end_idx = 0
+
+    while start_idx < size - 1:
+        time_delta = 0
+
+        while time_delta < time_window:
+            end_idx += 1
+            if end_idx == size - 1:
+                break
+            time_delta = data.epoch.iloc[end_idx] - data.epoch.iloc[start_idx]
+
+        data_window = data.iloc[start_idx:end_idx]
+        avg = data_window.mean(numeric_only=True).to_frame().T
+        averaged_frame = pd.concat(objs=[averaged_frame, avg])
+        start_idx = end_idx
+
+    return averaged_frame
+
+
+def random_frame(rng, size, shuffled=False):
+    """Measurements with irregular cadence, NaN values and integer epoch"""
+    steps = rng.exponential(3 * dh.NS_PER_SECOND, size).astype(np.int64)
+    epoch = 1_600_000_000 * dh.NS_PER_SECOND + np.cumsum(steps)
+    if shuffled:
+        epoch = rng.permutation(epoch)
+
+    data = pd.DataFrame({
+        "epoch": epoch,
+        "posR": rng.uniform(5e6, 3e7, size),
+        "vr": rng.normal(400, 50, size),
+        "np": rng.lognormal(5, 1, size)
+    })
+    data.loc[rng.random(size) < 0.1, "vr"] = np.nan
+    data.loc[rng.random(size) < 0.05, "np"] = np.nan
+
+    return data
+
+
+@pytest.mark.parametrize("seed", range(50))
+@pytest.mark.parametrize("shuffled", [False, True])
+def test_matches_loop(seed, shuffled):
+    rng = np.random.default_rng(seed)
+    data = random_frame(rng, int(rng.integers(0, 200)), shuffled)
+
+    expected = loop_time_averaging(
+        data, dh.TIME_WINDOW * dh.NS_PER_SECOND
+    ).reset_index(drop=True)
+    result = dh.time_averaging(data)
+
+    assert list(result.columns) == list(data.columns)
+    assert result.shape[0] == expected.shape[0]
+
+    # The epoch stays integer nanoseconds, the mean of the loop is a
+    # float (exact to about 256 ns at the epochs of PSP)
+    assert result["epoch"].dtype == np.int64
+    np.testing.assert_allclose(result["epoch"].to_numpy(np.float64),
+                               expected["epoch"].to_numpy(np.float64),
+                               rtol=1e-15, atol=0)
+
+    for column in ["posR", "vr", "np"]:
+        np.testing.assert_allclose(result[column].to_numpy(np.float64),
+                                   expected[column].to_numpy(np.float64),
+                                   rtol=1e-12, equal_nan=True)